@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Chatbot.middleware.ServerTimingMiddleware',
+    'Chatbot.middleware.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -135,3 +137,252 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Materialised recommendations
+# Stored lists are served until the user's profile or preference vector changes.
+# A user is recomputed once RECOMMENDATION_MATERIALIZER_DELAY seconds pass
+# without another profile write, so a questionnaire costs one run.
+
+RECOMMENDATION_STORE_TIMEOUT = 60 * 60 * 24 * 7
+
+RECOMMENDATION_MATERIALIZER_WORKERS = 2
+
+RECOMMENDATION_MATERIALIZER_DELAY = 10.0
+
+# Catalog exports
+# Whole-catalog Neo4j reads (embeddings, CF interactions, constraint
+# attributes) pull this many records per round trip.
+
+EXPORT_FETCH_SIZE = 5000
+
+# Collaborative filtering
+# The model is rebuilt offline with `manage.py build_cf_model`.
+
+CF_MODEL_PATH = BASE_DIR / 'data' / 'cf_model.npz'
+
+CF_NEIGHBOURS = 50
+
+CF_CANDIDATES = 50
+
+# Recommendation re-ranking
+# Relevance is a weighted sum of these signals; dislike is subtracted.
+
+RERANKER_WEIGHTS = {
+    'cosine': 0.7,
+    'genre': 0.3,
+    'collaborative': 0.3,
+    'score': 0.1,
+    'popularity': 0.0,
+    'dislike': 0.5,
+}
+
+# 1.0 ranks purely by relevance, lower values favour genre diversity
+RERANKER_MMR_LAMBDA = 0.7
+
+# Request tracing
+# Fraction of requests that get a Server-Timing header and feed the
+# per-stage histograms served at /api/metrics/.
+
+TRACING_SAMPLE_RATE = 0.1
+
+# Ollama models
+
+OLLAMA_CHAT_MODEL = 'llama3.2'
+
+OLLAMA_EMBED_MODEL = 'nomic-embed-text'
+
+# How long Ollama keeps a model resident after a request
+OLLAMA_KEEP_ALIVE = '30m'
+
+# How often (seconds) the models are re-pinned while idle, below the
+# keep-alive so they are never unloaded; 0 disables the keep-warm ping
+OLLAMA_KEEP_WARM_INTERVAL = 10 * 60
+
+# Worker warm-up
+# Neo4j connectivity, model load and index load run once per worker in the
+# background; /api/ready/ reports 503 until they have succeeded. Failed steps
+# are retried with exponential backoff (seconds) until they pass.
+
+WARMUP_ON_STARTUP = True
+
+WARMUP_RETRY_INITIAL = 1.0
+
+WARMUP_RETRY_MAX = 60.0
+
+# Embedding micro-batching
+# Concurrent embed requests arriving within the window share one Ollama call.
+# A caller waits at most EMBEDDING_TIMEOUT seconds for its vector, enough for
+# the window plus the `ollama_embed` attempt and its retry.
+
+EMBEDDING_BATCH_WINDOW_MS = 5
+
+EMBEDDING_MAX_BATCH = 32
+
+EMBEDDING_CACHE_SIZE = 2048
+
+EMBEDDING_TIMEOUT = 30.0
+
+# User preference vector
+# Weight of each new signal in the exponentially-weighted preference vector.
+
+PREFERENCE_CHAT_ALPHA = 0.1
+
+PREFERENCE_RELATION_ALPHA = 0.3
+
+# Similar anime
+# SIMILAR_TO edges are rebuilt offline with `manage.py build_similar_anime`.
+
+SIMILAR_ANIME_K = 20
+
+# Neighbours of a user's favorites admitted as /recommend candidates
+SIMILAR_ANIME_SEEDS = 50
+
+# Ranked recommendation lists
+# The full ranked list of a /recommend run is kept for paging through
+# /api/recommendations/.
+
+RANKED_LIST_TIMEOUT = 60 * 30
+
+# Single-flight request de-duplication
+# Identical in-flight /recommend, profile question and MAL requests share
+# one execution through a Redis lock and result slot.
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = 180
+
+SINGLE_FLIGHT_RESULT_TIMEOUT = 10
+
+SINGLE_FLIGHT_WAIT_TIMEOUT = 120
+
+# Neo4j user provisioning outbox
+# New users are queued in the same database transaction as their row and
+# written to Neo4j in batches; failed batches are retried with backoff.
+
+USER_OUTBOX_BATCH_SIZE = 500
+
+USER_OUTBOX_MAX_ATTEMPTS = 8
+
+USER_OUTBOX_RETRY_DELAY = 5
+
+USER_OUTBOX_POLL_INTERVAL = 2
+
+# External dependency resilience
+# Per-attempt deadlines, retries and circuit breakers for Ollama and MAL.
+# Only idempotent calls are retried or hedged; hedge_after sends a second
+# MAL request when the first is slower than its usual p95.
+
+RESILIENCE = {
+    "ollama": {"timeout": 90.0, "retries": 0, "failure_threshold": 3, "reset_timeout": 30.0, "max_workers": 8},
+    "ollama_embed": {"timeout": 10.0, "retries": 1, "failure_threshold": 5, "reset_timeout": 15.0, "max_workers": 4},
+    "mal": {"timeout": 5.0, "retries": 2, "hedge_after": 0.8, "failure_threshold": 5, "reset_timeout": 30.0,
+            "max_workers": 16},
+}
+
+# Admission control
+# Token buckets per user and per endpoint (rate in requests per second,
+# burst as bucket size) and a ceiling on concurrent LLM-backed requests
+# across all workers. Over-limit users get 429, shed load gets 503.
+
+ADMISSION_CONTROL = {
+    "/api/chat/": {"user_rate": 0.2, "user_burst": 5, "endpoint_rate": 2.0, "endpoint_burst": 20},
+    "/api/profile/": {"user_rate": 0.5, "user_burst": 10, "endpoint_rate": 5.0, "endpoint_burst": 30},
+}
+
+ADMISSION_MAX_CONCURRENCY = 8
+
+ADMISSION_SLOT_LEASE = 180
+
+ADMISSION_RETRY_AFTER = 5
+
+# Chat model routing
+# Each task prefers the first tier in its list and moves down a tier while
+# that model's recent p95 latency or queue time exceeds the task's budget
+# (seconds). Samples older than the window are dropped, so a downgraded
+# model is tried again once it recovers. A task with an "escalate" tier uses
+# it only while its measured latency fits the budget; an unmeasured escalation
+# model gets one call in MODEL_ROUTER_PROBE_EVERY. Only the preferred tiers
+# are warmed and kept resident, the escalation model loads on demand.
+
+OLLAMA_MODEL_TIERS = {
+    "small": "llama3.2:1b",
+    "medium": OLLAMA_CHAT_MODEL,
+    "large": "llama3.1",
+}
+
+MODEL_ROUTES = {
+    "small_talk": {"tiers": ["medium", "small"], "p95_budget": 6.0, "queue_budget": 1.0},
+    "question_paraphrase": {"tiers": ["medium", "small"], "p95_budget": 15.0, "queue_budget": 2.0},
+    "recommendation": {"tiers": ["medium", "small"], "escalate": "large", "p95_budget": 30.0, "queue_budget": 3.0},
+    "summary": {"tiers": ["small"], "p95_budget": 15.0, "queue_budget": 5.0},
+}
+
+MODEL_ROUTER_WINDOW = 50
+
+MODEL_ROUTER_WINDOW_SECONDS = 300
+
+MODEL_ROUTER_PROBE_EVERY = 20
+
+# Compact embedding index
+# Written by `manage.py build_compact_index`: int8 or float16 catalog vectors,
+# optionally PCA-projected to COMPACT_INDEX_DIMS, searched in memory for
+# catalog-wide candidates that Neo4j re-scores at full precision.
+
+COMPACT_INDEX_PATH = BASE_DIR / 'data' / 'compact_index.npz'
+
+COMPACT_INDEX_MODE = 'int8'
+
+COMPACT_INDEX_DIMS = None
+
+COMPACT_INDEX_CANDIDATES = 200
+
+# Recommendation constraints
+# Hard filters derived from the profile (disliked genres, age, airing status,
+# maximum episodes, anime already seen) are pushed into candidate retrieval.
+# A rating is excluded for users younger than its minimum age; users who
+# gave no age are not filtered by rating.
+
+RATING_MIN_AGE = {
+    'PG-13 - Teens 13 or older': 13,
+    'R - 17+ (violence & profanity)': 17,
+    'R+ - Mild Nudity': 18,
+    'Rx - Hentai': 18,
+}
+
+# Conversation memory
+# Prompts see a rolling summary plus the last few raw turns. Once
+# CONVERSATION_SUMMARY_EVERY turns beyond the raw window accumulate, they
+# are folded into the summary in the background.
+
+CONVERSATION_RAW_TURNS = 4
+
+CONVERSATION_SUMMARY_EVERY = 4
+
+CONVERSATION_SUMMARY_MAX_WORDS = 120
+
+CONVERSATION_TURN_CHARS = 600
+
+# Semantic response cache
+# Early small-talk turns (no summary yet and fewer than
+# RESPONSE_CACHE_MAX_TURNS in the history) reuse the question generated for
+# a reply whose embedding is at least RESPONSE_CACHE_THRESHOLD similar, from
+# a user with the same first RESPONSE_CACHE_BUCKET_GENRES preferred genres.
+# Entries live in each worker's memory for RESPONSE_CACHE_TTL seconds.
+
+RESPONSE_CACHE_ENABLED = True
+
+RESPONSE_CACHE_THRESHOLD = 0.92
+
+RESPONSE_CACHE_TTL = 3600
+
+RESPONSE_CACHE_MAX_TURNS = 3
+
+RESPONSE_CACHE_BUCKET_GENRES = 2
+
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+RESPONSE_CACHE_MAX_BUCKETS = 512
+
+# Benchmarks
+# `manage.py run_benchmarks` writes one JSON report per run here, named after
+# the commit, so reports of two commits can be compared with --compare.
+
+BENCHMARK_RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
@@ -0,0 +1,32 @@
+"""
+Settings of the server `manage.py load_test` starts: the project settings
+with a throwaway database and, unless a Redis URL is given, a local-memory
+cache. Ollama, MAL and Neo4j endpoints come from the environment
+(OLLAMA_HOST, MAL_API_URL, NEO4J_URI), and the compact index from
+LOADTEST_COMPACT_INDEX when it was built for an in-memory graph.
+"""
+import os
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, BASE_DIR, COMPACT_INDEX_PATH
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('LOADTEST_DATABASE', str(BASE_DIR / 'loadtest.sqlite3')),
+        # Concurrent signups wait for the write lock instead of failing at once
+        'OPTIONS': {'timeout': 20},
+    }
+}
+
+if os.getenv('LOADTEST_REDIS_URL'):
+    CACHES = {'default': {**CACHES['default'], 'LOCATION': os.getenv('LOADTEST_REDIS_URL')}}
+else:
+    # Per process: admission control is skipped and multi-worker servers do
+    # not share session history
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+COMPACT_INDEX_PATH = os.getenv('LOADTEST_COMPACT_INDEX', COMPACT_INDEX_PATH)
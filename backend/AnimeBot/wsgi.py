@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AnimeBot.settings')
 
 application = get_wsgi_application()
+
+# Warm up once per worker process (import this module after forking, i.e.
+# without a preloading master, so each worker gets its own warm-up thread).
+from django.conf import settings
+
+if settings.WARMUP_ON_STARTUP:
+    from chat_processor.warmup import warmup, keep_warm
+    warmup.start()
+    keep_warm.start()
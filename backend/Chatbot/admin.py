@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, UserProvisioningOutbox
 
 # Register your models here.
-admin.site.register(CustomUser)
\ No newline at end of file
+admin.site.register(CustomUser)
+admin.site.register(UserProvisioningOutbox)
\ No newline at end of file
@@ -0,0 +1,127 @@
+import random
+import statistics
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from chat_processor import prompts
+from chat_processor.chatbot import QUESTIONS_PATH
+from chat_processor.llm_clients import load_questions
+
+GENRES = ["Action", "Romance", "Comedy", "Drama", "Fantasy", "Mystery", "Sci-Fi", "Slice of Life", "Horror", "Sports"]
+
+
+def sample_profile(rng):
+    return {
+        "preferred_genres": rng.sample(GENRES, 3),
+        "favorite_anime": rng.sample(["Naruto", "Steins;Gate", "Mushishi", "Haikyuu!!", "Monster", "K-On!"], 2),
+        "experience_level": rng.choice(["beginner", "casual", "veteran"]),
+    }
+
+
+def sample_recommendations(rng, count=10):
+    return [
+        {
+            "anime_id": rng.randint(1, 50000),
+            "title": f"Anime {rng.randint(1, 9999)}",
+            "similarity": round(rng.random(), 3),
+            "synopsis": "A story about " + " ".join(rng.sample(GENRES, 4)).lower() + ".",
+            "score": round(rng.uniform(5, 9.5), 2),
+            "genres": rng.sample(GENRES, 3),
+        }
+        for _ in range(count)
+    ]
+
+
+def interleave(prefix, variable):
+    """The pre-restructure layout: request data right after the first paragraph of the instructions."""
+    head, _, tail = prefix.partition("\n\n")
+    return f"{head}\n\n{variable}\n{tail}"
+
+
+class Command(BaseCommand):
+    help = ("Measure Ollama prefill time per call with the stable-prefix prompt layout "
+            "against request data interleaved into the instructions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=10, help="Calls per task and layout.")
+        parser.add_argument('--model', help="Model to use instead of each task's preferred tier.")
+        parser.add_argument('--tasks', nargs='+', default=list(prompts.PREFIXES),
+                            choices=list(prompts.PREFIXES), help="Tasks to benchmark.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        import ollama
+        client = ollama.Client()
+        rng = random.Random(options['seed'])
+
+        for task in options['tasks']:
+            model = options['model'] or settings.OLLAMA_MODEL_TIERS[settings.MODEL_ROUTES[task]["tiers"][0]]
+            try:
+                builders = self.builders(task, rng)
+            except OSError as e:
+                self.stderr.write(f"Skipping {task}: {e}")
+                continue
+
+            pairs = [builders() for _ in range(options['calls'])]
+            results = {}
+            # Each layout runs as its own series: alternating them would evict
+            # the cached prefix, as other traffic on the same model slot does
+            for index, layout in enumerate(("stable", "interleaved")):
+                for pair in pairs:
+                    try:
+                        response = client.generate(model=model, prompt=pair[index], options={"num_predict": 1},
+                                                   keep_alive=settings.OLLAMA_KEEP_ALIVE)
+                    except Exception as e:
+                        raise CommandError(f"Ollama call failed: {e}")
+                    results.setdefault(layout, []).append(
+                        (response["prompt_eval_duration"] / 1e6, response["prompt_eval_count"])
+                    )
+            self.report(task, model, results)
+
+    def builders(self, task, rng):
+        """Return a function producing (stable, interleaved) prompts for fresh request data."""
+        if task == "question_paraphrase":
+            questions = load_questions(QUESTIONS_PATH)
+            categories = list(questions)
+
+            def build():
+                category = rng.choice(categories)
+                return (prompts.question_paraphrase_prompt(questions, category),
+                        interleave(prompts.QUESTION_PARAPHRASE_PREFIX, f"Category: {category}\n") + str(questions))
+        elif task == "small_talk":
+            def build():
+                profile, reply = sample_profile(rng), rng.choice(["I love mecha!", "Not much, you?", "Work was long."])
+                variable = (f"**User Profile**:\n{profile}\n\n**Conversation So Far**:\nNothing yet.\n\n"
+                            f"**Session History**:\n[]\n\n**User Reply**:\n{reply}\n")
+                return (prompts.small_talk_prompt(profile, "", [], reply),
+                        interleave(prompts.SMALL_TALK_PREFIX, variable))
+        elif task == "summary":
+            def build():
+                summary = f"The user likes {', '.join(sample_profile(rng)['preferred_genres'])}."
+                turns = [{"system": "What have you been watching?", "user": rng.choice(GENRES)} for _ in range(4)]
+                variable = f"**Current Summary**:\n{summary}\n\n**New Turns**:\n{turns}\n"
+                return (prompts.summary_prompt(summary, turns, settings.CONVERSATION_SUMMARY_MAX_WORDS),
+                        interleave(prompts.SUMMARY_PREFIX, variable))
+        else:
+            def build():
+                profile, recommendations = str(sample_profile(rng)), sample_recommendations(rng)
+                variable = f"**User Profile**:\n{profile}\n\n**Anime Data**:\n{recommendations}\n"
+                return (prompts.recommendation_prompt(profile, recommendations),
+                        interleave(prompts.RECOMMENDATION_PREFIX, variable))
+        return build
+
+    def report(self, task, model, results):
+        # The first call of a series starts from another prompt's cache, so it is left out
+        summary = {}
+        for layout, samples in results.items():
+            warm = samples[1:] if len(samples) > 1 else samples
+            summary[layout] = (statistics.mean(ms for ms, _ in warm), statistics.mean(n for _, n in warm))
+        stable_ms, stable_tokens = summary["stable"]
+        interleaved_ms, interleaved_tokens = summary["interleaved"]
+        self.stdout.write(
+            f"{task} ({model}): prefill {interleaved_ms:.1f} ms / {interleaved_tokens:.0f} tokens interleaved, "
+            f"{stable_ms:.1f} ms / {stable_tokens:.0f} tokens stable prefix"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"  saved {interleaved_ms - stable_ms:.1f} ms per call "
+            f"({(1 - stable_ms / interleaved_ms) * 100 if interleaved_ms else 0:.0f}%)"
+        ))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chat_processor.recommendation_engine import CollaborativeFilteringEngine
+from chat_processor.user_graph_management import UserService
+
+
+class Command(BaseCommand):
+    help = "Precompute item-item collaborative filtering similarities from the user graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=settings.CF_NEIGHBOURS,
+                            help="Most-similar items to keep per item.")
+        parser.add_argument('--output', default=str(settings.CF_MODEL_PATH),
+                            help="Where to write the model file.")
+
+    def handle(self, *args, **options):
+        service = UserService()
+        try:
+            engine = CollaborativeFilteringEngine(neighbours=options['neighbours'])
+            engine.build(engine.fetch_interactions(service.driver))
+        finally:
+            service.close()
+
+        engine.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(engine.items)} items and {engine.similarity.nnz} similarities to {options['output']}"
+        ))
@@ -0,0 +1,56 @@
+import numpy as np
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from chat_processor.candidate_fetch import CandidateFetcher
+from chat_processor.compact_index import CompactEmbeddingIndex, MODES
+from chat_processor.similar_anime import SimilarAnimeGraph
+from utils.neo4j_connection import Neo4jConnection
+
+
+class Command(BaseCommand):
+    help = ("Build the compact (quantised, optionally PCA-projected) catalog embedding index "
+            "and report its memory per vector and recall against exact cosine.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default=settings.COMPACT_INDEX_MODE,
+                            help="Vector encoding.")
+        parser.add_argument('--dims', type=int, default=settings.COMPACT_INDEX_DIMS,
+                            help="PCA output dimensions; omit to keep the full dimension.")
+        parser.add_argument('--candidates', type=int, default=settings.COMPACT_INDEX_CANDIDATES,
+                            help="Candidates re-scored at full precision, for the recall report.")
+        parser.add_argument('--k', type=int, default=10, help="Cut-off of the recall report.")
+        parser.add_argument('--queries', type=int, default=200,
+                            help="Catalog vectors used as queries for the recall report.")
+        parser.add_argument('--output', default=str(settings.COMPACT_INDEX_PATH),
+                            help="Where to write the index file.")
+
+    def handle(self, *args, **options):
+        anime_ids, embeddings = SimilarAnimeGraph(Neo4jConnection().get_driver()).fetch_embeddings()
+        if not len(anime_ids):
+            raise CommandError("No anime embeddings found")
+
+        index = CompactEmbeddingIndex(mode=options['mode'], dims=options['dims']).fit(anime_ids, embeddings)
+        # Packed genre, rating, status and episode attributes for constraint filtering
+        fetcher = CandidateFetcher(Neo4jConnection().get_driver())
+        fetcher.ensure_indexes()
+        index.set_attributes(fetcher.fetch_attributes())
+        Path(options['output']).parent.mkdir(parents=True, exist_ok=True)
+        index.save(options['output'])
+
+        rng = np.random.default_rng(0)
+        queries = embeddings[rng.choice(len(embeddings), min(options['queries'], len(embeddings)), replace=False)]
+        memory = index.memory_report()
+        recall = index.recall(embeddings, queries, k=options['k'], candidates=options['candidates'])
+
+        self.stdout.write(
+            f"{memory['vectors']} vectors, {memory['mode']} x {memory['dims']} dims "
+            f"(from {memory['source_dims']}): {memory['bytes_per_vector']} bytes per vector, "
+            f"{memory['float32_bytes_per_vector']} as float32 ({memory['compression_vs_float32']}x), "
+            f"{memory['neo4j_bytes_per_vector']} as stored on the Anime node"
+        )
+        self.stdout.write(
+            f"recall@{recall['k']} {recall['recall_at_k']:.3f} before re-scoring, "
+            f"{recall['recall_after_rescoring']:.3f} after exact re-scoring of {recall['candidates']} candidates"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote the compact index to {options['output']}"))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chat_processor.similar_anime import SimilarAnimeGraph
+from utils.neo4j_connection import Neo4jConnection
+
+
+class Command(BaseCommand):
+    help = "Precompute top-k nearest neighbours for every Anime and write them as SIMILAR_TO edges."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=settings.SIMILAR_ANIME_K,
+                            help="Neighbours to keep per anime.")
+        parser.add_argument('--block-size', type=int, default=1024,
+                            help="Anime scored per matrix product.")
+
+    def handle(self, *args, **options):
+        graph = SimilarAnimeGraph(Neo4jConnection().get_driver())
+        count = graph.rebuild(k=options['k'], block_size=options['block_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['k']} SIMILAR_TO edges for each of {count} anime"))
@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Chatbot.outbox import UserOutboxDrainer
+
+
+class Command(BaseCommand):
+    help = "Provision pending users in Neo4j from the outbox, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.USER_OUTBOX_BATCH_SIZE,
+                            help="Users provisioned per Neo4j transaction.")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling for new rows instead of exiting when drained.")
+
+    def handle(self, *args, **options):
+        drainer = UserOutboxDrainer(batch_size=options['batch_size'])
+        while True:
+            count = drainer.drain_all()
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"Provisioned {count} users in Neo4j"))
+            if not options['loop']:
+                return
+            time.sleep(settings.USER_OUTBOX_POLL_INTERVAL)
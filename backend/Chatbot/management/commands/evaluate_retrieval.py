@@ -0,0 +1,105 @@
+import json
+import time
+from contextlib import nullcontext
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.components import report
+from benchmarks.environment import OfflineEnvironment
+from benchmarks.retrieval_quality import (
+    Catalog, synthetic_profiles, recorded_profiles, retrieval_modes, evaluate, choose,
+)
+from utils.neo4j_connection import Neo4jConnection
+
+
+class Command(BaseCommand):
+    help = ("Evaluate every retrieval mode (exact cosine, compact index encodings with and without "
+            "re-scoring, the genre-filtered graph query) on synthetic and recorded profiles, reporting "
+            "recall@k and NDCG@k against exact cosine alongside latency and memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--live', action='store_true',
+                            help="Use the configured Neo4j instead of the offline synthetic catalog.")
+        parser.add_argument('--anime', type=int, default=2000, help="Offline synthetic catalog size.")
+        parser.add_argument('--synthetic', type=int, default=200, help="Synthetic profiles.")
+        parser.add_argument('--recorded', type=int, default=200,
+                            help="Stored user preference vectors to include at most.")
+        parser.add_argument('--profiles', help="Replay the profiles saved by an earlier run instead.")
+        parser.add_argument('--save-profiles', help="Save the evaluated profiles for later replays.")
+        parser.add_argument('--only', nargs='+', help="Modes to evaluate besides the exact baseline.")
+        parser.add_argument('--pca-dims', type=int, nargs='*', default=[128, 256],
+                            help="PCA dimensions the compact encodings are also tried with.")
+        parser.add_argument('--k', type=int, default=10, help="Cut-off of recall and NDCG.")
+        parser.add_argument('--candidates', type=int, default=settings.COMPACT_INDEX_CANDIDATES,
+                            help="Compact-index candidates re-scored.")
+        parser.add_argument('--tolerance', type=float, default=0.02,
+                            help="Recall and NDCG loss accepted when choosing the fastest mode.")
+        parser.add_argument('--output', help="Report path, by default named after the commit.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        environment = None if options['live'] else OfflineEnvironment(anime=options['anime'], seed=options['seed'])
+        with environment or nullcontext():
+            catalog = Catalog(Neo4jConnection().get_driver())
+            if not len(catalog):
+                raise CommandError("No anime embeddings found")
+            profiles = self.profiles(catalog, options)
+            if not profiles:
+                raise CommandError("No profiles to evaluate")
+
+            modes = retrieval_modes(dims for dims in options['pca_dims'] if dims < catalog.dims)
+            unknown = set(options['only'] or ()) - set(modes)
+            if unknown:
+                raise CommandError(f"Unknown modes {sorted(unknown)}, expected some of {sorted(modes)}")
+            if options['only']:
+                modes = {name: setup for name, setup in modes.items() if name == "exact" or name in options['only']}
+
+            results = evaluate(catalog, profiles, modes, k=options['k'], candidates=options['candidates'])
+
+        best = choose(results, tolerance=options['tolerance'])
+        sources = {}
+        for profile in profiles:
+            sources[profile["source"]] = sources.get(profile["source"], 0) + 1
+        config = {key: options[key] for key in ('live', 'k', 'candidates', 'tolerance', 'pca_dims', 'seed')}
+        config.update(catalog=len(catalog), dims=catalog.dims, profiles=sources)
+        if environment is not None:
+            config["anime"] = options['anime']
+        current = report(results, config)
+        current["chosen"] = best
+
+        self.stdout.write(f"{len(catalog)} anime x {catalog.dims} dims, profiles: "
+                          + ", ".join(f"{count} {source}" for source, count in sources.items()))
+        for name, result in sorted(results.items(), key=lambda item: item[1]["p50_ms"]):
+            line = (f"{name}: recall@{options['k']} {result['recall_at_k']:.3f}, "
+                    f"NDCG@{options['k']} {result['ndcg_at_k']:.3f}, p50 {result['p50_ms']:.3f} ms, "
+                    f"p95 {result['p95_ms']:.3f} ms, {result['bytes_per_vector']:.0f} bytes per vector")
+            self.stdout.write(self.style.SUCCESS(line) if name == best else line)
+        self.stdout.write(f"Fastest within {options['tolerance'] * 100:.1f}% of exact: {best}")
+
+        output = Path(options['output'] or settings.BENCHMARK_RESULTS_DIR /
+                      f"retrieval-{current['commit'] or time.strftime('%Y%m%d-%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+    def profiles(self, catalog, options):
+        if options['profiles']:
+            try:
+                with open(options['profiles']) as f:
+                    profiles = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read the profiles: {e}")
+            skipped = [profile for profile in profiles if len(profile["vector"]) != catalog.dims]
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipping {len(skipped)} profiles of another dimension than the catalog's {catalog.dims}"))
+            return [profile for profile in profiles if len(profile["vector"]) == catalog.dims]
+
+        rng = np.random.default_rng(options['seed'])
+        profiles = synthetic_profiles(catalog, options['synthetic'], rng)
+        if options['recorded']:
+            profiles += recorded_profiles(catalog.driver, options['recorded'], catalog.dims)
+        if options['save_profiles']:
+            Path(options['save_profiles']).write_text(json.dumps(profiles))
+        return profiles
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import importlib.util
+import subprocess
+from pathlib import Path
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.components import report
+from benchmarks.load import QUESTIONS, ENDPOINTS, run_stage, find_limit
+from benchmarks.stubs import StubOllama, StubMAL
+
+
+class Command(BaseCommand):
+    help = ("Ramp simulated user sessions (signup, profile questions, chat turns, /recommend) against the API "
+            "served under WSGI or ASGI with stub Ollama and MAL servers, and report throughput and "
+            "p50/p95/p99 per endpoint at each concurrency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'external'], default='wsgi',
+                            help="Start a WSGI (gunicorn, else runserver) or ASGI (uvicorn) server, "
+                                 "or load an already running one given by --url.")
+        parser.add_argument('--url', help="Base URL of the external server.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=1, help="Server worker processes.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker.")
+        parser.add_argument('--stages', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                            help="Concurrent virtual users of each stage.")
+        parser.add_argument('--stage-seconds', type=float, default=30.0, help="Duration of each stage.")
+        parser.add_argument('--chat-turns', type=int, default=3, help="Chat turns per session.")
+        parser.add_argument('--think-time', type=float, default=0.0, help="Mean seconds between a user's requests.")
+        parser.add_argument('--timeout', type=float, default=120.0, help="Client timeout per request.")
+        parser.add_argument('--chat-p95-budget', type=float, default=10.0,
+                            help="Chat p95 seconds beyond which the API is considered to fall over.")
+        parser.add_argument('--ollama-latency', type=float, default=0.2)
+        parser.add_argument('--tokens-per-second', type=float, default=60.0)
+        parser.add_argument('--ollama-parallel', type=int, default=4, help="Concurrent stub generations.")
+        parser.add_argument('--mal-latency', type=float, default=0.05)
+        parser.add_argument('--neo4j-uri', default='memory://?anime=2000',
+                            help="Graph of the started server; memory:// is per process.")
+        parser.add_argument('--redis', help="Redis URL for the server's cache, local memory if omitted.")
+        parser.add_argument('--output', help="Report path, by default named after the server and commit.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['server'] == 'external' and not options['url']:
+            raise CommandError("--server external needs --url")
+        if options['server'] != 'external' and options['neo4j_uri'].startswith('memory://') and options['workers'] > 1:
+            raise CommandError("The in-memory graph is not shared between workers; "
+                               "pass --neo4j-uri of a real Neo4j for multi-worker runs")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            ollama = StubOllama(latency=options['ollama_latency'], tokens_per_second=options['tokens_per_second'],
+                                parallel=options['ollama_parallel'])
+            mal = StubMAL(latency=options['mal_latency'])
+            with ollama, mal:
+                server = None
+                if options['server'] == 'external':
+                    base_url = options['url']
+                else:
+                    base_url = f"http://127.0.0.1:{options['port']}"
+                    server = self.start_server(options, workdir, ollama, mal)
+                try:
+                    self.wait_ready(base_url, server, workdir)
+                    stages = []
+                    for concurrency in options['stages']:
+                        stage = run_stage(base_url, concurrency, options['stage_seconds'],
+                                          chat_turns=options['chat_turns'], think_time=options['think_time'],
+                                          timeout=options['timeout'], seed=options['seed'])
+                        stages.append(stage)
+                        self.write_stage(stage)
+                finally:
+                    if server is not None:
+                        server.terminate()
+                        try:
+                            server.wait(timeout=30)
+                        except subprocess.TimeoutExpired:
+                            server.kill()
+                stub_requests = {"ollama": ollama.requests, "mal": mal.requests}
+
+        limit = find_limit(stages, p95_budget_ms=options['chat_p95_budget'] * 1000)
+        config = {key: options[key] for key in (
+            'server', 'workers', 'threads', 'stages', 'stage_seconds', 'chat_turns', 'think_time',
+            'ollama_latency', 'tokens_per_second', 'ollama_parallel', 'mal_latency', 'neo4j_uri', 'redis')}
+        current = report({"stages": stages, "limit": limit, "stub_requests": stub_requests}, config)
+
+        if limit["falls_over_at"] is None:
+            self.stdout.write(self.style.SUCCESS(f"Chat held up to {options['stages'][-1]} concurrent users"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Chat falls over at {limit['falls_over_at']} concurrent users: "
+                                                 f"{limit['reason']}"))
+        self.stdout.write(f"Peak throughput at {limit['peak_throughput_at']} concurrent users")
+
+        output = Path(options['output'] or settings.BENCHMARK_RESULTS_DIR /
+                      f"load-{options['server']}-{current['commit'] or time.strftime('%Y%m%d-%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+    def server_command(self, options):
+        bind = f"127.0.0.1:{options['port']}"
+        if options['server'] == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError("ASGI runs need uvicorn installed")
+            return [sys.executable, '-m', 'uvicorn', 'AnimeBot.asgi:application', '--host', '127.0.0.1',
+                    '--port', str(options['port']), '--workers', str(options['workers']), '--no-access-log']
+        if importlib.util.find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn', 'AnimeBot.wsgi:application', '--bind', bind,
+                    '--workers', str(options['workers']), '--threads', str(options['threads']),
+                    '--timeout', str(int(options['timeout']) + 30)]
+        if options['workers'] > 1:
+            raise CommandError("Multi-worker WSGI runs need gunicorn installed")
+        self.stdout.write(self.style.WARNING("gunicorn is not installed, serving with the threaded runserver"))
+        return [sys.executable, 'manage.py', 'runserver', '--noreload', bind]
+
+    def start_server(self, options, workdir, ollama, mal):
+        questions = Path(workdir) / 'questions.json'
+        questions.write_text(json.dumps(QUESTIONS))
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'AnimeBot.settings_loadtest',
+            'LOADTEST_DATABASE': str(Path(workdir) / 'loadtest.sqlite3'),
+            'QUESTIONS_PATH': str(questions),
+            'OLLAMA_HOST': ollama.url,
+            'MAL_API_URL': mal.api_url,
+            'NEO4J_URI': options['neo4j_uri'],
+            'PYTHONUNBUFFERED': '1',
+        }
+        if options['redis']:
+            env['LOADTEST_REDIS_URL'] = options['redis']
+
+        # The app has no migrations, so its tables are created directly
+        self.manage(env, "create the load-test database", 'migrate', '--run-syncdb', '--noinput')
+        if options['neo4j_uri'].startswith('memory://'):
+            # The synthetic catalog is the same in every process of one URI, so
+            # the index built here matches the server's graph
+            env['LOADTEST_COMPACT_INDEX'] = str(Path(workdir) / 'compact_index.npz')
+            self.manage(env, "build the compact index", 'build_compact_index', '--queries', '10',
+                        '--output', env['LOADTEST_COMPACT_INDEX'])
+
+        log = open(Path(workdir) / 'server.log', 'w')
+        return subprocess.Popen(self.server_command(options), cwd=settings.BASE_DIR, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+
+    def manage(self, env, action, *args):
+        result = subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"Could not {action}:\n{result.stderr[-2000:]}")
+
+    def wait_ready(self, base_url, server, workdir, timeout=120):
+        """Wait until every worker reachable at the URL has warmed up."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server is not None and server.poll() is not None:
+                log = (Path(workdir) / 'server.log').read_text()[-3000:]
+                raise CommandError(f"The server exited with code {server.returncode}:\n{log}")
+            try:
+                if requests.get(f"{base_url}/api/ready/", timeout=5).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise CommandError(f"The server at {base_url} was not ready after {timeout}s")
+
+    def write_stage(self, stage):
+        self.stdout.write(
+            f"{stage['concurrency']} users: {stage['throughput_rps']:.2f} req/s, "
+            f"{stage['sessions']} sessions in {stage['seconds']:.0f}s"
+        )
+        for endpoint in ENDPOINTS:
+            stats = stage['endpoints'][endpoint]
+            if not stats['requests']:
+                continue
+            line = (f"    {endpoint}: {stats['requests']} requests, {stats['throughput_rps']:.2f}/s, "
+                    f"p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, p99 {stats['p99_ms']:.0f} ms, "
+                    f"{stats['errors']} errors, {stats['shed']} shed")
+            self.stdout.write(self.style.ERROR(line) if stats['error_rate'] > 0.01 else line)
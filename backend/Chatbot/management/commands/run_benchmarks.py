@@ -0,0 +1,84 @@
+import json
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.components import BENCHMARKS, run_suite, report, compare
+from benchmarks.environment import OfflineEnvironment
+
+
+class Command(BaseCommand):
+    help = ("Run the component micro-benchmarks offline, against stub Ollama and MAL servers and an "
+            "in-memory graph, and save the results as JSON for comparison between commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="Benchmarks to run.")
+        parser.add_argument('--iterations', type=int, default=10, help="Samples per benchmark.")
+        parser.add_argument('--output', help="Report path, by default named after the commit.")
+        parser.add_argument('--compare', help="An earlier report to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help="Relative p50/p95 slow-down reported as a regression.")
+        parser.add_argument('--ollama-latency', type=float, default=0.2,
+                            help="Stub seconds before the first generated token.")
+        parser.add_argument('--tokens-per-second', type=float, default=60.0, help="Stub generation speed.")
+        parser.add_argument('--mal-latency', type=float, default=0.05, help="Stub seconds per MAL request.")
+        parser.add_argument('--graph-latency-ms', type=float, default=0.0,
+                            help="Simulated round trip per graph query.")
+        parser.add_argument('--anime', type=int, default=2000, help="Synthetic catalog size.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read the baseline report: {e}")
+
+        environment = OfflineEnvironment(
+            ollama_latency=options['ollama_latency'], tokens_per_second=options['tokens_per_second'],
+            mal_latency=options['mal_latency'], graph_latency_ms=options['graph_latency_ms'],
+            anime=options['anime'], seed=options['seed'],
+        )
+        with environment:
+            results = run_suite(options['only'], iterations=options['iterations'], seed=options['seed'])
+            unhandled = dict(environment.graph.unhandled)
+        current = report(results, environment.config)
+        if unhandled:
+            current["unhandled_queries"] = unhandled
+
+        for name, result in results.items():
+            if "skipped" in result:
+                self.stdout.write(self.style.WARNING(f"{name}: skipped, {result['skipped']}"))
+                continue
+            self.stdout.write(
+                f"{name}: p50 {result['p50_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms, "
+                f"p99 {result['p99_ms']:.3f} ms over {result['iterations']} samples"
+            )
+            for stage, ms in sorted(result['stages_ms'].items(), key=lambda item: -item[1]):
+                self.stdout.write(f"    {stage}: {ms:.3f} ms")
+
+        output = Path(options['output'] or settings.BENCHMARK_RESULTS_DIR /
+                      f"{current['commit'] or time.strftime('%Y%m%d-%H%M%S')}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
+
+        # The services log and survive graph errors, so the run itself succeeds
+        if unhandled:
+            raise CommandError(f"The memory graph has no handler for {len(unhandled)} queries, the results "
+                               f"do not measure them: {', '.join(unhandled)}")
+
+        if baseline is not None:
+            if baseline.get("config") != current["config"]:
+                self.stdout.write(self.style.WARNING(
+                    f"The baseline ran with different stand-in settings: {baseline.get('config')}"))
+            rows = compare(baseline, current, tolerance=options['tolerance'])
+            for row in rows:
+                line = (f"{row['benchmark']} {row['metric']}: {row['baseline']:.3f} -> {row['current']:.3f} ms "
+                        f"({row['change'] * 100:+.1f}%)")
+                self.stdout.write(self.style.ERROR(line) if row['regressed'] else line)
+            regressed = sorted({row['benchmark'] for row in rows if row['regressed']})
+            if regressed:
+                raise CommandError(f"Regressed beyond {options['tolerance'] * 100:.0f}%: {', '.join(regressed)}")
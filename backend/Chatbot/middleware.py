@@ -0,0 +1,82 @@
+import json
+from django.conf import settings
+from django.http import JsonResponse
+from utils import tracing
+from utils.admission import admission, SHED_REQUESTS
+
+
+class ServerTimingMiddleware:
+    """
+    Traces a sample of requests, reporting their stages in a `Server-Timing`
+    header and in the per-stage latency histograms.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace, token = tracing.start_trace(settings.TRACING_SAMPLE_RATE)
+        if trace is None:
+            return self.get_response(request)
+
+        try:
+            with tracing.span("total"):
+                response = self.get_response(request)
+        finally:
+            tracing.end_trace(token)
+
+        response["Server-Timing"] = trace.server_timing()
+        trace.observe()
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load on the LLM-backed endpoints before any work is done: a
+    per-user token bucket (429), a per-endpoint token bucket and a global
+    concurrency ceiling (503), all with a `Retry-After` header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        endpoint = next((prefix for prefix in settings.ADMISSION_CONTROL if request.path.startswith(prefix)), None)
+        if endpoint is None:
+            return self.get_response(request)
+
+        limits = settings.ADMISSION_CONTROL[endpoint]
+        allowed, wait = admission.take_token(f"{endpoint}:user:{self.client_id(request)}",
+                                             limits["user_rate"], limits["user_burst"])
+        if not allowed:
+            return self.shed(endpoint, "user_rate", 429, wait)
+
+        allowed, wait = admission.take_token(f"{endpoint}:endpoint", limits["endpoint_rate"], limits["endpoint_burst"])
+        if not allowed:
+            return self.shed(endpoint, "endpoint_rate", 503, wait)
+
+        slot = admission.acquire_slot(settings.ADMISSION_MAX_CONCURRENCY, settings.ADMISSION_SLOT_LEASE)
+        if slot is None:
+            return self.shed(endpoint, "concurrency", 503, settings.ADMISSION_RETRY_AFTER)
+        try:
+            return self.get_response(request)
+        finally:
+            admission.release_slot(slot)
+
+    def client_id(self, request):
+        """Identify the caller by the `user_id` the API is called with, falling back to the client address."""
+        user_id = request.GET.get("user_id")
+        if user_id is None and request.content_type == "application/json":
+            try:
+                user_id = json.loads(request.body or b"{}").get("user_id")
+            except (ValueError, AttributeError):
+                user_id = None
+        if user_id is not None:
+            return f"user-{user_id}"
+        return f"addr-{request.META.get('REMOTE_ADDR', 'unknown')}"
+
+    def shed(self, endpoint, reason, status, retry_after):
+        SHED_REQUESTS.labels(endpoint=endpoint, reason=reason).inc()
+        response = JsonResponse({"error": "The server is busy, please retry later."}, status=status)
+        response["Retry-After"] = str(max(1, int(retry_after)))
+        return response
@@ -0,0 +1,178 @@
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import UserProvisioningOutbox
+
+
+def enqueue_users(users):
+    """
+    Queue Neo4j provisioning for users. Call inside the transaction that
+    creates the users so the rows commit (or roll back) together.
+
+    Args:
+        users (list): The CustomUser instances.
+
+    Returns:
+        list: The created outbox rows.
+    """
+    rows = UserProvisioningOutbox.objects.bulk_create([
+        UserProvisioningOutbox(user=user, email=user.email, username=user.username)
+        for user in users
+    ])
+    transaction.on_commit(drainer.schedule)
+    return rows
+
+
+class UserOutboxDrainer:
+    """
+    Writes pending outbox rows to Neo4j in batches, one UNWIND transaction
+    per batch, retrying failed batches with exponential backoff. After each
+    drain the next one is timed for the earliest pending row, so retries need
+    no further sign-up or external poller.
+    """
+
+    def __init__(self, batch_size=None, max_attempts=None, retry_delay=None):
+        """
+        Args:
+            batch_size (int): Users provisioned per Neo4j transaction.
+            max_attempts (int): Attempts before a row is marked failed.
+            retry_delay (float): Seconds before the first retry, doubled per attempt.
+        """
+        self.batch_size = batch_size or settings.USER_OUTBOX_BATCH_SIZE
+        self.max_attempts = max_attempts or settings.USER_OUTBOX_MAX_ATTEMPTS
+        self.retry_delay = retry_delay or settings.USER_OUTBOX_RETRY_DELAY
+        self._executor = None
+        self._scheduled = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-outbox")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Stop the background executor and the timed drain; later calls start them again."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def schedule(self):
+        """
+        Drain in the background. Calls made while a drain is already queued
+        are coalesced into it, so a burst of sign-ups becomes a few batches.
+        """
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.executor.submit(self._run)
+
+    def _run(self):
+        with self._lock:
+            self._scheduled = False
+        try:
+            self.drain_all()
+        except Exception as e:
+            logging.error(f"Failed to drain the user provisioning outbox: {e}")
+        self.schedule_next()
+
+    def schedule_next(self):
+        """
+        Time the next drain for when the earliest pending row is due, e.g.
+        once a failed batch's backoff has passed.
+        """
+        try:
+            next_due = (
+                UserProvisioningOutbox.objects
+                .filter(status=UserProvisioningOutbox.PENDING)
+                .order_by('available_at')
+                .values_list('available_at', flat=True)
+                .first()
+            )
+        except Exception as e:
+            logging.error(f"Failed to read the user provisioning outbox: {e}")
+            next_due = timezone.now() + timedelta(seconds=self.retry_delay)
+        if next_due is None:
+            return
+
+        # Due rows may be locked by another drainer; never spin on them
+        delay = max(settings.USER_OUTBOX_POLL_INTERVAL, (next_due - timezone.now()).total_seconds())
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.schedule)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def drain_all(self):
+        """
+        Drain batches until no row is due. A failed batch is pushed back by
+        its backoff and draining continues with the rows after it.
+
+        Returns:
+            int: The number of users provisioned.
+        """
+        total = 0
+        while True:
+            provisioned, claimed = self.drain()
+            total += provisioned
+            if claimed < self.batch_size:
+                return total
+
+    def drain(self):
+        """
+        Provision one batch of due rows.
+
+        Rows are locked with SKIP LOCKED for the duration of the batch, so
+        several drainers can run without provisioning a user twice.
+
+        Returns:
+            tuple: (users provisioned, rows claimed).
+        """
+        from chat_processor.user_graph_management import UserService
+
+        with transaction.atomic():
+            rows = list(
+                UserProvisioningOutbox.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=UserProvisioningOutbox.PENDING, available_at__lte=timezone.now())
+                .order_by('id')[:self.batch_size]
+            )
+            if not rows:
+                return 0, 0
+
+            users = [{"id": row.user_id, "email": row.email, "username": row.username} for row in rows]
+            try:
+                UserService().create_users(users)
+            except Exception as e:
+                logging.error(f"Failed to provision {len(rows)} users in Neo4j: {e}")
+                self._retry_later(rows, e)
+                return 0, len(rows)
+
+            UserProvisioningOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                status=UserProvisioningOutbox.DONE, processed_at=timezone.now(), last_error=''
+            )
+            return len(rows), len(rows)
+
+    def _retry_later(self, rows, error):
+        now = timezone.now()
+        for row in rows:
+            row.attempts += 1
+            row.last_error = f"{type(error).__name__}: {error}"
+            if row.attempts >= self.max_attempts:
+                row.status = UserProvisioningOutbox.FAILED
+            row.available_at = now + timedelta(seconds=self.retry_delay * 2 ** (row.attempts - 1))
+        UserProvisioningOutbox.objects.bulk_update(rows, ['attempts', 'last_error', 'status', 'available_at'])
+
+
+drainer = UserOutboxDrainer()
@@ -5,4 +5,14 @@ class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'email', 'username', 'first_name', 'is_active', 'is_staff', 'date_joined']
-        read_only_fields = ['id', 'is_active', 'is_staff', 'date_joined']
\ No newline at end of file
+        read_only_fields = ['id', 'is_active', 'is_staff', 'date_joined']
+
+
+class RecommendationPageSerializer(serializers.Serializer):
+    """Query parameters of a recommendation page request."""
+    user_id = serializers.IntegerField(min_value=1)
+    limit = serializers.IntegerField(min_value=1, default=10)
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    type = serializers.CharField(required=False, allow_blank=True)
+    status = serializers.CharField(required=False, allow_blank=True)
+    min_score = serializers.FloatField(required=False)
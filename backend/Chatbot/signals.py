@@ -2,11 +2,16 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import CustomUser
-from chat_processor.user_graph_management import UserService
+from chat_processor.user_graph_management import profile_changed
+from chat_processor.recommendation_store import materializer
+from .outbox import enqueue_users
 
 @receiver(post_save, sender=CustomUser)
 def create_user_in_neo4j(sender, instance, created, **kwargs):
     if created:
-        user_service = UserService()
-        user_service.create_user(instance.id, instance.email, instance.username)
-        user_service.close()
\ No newline at end of file
+        # Queued in the user's transaction and provisioned in batches after commit
+        enqueue_users([instance])
+
+@receiver(profile_changed)
+def refresh_recommendations(sender, user_id, version, **kwargs):
+    materializer.schedule(user_id)
@@ -0,0 +1,117 @@
+import time
+import uuid
+import unittest
+from unittest import mock
+import redis
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from utils.admission import AdmissionController
+from .middleware import AdmissionControlMiddleware
+
+
+def redis_client():
+    client = redis.Redis(host="127.0.0.1", port=6379, socket_connect_timeout=0.2)
+    try:
+        client.ping()
+    except redis.RedisError:
+        return None
+    return client
+
+
+REDIS = redis_client()
+
+
+@unittest.skipIf(REDIS is None, "needs a Redis server on 127.0.0.1:6379")
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.admission = AdmissionController(redis=REDIS)
+        self.admission.key_prefix = f"test-admission-{uuid.uuid4().hex}"
+        self.addCleanup(self.cleanup)
+
+    def cleanup(self):
+        keys = REDIS.keys(f"{self.admission.key_prefix}:*")
+        if keys:
+            REDIS.delete(*keys)
+
+    def test_burst_then_retry_after(self):
+        self.assertEqual(self.admission.take_token("user", rate=0.5, burst=2), (True, 0))
+        self.assertEqual(self.admission.take_token("user", rate=0.5, burst=2), (True, 0))
+        # One token refills in 2 seconds at 0.5 tokens per second
+        self.assertEqual(self.admission.take_token("user", rate=0.5, burst=2), (False, 2))
+
+    def test_bucket_refills(self):
+        self.assertTrue(self.admission.take_token("user", rate=20, burst=1)[0])
+        self.assertFalse(self.admission.take_token("user", rate=20, burst=1)[0])
+        time.sleep(0.1)
+        self.assertTrue(self.admission.take_token("user", rate=20, burst=1)[0])
+
+    def test_buckets_are_independent(self):
+        self.assertTrue(self.admission.take_token("a", rate=0.1, burst=1)[0])
+        self.assertTrue(self.admission.take_token("b", rate=0.1, burst=1)[0])
+
+    def test_concurrency_slots(self):
+        first = self.admission.acquire_slot(limit=1, lease=60)
+        self.assertTrue(first)
+        self.assertIsNone(self.admission.acquire_slot(limit=1, lease=60))
+        self.admission.release_slot(first)
+        self.assertTrue(self.admission.acquire_slot(limit=1, lease=60))
+
+
+class RedisUnavailableTests(SimpleTestCase):
+    def test_requests_are_admitted(self):
+        broken = mock.Mock()
+        broken.register_script.side_effect = redis.ConnectionError("refused")
+        admission = AdmissionController(redis=broken)
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(admission.take_token("user", rate=1, burst=1), (True, 0))
+            self.assertEqual(admission.acquire_slot(limit=1, lease=60), "")
+
+
+@override_settings(
+    ADMISSION_CONTROL={"/api/chat/": {"user_rate": 1, "user_burst": 1, "endpoint_rate": 1, "endpoint_burst": 1}},
+    ADMISSION_RETRY_AFTER=7,
+)
+class AdmissionControlMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = AdmissionControlMiddleware(lambda request: HttpResponse("ok"))
+        patcher = mock.patch("Chatbot.middleware.admission")
+        self.admission = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.admission.acquire_slot.return_value = "slot"
+
+    def post_chat(self, user_id=42):
+        return self.middleware(self.factory.post("/api/chat/", {"user_id": user_id, "reply": "hi"},
+                                                 content_type="application/json"))
+
+    def test_user_bucket_sheds_with_429_and_retry_after(self):
+        self.admission.take_token.return_value = (False, 3)
+        response = self.post_chat()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(self.admission.take_token.call_args.args[0], "/api/chat/:user:user-42")
+
+    def test_endpoint_bucket_sheds_with_503(self):
+        self.admission.take_token.side_effect = [(True, 0), (False, 0)]
+        response = self.post_chat()
+        self.assertEqual(response.status_code, 503)
+        # Never advertise an immediate retry
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_full_concurrency_sheds_with_503(self):
+        self.admission.take_token.return_value = (True, 0)
+        self.admission.acquire_slot.return_value = None
+        response = self.post_chat()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+
+    def test_admitted_request_releases_its_slot(self):
+        self.admission.take_token.return_value = (True, 0)
+        response = self.post_chat()
+        self.assertEqual(response.status_code, 200)
+        self.admission.release_slot.assert_called_once_with("slot")
+
+    def test_other_endpoints_are_not_limited(self):
+        response = self.middleware(self.factory.get("/api/ready/"))
+        self.assertEqual(response.status_code, 200)
+        self.admission.take_token.assert_not_called()
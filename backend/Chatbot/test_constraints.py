@@ -0,0 +1,68 @@
+import numpy as np
+from django.test import SimpleTestCase
+from chat_processor.compact_index import CompactEmbeddingIndex
+from chat_processor.constraints import RecommendationConstraints, airing_statuses
+
+FINISHED = ["Finished Airing", "finished_airing"]
+AIRING = ["Currently Airing", "currently_airing"]
+UPCOMING = ["Not yet aired", "not_yet_aired"]
+
+
+class AiringStatusTests(SimpleTestCase):
+    def test_answers_map_onto_catalog_statuses(self):
+        cases = {
+            "Currently Airing": AIRING,
+            "airing": AIRING,
+            "Ongoing shows": AIRING,
+            "Finished Airing": FINISHED,
+            "completed": FINISHED,
+            "Not yet aired": UPCOMING,
+            "finished_airing": FINISHED,
+            "finished or upcoming": FINISHED + UPCOMING,
+            "Finished, Currently Airing": FINISHED + AIRING,
+        }
+        for answer, statuses in cases.items():
+            with self.subTest(answer=answer):
+                self.assertEqual(airing_statuses(answer), statuses)
+
+    def test_answers_without_a_preference_do_not_filter(self):
+        for answer in ("No preference", "Both", "any", "Doesn't matter", "either is fine", "purple", "", None,
+                       "finished, airing, upcoming"):
+            with self.subTest(answer=answer):
+                self.assertEqual(airing_statuses(answer), [])
+
+
+class RecommendationConstraintsTests(SimpleTestCase):
+    def index(self):
+        rows = [
+            {"anime_id": 1, "status": "Finished Airing", "no_episodes": 12, "genres": ["Action"], "ratings": []},
+            {"anime_id": 2, "status": "currently_airing", "no_episodes": 0, "genres": ["Horror"], "ratings": []},
+            {"anime_id": 3, "status": "Currently Airing", "no_episodes": 50, "genres": ["Drama"],
+             "ratings": ["R - 17+ (violence & profanity)"]},
+            {"anime_id": 4, "status": "Not yet aired", "no_episodes": 12, "genres": ["Comedy"], "ratings": []},
+        ]
+        vectors = np.eye(4, dtype=np.float32)
+        return CompactEmbeddingIndex(mode="float16").fit([1, 2, 3, 4], vectors).set_attributes(rows)
+
+    def test_no_preference_keeps_every_status(self):
+        constraints = RecommendationConstraints.from_profile({"anime_airing_status": "No preference"})
+        self.assertIsNone(constraints.query_params()["statuses"])
+        self.assertEqual(constraints.row_filter(self.index()).tolist(), [True, True, True, True])
+
+    def test_row_filter_matches_both_status_spellings(self):
+        constraints = RecommendationConstraints.from_profile({"anime_airing_status": "airing"})
+        self.assertEqual(constraints.query_params()["statuses"], sorted(AIRING))
+        self.assertEqual(constraints.row_filter(self.index()).tolist(), [False, True, True, False])
+
+    def test_profile_constraints_combine(self):
+        profile = {"u": {"anime_airing_status": "Currently Airing", "anime_max_episodes": "at most 24",
+                         "genres_disliked_genres": "Horror", "user_age": 15}}
+        constraints = RecommendationConstraints.from_profile(profile, user_items=["Anime:4"])
+        self.assertEqual(constraints.excluded_anime_ids, [4])
+        self.assertEqual(constraints.max_episodes, 24)
+        # Horror is disliked and the R-rated series is too long and unsuitable
+        self.assertEqual(constraints.row_filter(self.index()).tolist(), [False, False, False, False])
+
+        constraints = RecommendationConstraints.from_profile({"anime_airing_status": "finished or upcoming"},
+                                                             user_items=["Anime:4"])
+        self.assertEqual(constraints.row_filter(self.index()).tolist(), [True, False, False, False])
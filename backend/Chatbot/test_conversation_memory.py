@@ -0,0 +1,39 @@
+from unittest import mock
+from django.core.cache import cache
+from chat_processor.conversation_memory import ConversationMemory, SESSION_HISTORY_KEY, SUMMARY_KEY
+from .testcases import LocalCacheTestCase
+
+
+class ConversationMemoryTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.memory = ConversationMemory(raw_turns=1, summarize_every=1, turn_chars=100)
+        summary, history = self.memory.load(1)
+        for number in range(3):
+            self.memory.append(history, summary, f"question {number}", f"answer {number}")
+        cache.set(SESSION_HISTORY_KEY.format(user_id=1), history)
+
+    def refresh(self, during=None):
+        def invoke(task, prompt):
+            if during:
+                during()
+            return "likes mecha"
+
+        with mock.patch("chat_processor.model_router.model_router.invoke", side_effect=invoke):
+            return self.memory.refresh(1)
+
+    def test_refresh_folds_old_turns(self):
+        self.assertEqual(self.refresh(), {"text": "likes mecha", "through": 2})
+        summary, history = self.memory.load(1)
+        self.assertEqual(summary["through"], 2)
+        self.assertEqual(self.memory.window(history, summary), [{"system": "question 2", "user": "answer 2"}])
+
+    def test_clear_during_refresh_discards_the_summary(self):
+        self.assertIsNone(self.refresh(during=lambda: self.memory.clear(1)))
+        self.assertIsNone(cache.get(SUMMARY_KEY.format(user_id=1)))
+        self.assertEqual(self.memory.load(1), ({"text": "", "through": 0}, []))
+
+    def test_clears_keep_bumping_the_generation(self):
+        self.memory.clear(1)
+        self.memory.clear(1)
+        self.assertEqual(self.memory.generation(1), 2)
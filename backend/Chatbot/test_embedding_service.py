@@ -0,0 +1,45 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from chat_processor.embedding_service import EmbeddingService
+from utils.resilience import DependencyError, DependencyTimeout
+
+
+class EmbeddingServiceTests(SimpleTestCase):
+    def service(self, embed):
+        client = mock.Mock()
+        client.embed.side_effect = embed
+        return EmbeddingService("test-embed", window_ms=20, client=client), client
+
+    def test_concurrent_texts_share_a_batch(self):
+        service, client = self.service(lambda model, input, keep_alive: {"embeddings": [[len(t)] for t in input]})
+        futures = [service.submit("a"), service.submit("bb")]
+        self.assertEqual([future.result(5) for future in futures], [[len("query: a")], [len("query: bb")]])
+        self.assertEqual(client.embed.call_count, 1)
+        # Served from the cache afterwards
+        self.assertEqual(service.embed_query("a"), [len("query: a")])
+        self.assertEqual(client.embed.call_count, 1)
+
+    def test_short_batch_fails_every_waiter(self):
+        service, client = self.service(lambda model, input, keep_alive: {"embeddings": [[1.0]]})
+        futures = [service.submit("a"), service.submit("b")]
+        with self.assertLogs(level="ERROR"):
+            for future in futures:
+                with self.assertRaises(DependencyError):
+                    future.result(5)
+        self.assertEqual(service._inflight, {})
+
+        # A later request for the same text starts a new batch
+        client.embed.side_effect = lambda model, input, keep_alive: {"embeddings": [[2.0]]}
+        self.assertEqual(service.embed_query("a", timeout=5), [2.0])
+
+    def test_failed_batch_fails_every_waiter(self):
+        service, client = self.service(ConnectionError("ollama down"))
+        with self.assertLogs(level="ERROR"), self.assertRaises(DependencyError):
+            service.embed_query("a", timeout=5)
+        self.assertEqual(service._inflight, {})
+
+    def test_waiting_is_bounded(self):
+        service, client = self.service(lambda model, input, keep_alive: {"embeddings": [[1.0]]})
+        with mock.patch.object(service, "_ensure_worker"), self.settings(EMBEDDING_TIMEOUT=0.05):
+            with self.assertRaises(DependencyTimeout):
+                service.embed_query("never batched")
@@ -0,0 +1,74 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from benchmarks.environment import shutdown_background_work
+from benchmarks.memory_graph import MemoryGraph, MemoryGraphDriver, UnhandledQueryError
+from chat_processor.candidate_fetch import CandidateFetcher
+from chat_processor.constraints import RecommendationConstraints
+from chat_processor.preference_vector import preference_updater
+from chat_processor.recommendation_engine import PREFERRED_GENRE_RELATION
+from chat_processor.similar_anime import SimilarAnimeGraph
+from chat_processor.user_graph_management import UserService
+from utils.graph_store import GraphStore
+from .testcases import LocalCacheTestCase
+
+
+class ProductionQueriesTests(LocalCacheTestCase):
+    """The benchmarks only measure what the memory graph answers, so every production query must have a handler."""
+
+    def setUp(self):
+        super().setUp()
+        self.graph = MemoryGraph(anime=50, dims=8)
+        self.driver = MemoryGraphDriver(self.graph)
+        for target in ("chat_processor.user_graph_management.preference_updater", "Chatbot.signals.materializer"):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_user_queries(self):
+        service = UserService(driver=self.driver)
+        service.create_user(1, "user@example.com", "user")
+        service.create_users([{"id": 2, "email": "other@example.com", "username": "other"}])
+        service.update_variable(1, "genres_preferred_genres", "Action")
+        service.update_relationship(1, PREFERRED_GENRE_RELATION, "Genre", "Action")
+        service.record_favorites(1, ["Anime 3"])
+        service.blend_preference_vector(1, [1.0] * 8, 0.5)
+        self.assertIsNotNone(service.get_user_profile(1))
+        self.assertEqual(service.get_profile_version(1), (3, 1))
+        self.assertEqual(len(service.get_preference_vector(1)), 8)
+        self.assertEqual(dict(self.graph.unhandled), {})
+
+    def test_catalog_queries(self):
+        similar = SimilarAnimeGraph(self.driver)
+        similar.ensure_index()
+        with self.assertLogs(level="INFO"):
+            similar.rebuild(k=5)
+        self.assertTrue(similar.neighbours(3))
+        self.assertEqual(similar.seed_candidates(1), {})
+
+        fetcher = CandidateFetcher(self.driver)
+        fetcher.ensure_indexes()
+        query = self.graph.anime[3]["embedded_text"]
+        constraints = RecommendationConstraints(excluded_anime_ids=[3])
+        scanned = fetcher.fetch_candidates(query, preferred_genres=["Action", "Drama"], limit=10,
+                                           constraints=constraints)
+        # Re-scoring the same IDs by ID ranks them identically
+        rescored = fetcher.rescore_candidates(query, [row["anime_id"] for row in scanned] + [3], limit=10,
+                                              constraints=constraints)
+        self.assertEqual(rescored, scanned)
+        self.assertEqual(len(fetcher.fetch_attributes()), 50)
+        self.assertEqual(set(fetcher.hydrate([1, 2])), {1, 2})
+        self.assertEqual(dict(self.graph.unhandled), {})
+
+    def test_unhandled_query_fails_loudly(self):
+        with self.assertLogs(level="WARNING"), self.assertRaises(UnhandledQueryError):
+            GraphStore(self.driver).read("MATCH (n:Studio) RETURN n")
+        self.assertEqual(sum(self.graph.unhandled.values()), 1)
+
+
+class ShutdownBackgroundWorkTests(SimpleTestCase):
+    def test_queued_work_finishes_before_shutdown_returns(self):
+        with mock.patch.object(preference_updater, "_update") as update:
+            preference_updater.record(1, "preferred_genres: Action", 0.5)
+            shutdown_background_work()
+        update.assert_called_once_with(1, "preferred_genres: Action", 0.5)
+        self.assertIsNone(preference_updater._executor)
@@ -0,0 +1,65 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from chat_processor.model_router import ModelRouter
+from utils.resilience import DependencyError, dependency
+
+TIERS = {"small": "tiny", "medium": "mid", "large": "big"}
+
+ROUTES = {
+    "small_talk": {"tiers": ["medium", "small"], "p95_budget": 6.0, "queue_budget": 1.0},
+    "recommendation": {"tiers": ["medium", "small"], "escalate": "large", "p95_budget": 30.0, "queue_budget": 3.0},
+}
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter(routes=ROUTES, tiers=TIERS, window=10, window_seconds=300, probe_every=3)
+
+    def record(self, model, latency=None, queue_time=None, times=10):
+        for _ in range(times):
+            self.router.stats_for(model).record(latency=latency, queue_time=queue_time)
+
+    def test_prefers_the_first_tier(self):
+        self.assertEqual(self.router.choose("small_talk"), ("mid", "preferred"))
+
+    def test_moves_down_when_slow_or_queued(self):
+        self.record("mid", latency=7.0)
+        self.assertEqual(self.router.choose("small_talk"), ("tiny", "slow"))
+        self.router = ModelRouter(routes=ROUTES, tiers=TIERS, window=10, window_seconds=300)
+        self.record("mid", latency=1.0, queue_time=2.0)
+        self.assertEqual(self.router.choose("small_talk"), ("tiny", "queued"))
+
+    def test_unmeasured_escalation_tier_is_only_probed(self):
+        choices = [self.router.choose("recommendation") for _ in range(6)]
+        self.assertEqual(choices, [("mid", "preferred")] * 2 + [("big", "probe")]
+                         + [("mid", "preferred")] * 2 + [("big", "probe")])
+        self.assertEqual(ModelRouter(routes=ROUTES, tiers=TIERS, probe_every=0).choose("recommendation"),
+                         ("mid", "preferred"))
+
+    def test_escalates_only_within_budget(self):
+        self.record("big", latency=20.0, queue_time=0.5)
+        self.assertEqual(self.router.choose("recommendation"), ("big", "escalated"))
+        self.record("big", latency=40.0)
+        self.assertEqual(self.router.choose("recommendation"), ("mid", "preferred"))
+
+    def test_models_lists_escalation_tiers(self):
+        self.assertEqual(self.router.models(), ["mid", "tiny", "big"])
+
+    def test_invoke_uses_and_measures_the_routed_model(self):
+        llm = mock.Mock()
+        llm.invoke.return_value = "hello"
+        with mock.patch("chat_processor.model_router.get_llm", return_value=llm) as get_llm:
+            self.assertEqual(self.router.invoke("small_talk", "hi"), "hello")
+        get_llm.assert_called_once_with("mid")
+        llm.invoke.assert_called_once_with("hi")
+        self.assertEqual(self.router.stats_for("mid").summary()["samples"], 1)
+
+    def test_invoke_records_failures(self):
+        llm = mock.Mock()
+        llm.invoke.side_effect = ValueError("boom")
+        # The failure counts against the shared Ollama breaker
+        self.addCleanup(dependency("ollama").breaker.record_success)
+        with mock.patch("chat_processor.model_router.get_llm", return_value=llm):
+            with self.assertRaises(DependencyError):
+                self.router.invoke("small_talk", "hi")
+        self.assertEqual(self.router.stats_for("mid").summary()["samples"], 1)
@@ -0,0 +1,76 @@
+from contextlib import nullcontext
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from benchmarks.memory_graph import MemoryGraph, MemoryGraphDriver
+from chat_processor.user_graph_management import UserService
+from .models import CustomUser, UserProvisioningOutbox
+from .outbox import UserOutboxDrainer
+from .testcases import LocalCacheDatabaseTestCase
+
+
+class UserOutboxDrainerTests(TestCase):
+    def setUp(self):
+        for number in range(3):
+            CustomUser.objects.create_user(f"user{number}@example.com", f"user{number}")
+        self.drainer = UserOutboxDrainer(batch_size=1, max_attempts=3, retry_delay=30)
+
+    def drain(self, *outcomes):
+        failures = any(isinstance(outcome, Exception) for outcome in outcomes)
+        with mock.patch("chat_processor.user_graph_management.UserService") as service, \
+                (self.assertLogs(level="ERROR") if failures else nullcontext()):
+            service.return_value.create_users.side_effect = outcomes
+            return self.drainer.drain_all()
+
+    def test_failed_batch_does_not_stop_the_drain(self):
+        self.assertEqual(self.drain(ConnectionError("neo4j down"), None, None), 2)
+
+        failed = UserProvisioningOutbox.objects.get(status=UserProvisioningOutbox.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("neo4j down", failed.last_error)
+        self.assertGreater(failed.available_at, timezone.now())
+        self.assertEqual(UserProvisioningOutbox.objects.filter(status=UserProvisioningOutbox.DONE).count(), 2)
+
+    def test_next_drain_is_timed_for_the_earliest_pending_row(self):
+        self.drain(ConnectionError("neo4j down"), None, None)
+        with mock.patch("Chatbot.outbox.threading.Timer") as timer:
+            self.drainer.schedule_next()
+        delay, callback = timer.call_args.args
+        self.assertAlmostEqual(delay, 30, delta=2)
+        self.assertEqual(callback, self.drainer.schedule)
+        timer.return_value.start.assert_called_once()
+
+    def test_nothing_is_timed_once_drained(self):
+        self.drain(None, None, None)
+        with mock.patch("Chatbot.outbox.threading.Timer") as timer:
+            self.drainer.schedule_next()
+        timer.assert_not_called()
+
+    def test_rows_fail_after_the_last_attempt(self):
+        for _ in range(3):
+            UserProvisioningOutbox.objects.update(available_at=timezone.now())
+            self.drain(*[ConnectionError("neo4j down")] * 3)
+        self.assertEqual(UserProvisioningOutbox.objects.filter(status=UserProvisioningOutbox.FAILED).count(), 3)
+
+
+class ProfileWriteBeforeDrainTests(LocalCacheDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.create_user("early@example.com", "early")
+        self.graph = MemoryGraph(anime=10, dims=8)
+        self.service = UserService(driver=MemoryGraphDriver(self.graph))
+        for target in ("chat_processor.user_graph_management.preference_updater", "Chatbot.signals.materializer"):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_answers_survive_until_the_user_is_provisioned(self):
+        # The outbox row is still pending, e.g. while Neo4j was down
+        self.assertIsNotNone(self.service.update_variable(self.user.id, "anime_airing_status", "airing"))
+
+        with mock.patch("chat_processor.user_graph_management.UserService", return_value=self.service):
+            self.assertEqual(UserOutboxDrainer(batch_size=10).drain_all(), 1)
+        props = self.graph.users[self.user.id]["props"]
+        self.assertEqual(props["anime_airing_status"], "airing")
+        self.assertEqual((props["email"], props["username"]), ("early@example.com", "early"))
+        self.assertEqual(props["profile_version"], 1)
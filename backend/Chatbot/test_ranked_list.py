@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from chat_processor.ranked_list import RankedListCache, encode_cursor, decode_cursor, matches
+from .testcases import LocalCacheTestCase
+
+
+def candidate(anime_id, score=8.0, status="Finished Airing", types=("TV",)):
+    return {"anime_id": anime_id, "score": score, "status": status, "types": list(types),
+            "similarity": 0.5, "final_score": 0.5, "genres": []}
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        filters = {"type": "TV", "min_score": "7.5"}
+        self.assertEqual(decode_cursor(encode_cursor("abc123", 20, filters)), ("abc123", 20, filters))
+
+    def test_malformed_cursor_raises_value_error(self):
+        bad_position = encode_cursor("abc", "first", {})
+        for cursor in ("not base64!", "e30=", bad_position):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_filters(self):
+        anime = candidate(1, score=7.0, status="Currently Airing", types=("Movie",))
+        self.assertTrue(matches(anime, {}))
+        self.assertTrue(matches(anime, {"type": "Movie", "status": "Currently Airing", "min_score": "6.5"}))
+        self.assertFalse(matches(anime, {"type": "TV"}))
+        self.assertFalse(matches(anime, {"status": "Finished Airing"}))
+        self.assertFalse(matches(anime, {"min_score": "7.5"}))
+        self.assertFalse(matches(candidate(2, score=None), {"min_score": "1"}))
+
+
+class RankedListCacheTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = RankedListCache()
+        ranked = [candidate(anime_id, score=anime_id, types=("TV",) if anime_id % 2 else ("Movie",))
+                  for anime_id in range(1, 11)]
+        self.run_id = self.cache.save(1, ranked)
+        self.entry = self.cache.load(1)
+
+    def test_latest_run_is_loaded(self):
+        self.assertEqual(self.entry["run_id"], self.run_id)
+        self.assertEqual(self.cache.load(1, self.run_id), self.entry)
+        self.assertIsNone(self.cache.load(2))
+
+    def test_pages_follow_the_cursor_to_the_end(self):
+        seen, cursor, position, filters = [], None, 0, None
+        while True:
+            page, cursor = self.cache.page(self.entry, position, limit=3, filters=filters)
+            seen += [row["anime_id"] for row in page]
+            if cursor is None:
+                break
+            run_id, position, filters = decode_cursor(cursor)
+            self.assertEqual(run_id, self.run_id)
+        self.assertEqual(seen, list(range(1, 11)))
+
+    def test_filters_are_carried_in_the_cursor(self):
+        filters = {"type": "TV", "min_score": "4"}
+        page, cursor = self.cache.page(self.entry, 0, limit=2, filters=filters)
+        self.assertEqual([row["anime_id"] for row in page], [5, 7])
+
+        _, position, carried = decode_cursor(cursor)
+        self.assertEqual(carried, filters)
+        page, cursor = self.cache.page(self.entry, position, limit=2, filters=carried)
+        self.assertEqual([row["anime_id"] for row in page], [9])
+        self.assertIsNone(cursor)
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from unittest import mock
+from django.test import SimpleTestCase
+from benchmarks.memory_graph import MemoryGraph, MemoryGraphDriver
+from chat_processor.recommendation_engine import (
+    CollaborativeFilteringEngine, PREFERRED_GENRE_RELATION, fetch_user_items,
+)
+from chat_processor.similar_anime import FAVORITE_RELATION
+from chat_processor.user_graph_management import UserService
+from .testcases import LocalCacheTestCase
+
+# Fans of 1 also like 2; fans of 3 like 4; one user likes the Action genre with 1
+INTERACTIONS = [
+    (1, "Anime:1"), (1, "Anime:2"),
+    (2, "Anime:1"), (2, "Anime:2"), (2, "Genre:Action"),
+    (3, "Anime:3"), (3, "Anime:4"),
+    (4, "Anime:1"), (4, "Anime:3"),
+    (4, "Anime:1"),  # a retried read repeating a pair
+]
+
+
+class CollaborativeFilteringEngineTests(SimpleTestCase):
+    def setUp(self):
+        with self.assertLogs(level="INFO"):
+            self.engine = CollaborativeFilteringEngine().build(INTERACTIONS)
+
+    def similarity(self, first, second, engine=None):
+        engine = engine or self.engine
+        return engine.similarity[engine.item_index[first], engine.item_index[second]]
+
+    def test_cosine_co_occurrence(self):
+        # Anime 1 has 3 fans, anime 2 has 2, and they share 2
+        self.assertAlmostEqual(self.similarity("Anime:1", "Anime:2"), 2 / (3 ** 0.5 * 2 ** 0.5), places=5)
+        self.assertEqual(self.similarity("Anime:2", "Anime:4"), 0)
+        # Repeated pairs count once
+        self.assertAlmostEqual(self.similarity("Anime:1", "Anime:3"), 1 / (3 ** 0.5 * 2 ** 0.5), places=5)
+
+    def test_prune_keeps_the_strongest_neighbours(self):
+        with self.assertLogs(level="INFO"):
+            pruned = CollaborativeFilteringEngine(neighbours=2).build(INTERACTIONS)
+        row = pruned.similarity[pruned.item_index["Anime:1"]]
+        self.assertEqual(row.nnz, 2)
+        # Anime 3 (1/sqrt 6) loses to anime 2 (2/sqrt 6) and the Action genre (1/sqrt 3)
+        self.assertEqual({pruned.items[index] for index in row.indices}, {"Anime:2", "Genre:Action"})
+        self.assertAlmostEqual(self.similarity("Anime:1", "Anime:2", pruned), self.similarity("Anime:1", "Anime:2"))
+        self.assertEqual(pruned.recommend(["Anime:1"]), {2: 1.0})
+
+    def test_recommend_ranks_unseen_anime_only(self):
+        scores = self.engine.recommend(["Anime:1"])
+        self.assertEqual(list(scores), [2, 3])
+        self.assertEqual(scores[2], 1.0)
+        self.assertLess(scores[3], 1.0)
+        # Genres are inputs only, never candidates
+        self.assertEqual(self.engine.recommend(["Anime:2"]), {1: 1.0})
+        self.assertEqual(self.engine.recommend(["Anime:1"], k=1), {2: 1.0})
+        self.assertEqual(self.engine.recommend(["Anime:99"]), {})
+
+    def test_save_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cf_model.npz")
+            self.engine.save(path)
+            loaded = CollaborativeFilteringEngine.load(path)
+        self.assertEqual(loaded.neighbours, self.engine.neighbours)
+        self.assertEqual(list(loaded.items), list(self.engine.items))
+        self.assertEqual((loaded.similarity != self.engine.similarity).nnz, 0)
+        self.assertEqual(loaded.recommend(["Anime:1", "Genre:Action"]), self.engine.recommend(["Anime:1", "Genre:Action"]))
+
+
+class InteractionExportTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.driver = MemoryGraphDriver(MemoryGraph(anime=10, dims=8))
+        self.service = UserService(driver=self.driver)
+        for target in ("chat_processor.user_graph_management.preference_updater", "Chatbot.signals.materializer"):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_only_likes_are_interactions(self):
+        self.service.update_relationship(1, FAVORITE_RELATION, "Anime", "Anime 3")
+        self.service.update_relationship(1, PREFERRED_GENRE_RELATION, "Genre", "Action")
+        self.service.update_relationship(1, "DISLIKES", "Anime", "Anime 4")
+        self.assertEqual(sorted(fetch_user_items(self.driver, 1)), ["Anime:3", "Genre:Action"])
+        self.assertEqual(sorted(CollaborativeFilteringEngine().fetch_interactions(self.driver)),
+                         [(1, "Anime:3"), (1, "Genre:Action")])
@@ -0,0 +1,32 @@
+from rest_framework.test import APIRequestFactory
+from chat_processor.ranked_list import ranked_list_cache
+from .testcases import LocalCacheTestCase
+from .views.chat_views import RecommendationPageAPIView
+
+
+class RecommendationPageAPIViewTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.view = RecommendationPageAPIView.as_view()
+        ranked = [{"anime_id": anime_id, "score": 8.0, "status": "Finished Airing", "types": ["TV"],
+                   "similarity": 0.5, "final_score": 0.5, "genres": []} for anime_id in range(1, 4)]
+        ranked_list_cache.save(1, ranked, hydrated={anime_id: {"name": f"Anime {anime_id}"} for anime_id in range(1, 4)})
+
+    def get(self, **params):
+        return self.view(self.factory.get("/api/recommendations/", params))
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({}, {"user_id": "abc"}, {"user_id": "1", "limit": "0"}, {"user_id": "1", "limit": "-5"},
+                       {"user_id": "1", "limit": "ten"}, {"user_id": "1", "min_score": "high"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.get(user_id="1", cursor="not base64!").status_code, 400)
+
+    def test_valid_page(self):
+        response = self.get(user_id="1", limit="2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next_cursor"])
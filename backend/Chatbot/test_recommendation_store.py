@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import Future
+from unittest import mock
+from benchmarks.memory_graph import MemoryGraph, MemoryGraphDriver
+from chat_processor.ranked_list import ranked_list_cache
+from chat_processor.recommendation_store import RecommendationStore, RecommendationMaterializer
+from chat_processor.user_graph_management import UserService, profile_changed
+from .testcases import LocalCacheTestCase
+
+
+class RecommendationStoreTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = RecommendationStore()
+
+    def test_fresh_only_for_the_stored_stamp(self):
+        self.store.set(1, (3, 1), ["a"])
+        self.assertEqual(self.store.get_fresh(1, (3, 1))["recommendations"], ["a"])
+        self.assertIsNone(self.store.get_fresh(1, (4, 1)))
+        self.assertIsNone(self.store.get_fresh(1, (3, 2)))
+        self.assertIsNone(self.store.get_fresh(1, None))
+
+    def test_older_computation_never_overwrites_a_newer_one(self):
+        self.store.set(1, (3, 2), ["new"])
+        self.store.set(1, (3, 1), ["old"])
+        self.assertEqual(self.store.get(1)["recommendations"], ["new"])
+
+
+class ProfileVersionRaceTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = UserService(driver=MemoryGraphDriver(MemoryGraph(anime=10, dims=8)))
+        self.service.create_user(1, "user@example.com", "user")
+        self.store = RecommendationStore()
+        self.signals = []
+        profile_changed.connect(self.receive)
+        self.addCleanup(profile_changed.disconnect, self.receive)
+        # The real receiver would start a materialisation
+        patcher = mock.patch("Chatbot.signals.materializer")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def receive(self, sender, user_id, version, **kwargs):
+        self.signals.append(user_id)
+
+    def test_profile_change_is_sent_after_the_blend_lands(self):
+        blend = Future()
+        with mock.patch("chat_processor.user_graph_management.preference_updater") as updater:
+            updater.record.return_value = blend
+            self.service.update_variable(1, "genres_preferred_genres", "Action")
+        self.assertEqual(self.signals, [])
+
+        blend.set_result(None)
+        self.assertEqual(self.signals, [1])
+
+    def test_profile_change_without_blend_is_sent_at_once(self):
+        with mock.patch("chat_processor.user_graph_management.preference_updater") as updater:
+            self.service.update_variable(1, "basic_age", 20)
+        updater.record.assert_not_called()
+        self.assertEqual(self.signals, [1])
+
+    def test_list_computed_before_the_blend_is_stale_once_it_lands(self):
+        with mock.patch("chat_processor.user_graph_management.preference_updater") as updater:
+            updater.record.return_value = Future()
+            self.service.update_variable(1, "genres_preferred_genres", "Action")
+
+        # A materialisation reads the stamp between the profile write and the blend
+        stamp = self.service.get_profile_version(1)
+        self.store.set(1, stamp, ["ranked from the previous vector"])
+        self.service.blend_preference_vector(1, [1.0] * 8, 0.5)
+
+        current = self.service.get_profile_version(1)
+        self.assertNotEqual(current, stamp)
+        self.assertIsNone(self.store.get_fresh(1, current))
+
+
+class RecommendationMaterializerTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = RecommendationStore()
+        self.materializer = RecommendationMaterializer(store=self.store, delay=0.05)
+        self.addCleanup(self.materializer.shutdown)
+
+    def test_questionnaire_burst_is_one_run(self):
+        runs = []
+        with mock.patch.object(self.materializer, "materialize", side_effect=runs.append):
+            for _ in range(5):
+                self.materializer.schedule(1)
+            self.materializer.schedule(2)
+            time.sleep(0.5)
+            self.materializer.shutdown()
+        self.assertEqual(sorted(runs), [1, 2])
+
+    def test_background_run_leaves_the_paging_session_alone(self):
+        ranked_list_cache.save(1, [{"anime_id": 7, "final_score": 1.0}])
+        session = ranked_list_cache.load(1)["run_id"]
+
+        chat = mock.Mock()
+        chat.user_service.get_profile_version.return_value = (2, 0)
+        ranked = [{"anime_id": 3, "final_score": 0.9}]
+        chat.rank_and_hydrate.return_value = ("profile", ranked, {3: {"name": "Anime 3"}})
+        chat.explain.return_value = {"Recommendations": [{"name": "Anime 3"}]}
+        with mock.patch("chat_processor.mal_api.API_CALL") as api:
+            api.return_value.enrich_recommendations.side_effect = lambda recommendations: recommendations
+            self.materializer.materialize(1, chat=chat)
+
+        self.assertEqual(ranked_list_cache.load(1)["run_id"], session)
+        entry = self.store.get_fresh(1, (2, 0))
+        self.assertEqual(entry["recommendations"], [{"name": "Anime 3"}])
+        self.assertEqual(entry["ranked"], ranked)
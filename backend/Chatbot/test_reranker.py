@@ -0,0 +1,30 @@
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from chat_processor.reranker import HybridReranker
+
+WEIGHTS = {"cosine": 1.0, "genre": 0.0, "collaborative": 0.0, "score": 0.0, "popularity": 0.0, "dislike": 0.5}
+
+
+@override_settings(RERANKER_WEIGHTS=WEIGHTS, RERANKER_MMR_LAMBDA=0.5)
+class HybridRerankerTests(SimpleTestCase):
+    def test_reads_weights_from_settings(self):
+        reranker = HybridReranker(weights={"genre": 0.2})
+        self.assertEqual(reranker.weights, {**WEIGHTS, "genre": 0.2})
+        self.assertEqual(reranker.mmr_lambda, 0.5)
+        self.assertEqual(HybridReranker(mmr_lambda=0.0).mmr_lambda, 0.0)
+
+    def test_disliked_genres_are_penalised(self):
+        reranker = HybridReranker(mmr_lambda=1.0)
+        genres = [["Horror"], ["Comedy"], ["Horror", "Comedy"]]
+        selected, relevance = reranker.rerank([0.9, 0.8, 0.85], genres, (), disliked_genres=["Horror"], k=3)
+        # Penalised by the disliked share of each candidate's genres
+        np.testing.assert_allclose(relevance, [0.9 - 0.5, 0.8, 0.85 - 0.25], rtol=1e-6)
+        self.assertEqual(list(selected), [1, 2, 0])
+
+    def test_mmr_spreads_genres(self):
+        genres = [["Action"], ["Action"], ["Action"], ["Romance"]]
+        similarity = [0.9, 0.89, 0.88, 0.7]
+        by_relevance, _ = HybridReranker(mmr_lambda=1.0).rerank(similarity, genres, (), k=2)
+        self.assertEqual(list(by_relevance), [0, 1])
+        diverse, _ = HybridReranker().rerank(similarity, genres, (), k=2)
+        self.assertEqual(list(diverse), [0, 3])
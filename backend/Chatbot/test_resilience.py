@@ -0,0 +1,120 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from utils.resilience import CircuitBreaker, CircuitOpenError, Dependency, DependencyError, RetryBudget
+
+
+class Clock:
+    """A monotonic clock the tests move by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("utils.resilience.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def open(self):
+        with self.assertLogs(level="WARNING"):
+            for _ in range(3):
+                self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        with self.assertLogs(level="WARNING"):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.open()
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes(self):
+        self.open()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.open()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        with self.assertLogs(level="WARNING"):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        # The reset timeout counts from the failed probe
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow())
+
+
+class RetryBudgetTests(SimpleTestCase):
+    def test_budget_refills_over_time(self):
+        clock = Clock()
+        with mock.patch("utils.resilience.time.monotonic", clock):
+            budget = RetryBudget(ratio=0.5, min_per_second=1.0, window=2.0)
+            self.assertTrue(budget.withdraw())
+            self.assertTrue(budget.withdraw())
+            self.assertFalse(budget.withdraw())
+
+            budget.deposit()
+            budget.deposit()
+            self.assertTrue(budget.withdraw())
+            self.assertFalse(budget.withdraw())
+
+            clock.now += 1
+            self.assertTrue(budget.withdraw())
+
+
+class DependencyTests(SimpleTestCase):
+    def setUp(self):
+        self.dependency = Dependency("test", timeout=1, retries=2, backoff=0, failure_threshold=2)
+        self.addCleanup(self.dependency.executor.shutdown)
+
+    def test_open_circuit_short_circuits_without_calling(self):
+        func = mock.Mock(side_effect=ConnectionError("down"))
+        with self.assertLogs(level="WARNING"), self.assertRaises(DependencyError):
+            self.dependency.call(func, idempotent=True)
+        # The retries opened the circuit after the threshold
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(self.dependency.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self.dependency.call(func, idempotent=True)
+        self.assertEqual(func.call_count, 2)
+
+    def test_non_idempotent_calls_are_not_retried(self):
+        func = mock.Mock(side_effect=ConnectionError("down"))
+        with self.assertRaises(DependencyError):
+            self.dependency.call(func)
+        self.assertEqual(func.call_count, 1)
@@ -0,0 +1,61 @@
+from concurrent.futures import Future
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from chat_processor.chatbot import Chat
+from chat_processor.response_cache import SemanticResponseCache
+
+
+class SemanticResponseCacheTests(SimpleTestCase):
+    def test_explicit_zero_options_are_kept(self):
+        cache = SemanticResponseCache(threshold=0, ttl=0, max_turns=0)
+        self.assertEqual((cache.threshold, cache.ttl, cache.max_turns), (0, 0, 0))
+
+    def test_lookup_matches_within_the_bucket(self):
+        cache = SemanticResponseCache(threshold=0.9)
+        self.assertFalse(cache.has_entries("action"))
+        cache.store([1.0, 0.0], "action", "Seen any mecha?")
+        self.assertTrue(cache.has_entries("action"))
+        self.assertEqual(cache.lookup([0.99, 0.05], "action"), "Seen any mecha?")
+        self.assertIsNone(cache.lookup([0.0, 1.0], "action"))
+        self.assertIsNone(cache.lookup([1.0, 0.0], "comedy"))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class GenerateResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("chat_processor.chatbot.response_cache", SemanticResponseCache(threshold=0.9))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+        for target in ("chat_processor.chatbot.preference_updater", "chat_processor.chatbot.conversation_memory"):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.chat = Chat.__new__(Chat)
+        self.chat.user_id, self.chat.session_history, self.chat.summary = 1, [], {"text": "", "through": 0}
+        self.chat.embedder = mock.Mock()
+        self.chat.generate_question = mock.Mock(return_value={"question": "Which studio do you like?"})
+
+    def test_empty_bucket_skips_the_lookup_embedding(self):
+        embedded = Future()
+        self.chat.embedder.submit.return_value = embedded
+        self.assertEqual(self.chat.generate_response("Hi!", {}), {"question": "Which studio do you like?"})
+        self.chat.embedder.embed_query.assert_not_called()
+        self.assertEqual(self.cache.report()["miss"], 1)
+
+        # The question is stored once the background embedding lands
+        self.assertFalse(self.cache.has_entries("any"))
+        embedded.set_result([1.0, 0.0])
+        self.assertTrue(self.cache.has_entries("any"))
+
+    def test_filled_bucket_embeds_and_serves_the_cached_question(self):
+        self.cache.store([1.0, 0.0], "any", "Seen any mecha?")
+        self.chat.embedder.embed_query.return_value = [1.0, 0.0]
+        self.assertEqual(self.chat.generate_response("hi", {}), {"question": "Seen any mecha?"})
+        self.chat.generate_question.assert_not_called()
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled_cache_never_embeds(self):
+        self.chat.generate_response("hi", {})
+        self.chat.embedder.embed_query.assert_not_called()
+        self.chat.embedder.submit.assert_not_called()
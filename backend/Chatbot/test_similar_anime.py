@@ -0,0 +1,36 @@
+import numpy as np
+from django.test import SimpleTestCase
+from chat_processor.similar_anime import compute_neighbours
+
+
+class ComputeNeighboursTests(SimpleTestCase):
+    def brute_force(self, vectors, k):
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        similarity = normed @ normed.T
+        np.fill_diagonal(similarity, -np.inf)
+        indices = np.argsort(-similarity, axis=1, kind="stable")[:, :k]
+        return indices, np.take_along_axis(similarity, indices, axis=1)
+
+    def test_blocks_match_the_full_matrix(self):
+        vectors = np.random.default_rng(7).normal(size=(50, 8)).astype(np.float32)
+        expected_indices, expected_scores = self.brute_force(vectors, 5)
+        # Blocks that do not divide the row count, and a single block
+        for block_size in (7, 64):
+            indices, scores = compute_neighbours(vectors, k=5, block_size=block_size)
+            np.testing.assert_array_equal(indices, expected_indices)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_never_its_own_neighbour(self):
+        vectors = np.ones((4, 3), dtype=np.float32)  # all ties, itself included
+        indices, scores = compute_neighbours(vectors, k=10, block_size=3)
+        self.assertEqual(indices.shape, (4, 3))
+        for row, neighbours in enumerate(indices):
+            self.assertEqual(sorted(neighbours), [other for other in range(4) if other != row])
+        np.testing.assert_allclose(scores, 1.0, rtol=1e-6)
+
+    def test_zero_vectors_and_tiny_catalogs(self):
+        indices, scores = compute_neighbours(np.array([[0.0, 0.0], [1.0, 0.0]]), k=3)
+        self.assertEqual(indices.tolist(), [[1], [0]])
+        self.assertEqual(scores.tolist(), [[0.0], [0.0]])
+        indices, scores = compute_neighbours(np.array([[1.0, 0.0]]), k=3)
+        self.assertEqual(indices.shape, (1, 0))
@@ -0,0 +1,76 @@
+import time
+import threading
+from django.core.cache import cache
+from chat_processor.single_flight import SingleFlight, SingleFlightError
+from .testcases import LocalCacheTestCase
+
+
+class SingleFlightTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.flight = SingleFlight(lock_timeout=30, result_timeout=30, wait_timeout=5, poll_interval=0.01)
+
+    def lead_in_background(self, func):
+        started, outcome = threading.Event(), {}
+
+        def lead():
+            try:
+                outcome["value"] = self.flight.do("key", lambda: (started.set(), func())[1])
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=lead)
+        thread.start()
+        started.wait(5)
+        return thread, outcome
+
+    def test_waiter_shares_the_leader_result(self):
+        release = threading.Event()
+        thread, outcome = self.lead_in_background(lambda: release.wait(5) and "ranked")
+        calls = []
+        waiter = threading.Thread(target=lambda: calls.append(self.flight.do("key", lambda: "duplicate")))
+        waiter.start()
+        time.sleep(0.1)  # let the waiter attach to the in-flight leader
+        release.set()
+        thread.join(5)
+        waiter.join(5)
+        self.assertEqual(outcome["value"], "ranked")
+        self.assertEqual(calls, ["ranked"])
+        # Late duplicates within the result timeout share it too
+        self.assertEqual(self.flight.do("key", lambda: "recomputed"), "ranked")
+
+    def test_failure_reaches_attached_waiters_only(self):
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError("neo4j down")
+
+        thread, outcome = self.lead_in_background(fail)
+        errors = []
+
+        def wait():
+            try:
+                self.flight.do("key", lambda: "duplicate")
+            except SingleFlightError as e:
+                errors.append(str(e))
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.1)  # let the waiter attach to the in-flight leader
+        release.set()
+        thread.join(5)
+        waiter.join(5)
+        self.assertIsInstance(outcome["error"], RuntimeError)
+        self.assertEqual(errors, ["RuntimeError: neo4j down"])
+
+        # A retry arriving after the failure runs the work again
+        self.assertEqual(self.flight.do("key", lambda: "retried"), "retried")
+
+    def test_release_keeps_another_leaders_lock(self):
+        cache.set("singleflight_lock_key", "next-leader")
+        self.flight._release("singleflight_lock_key", "expired-leader")
+        self.assertEqual(cache.get("singleflight_lock_key"), "next-leader")
+
+        self.flight._release("singleflight_lock_key", "next-leader")
+        self.assertIsNone(cache.get("singleflight_lock_key"))
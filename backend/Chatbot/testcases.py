@@ -0,0 +1,23 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+# Tests never touch the configured Redis: each process gets its own cache
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class EmptyCacheMixin:
+    """Clears the cache before every test, so no test sees another's entries."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LocalCacheTestCase(EmptyCacheMixin, SimpleTestCase):
+    """A `SimpleTestCase` run against an empty local-memory cache."""
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LocalCacheDatabaseTestCase(EmptyCacheMixin, TestCase):
+    """A database `TestCase` run against an empty local-memory cache."""
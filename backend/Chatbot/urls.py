@@ -1,10 +1,21 @@
 from django.urls import path
-from .views.user_views import CustomUserListCreateAPIView, CustomUserDetailAPIView, UserProfileAPIView
-from .views.chat_views import ChatBotAPIView
+from .views.user_views import CustomUserListCreateAPIView, CustomUserBulkCreateAPIView, CustomUserDetailAPIView, UserProfileAPIView
+from .views.chat_views import ChatBotAPIView, RecommendationPageAPIView
+from .views.metrics_views import MetricsAPIView, QueryStatsAPIView, ModelRoutingAPIView, ResponseCacheAPIView
+from .views.health_views import ReadinessAPIView
+from .views.anime_views import SimilarAnimeAPIView
 
 urlpatterns = [
     path('users/', CustomUserListCreateAPIView.as_view(), name='user-list-create'),
+    path('users/bulk/', CustomUserBulkCreateAPIView.as_view(), name='user-bulk-create'),
     path('users/<int:pk>/', CustomUserDetailAPIView.as_view(), name='user-detail'),
     path('profile/', UserProfileAPIView.as_view(), name='user-profile'),
     path('chat/', ChatBotAPIView.as_view(), name='chat'),
+    path('recommendations/', RecommendationPageAPIView.as_view(), name='recommendation-pages'),
+    path('similar/<int:anime_id>/', SimilarAnimeAPIView.as_view(), name='similar-anime'),
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
+    path('metrics/queries/', QueryStatsAPIView.as_view(), name='query-stats'),
+    path('metrics/models/', ModelRoutingAPIView.as_view(), name='model-routing'),
+    path('metrics/response-cache/', ResponseCacheAPIView.as_view(), name='response-cache'),
+    path('ready/', ReadinessAPIView.as_view(), name='ready'),
 ]
\ No newline at end of file
@@ -0,0 +1,28 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from chat_processor.similar_anime import SimilarAnimeGraph
+from utils.neo4j_connection import Neo4jConnection
+from utils.tracing import span
+
+class SimilarAnimeAPIView(APIView):
+    """
+    API view serving the precomputed "more like this" neighbours of an anime.
+    """
+
+    def get(self, request, anime_id):
+        """
+        Retrieve the most similar anime.
+
+        Args:
+            request (Request): The request object, optionally with a `limit` query param.
+            anime_id (int): The ID of the anime.
+
+        Returns:
+            Response: The neighbouring anime, most similar first.
+        """
+        limit = min(int(request.query_params.get('limit', 10)), 50)
+        graph = SimilarAnimeGraph(Neo4jConnection().get_driver())
+        with span("neo4j.similar_anime"):
+            neighbours = graph.neighbours(anime_id, limit=limit)
+        return Response(neighbours, status=status.HTTP_200_OK)
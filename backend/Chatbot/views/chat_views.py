@@ -1,8 +1,16 @@
 from rest_framework import status
 from chat_processor.chatbot import Chat
-from chat_processor.mal_api import API_CALL
+from chat_processor.conversation_memory import conversation_memory
+from chat_processor.recommendation_store import materializer, recommendation_store
+from chat_processor.user_graph_management import UserService
+from chat_processor.candidate_fetch import CandidateFetcher
+from chat_processor.single_flight import single_flight, flight_key
+from chat_processor.ranked_list import ranked_list_cache, build_recommendation, decode_cursor
+from utils.neo4j_connection import Neo4jConnection
+from utils.tracing import span
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from ..serializers import RecommendationPageSerializer
 
 class ChatBotAPIView(APIView):
     """
@@ -22,34 +30,118 @@ class ChatBotAPIView(APIView):
         user_id = int(request.data.get('user_id'))
         user_reply = request.data.get('reply', '')
 
-        # Initialize the chat instance with Redis-based session history
-        chat = Chat(user_id=user_id)
-        mal_api = API_CALL()
-
         # Check for /recommend command
         if user_reply == "/recommend":
-            response = chat.chat(req_user=user_id, category=None, user_req=user_reply)
-            
-            print(user_id)
-            for recommendation in response["Recommendations"]:
-                url, synopsis = mal_api.anime_data(recommendation["title"])
-                recommendation["image_url"] = url
-                recommendation["synopsis"] = synopsis
-            
-            response = response["Recommendations"]
-            # Reset session history after generating recommendations
-            chat.reset_session_history()
-        elif user_reply == "":
-            # Generate response for empty user input
-            response = chat.chat(req_user=user_id, category=None, user_req="Hello")
+            # Double-clicks and retries share the first request's result
+            response = single_flight.do(flight_key("recommend", user_id), lambda: self.recommend(user_id))
+        else:
+            # Initialize the chat instance with Redis-based session history
+            chat = Chat(user_id=user_id)
+
+            # Generate response for user input, greeting on empty input
+            response = chat.chat(req_user=user_id, category=None, user_req=user_reply or "Hello")
 
             # Save the updated session history back to Redis
             chat.save_session_history()
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    def recommend(self, user_id):
+        """
+        Serve the user's materialised recommendations, computing them on demand
+        when the stored list is missing or stale, or when the user has chatted
+        since the last /recommend.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            list: The enriched recommendation list.
+        """
+        service = UserService()
+        try:
+            version = service.get_profile_version(user_id)
+        finally:
+            service.close()
+
+        # The stored list knows nothing of the conversation, whose preference
+        # blends may also still be queued, so chats are ranked from it on demand
+        with span("redis.session_history"):
+            summary, history = conversation_memory.load(user_id)
+        entry = None
+        if not history and not summary["text"]:
+            with span("redis.recommendation_store"):
+                entry = recommendation_store.get_fresh(user_id, version)
+        if entry is None:
+            entry = materializer.materialize(user_id)
+
+        # Further pages follow the list the user was just shown
+        with span("redis.ranked_list"):
+            ranked_list_cache.save(user_id, entry["ranked"], hydrated=entry["hydrated"])
+
+        # Reset the conversation after generating recommendations
+        with span("redis.session_history"):
+            conversation_memory.clear(user_id)
+        return entry["recommendations"]
+
+class RecommendationPageAPIView(APIView):
+    """
+    API view paging through the user's cached ranked recommendation list.
+    """
+
+    def get(self, request):
+        """
+        Retrieve a page of recommendations.
+
+        Args:
+            request (Request): The request with `user_id` and optionally `cursor`,
+                `limit`, `type`, `status` and `min_score` query params.
+
+        Returns:
+            Response: The page results and the cursor of the next page, if any.
+        """
+        params = RecommendationPageSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_id = params.validated_data['user_id']
+        limit = min(params.validated_data['limit'], 50)
+        cursor = params.validated_data.get('cursor')
+
+        if cursor:
+            try:
+                run_id, position, filters = decode_cursor(cursor)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            entry = ranked_list_cache.load(user_id, run_id)
+            if entry is None:
+                return Response({"error": "Cursor expired, request the first page again"},
+                                status=status.HTTP_410_GONE)
         else:
-            # Generate response for normal user input
-            response = chat.chat(req_user=user_id, category=None, user_req=user_reply)
-            
-            # Save the updated session history back to Redis
-            chat.save_session_history()
+            position = 0
+            filters = {
+                key: request.query_params.get(key)
+                for key in ('type', 'status', 'min_score')
+                if request.query_params.get(key) not in (None, '')
+            }
+            entry = ranked_list_cache.load(user_id) or self.rank(user_id)
 
-        return Response(response, status=status.HTTP_200_OK)
\ No newline at end of file
+        candidates, next_cursor = ranked_list_cache.page(entry, position, limit, filters)
+
+        # Only the anime on this page that no earlier page hydrated hit Neo4j
+        missing = [candidate["anime_id"] for candidate in candidates
+                   if candidate["anime_id"] not in entry["hydrated"]]
+        if missing:
+            with span("neo4j.hydrate"):
+                metadata = CandidateFetcher(Neo4jConnection().get_driver()).hydrate(missing)
+            ranked_list_cache.add_hydrated(user_id, entry, metadata)
+
+        results = [build_recommendation(candidate, entry["hydrated"].get(candidate["anime_id"], {}))
+                   for candidate in candidates]
+        return Response({"results": results, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
+    def rank(self, user_id):
+        """Rank a fresh candidate list when the cached one has expired."""
+        chat = Chat(user_id=user_id)
+        user_profile = chat.user_service.get_user_profile(user_id)
+        ranked_list_cache.save(user_id, chat.rank_candidates(user_profile))
+        return ranked_list_cache.load(user_id)
@@ -0,0 +1,22 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from chat_processor.warmup import warmup
+
+class ReadinessAPIView(APIView):
+    """
+    API view reporting whether this worker has finished warming up.
+    """
+
+    def get(self, request):
+        """
+        Report warm-up status for readiness probes.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The warm-up status, 200 when ready and 503 otherwise.
+        """
+        code = status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(warmup.status(), status=code)
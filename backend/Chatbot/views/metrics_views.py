@@ -0,0 +1,80 @@
+from django.http import HttpResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from utils.query_log import query_log
+from chat_processor.model_router import model_router
+from chat_processor.response_cache import response_cache
+
+class MetricsAPIView(APIView):
+    """
+    API view exposing metrics in the Prometheus text format.
+    """
+
+    def get(self, request):
+        """
+        Render every registered metric.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            HttpResponse: The metrics in Prometheus exposition format.
+        """
+        return HttpResponse(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+
+class QueryStatsAPIView(APIView):
+    """
+    API view reporting the heaviest Neo4j query shapes seen by this worker.
+    """
+
+    def get(self, request):
+        """
+        Retrieve per-fingerprint query statistics.
+
+        Args:
+            request (Request): The request object, optionally with `n` and `sort` query params.
+
+        Returns:
+            Response: The top query fingerprints with their aggregated stats.
+        """
+        n = int(request.query_params.get('n', query_log.top_n))
+        sort = request.query_params.get('sort', 'total_ms')
+        if sort not in ('total_ms', 'max_ms', 'count', 'rows'):
+            return Response({"error": f"Cannot sort by {sort}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(query_log.top(n, key=sort), status=status.HTTP_200_OK)
+
+class ModelRoutingAPIView(APIView):
+    """
+    API view reporting the current chat model routes and recent per-model latency.
+    """
+
+    def get(self, request):
+        """
+        Report the model router state, for tuning tiers and latency budgets.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The chosen model per task and each model's recent p50/p95 latency and queue time.
+        """
+        return Response(model_router.report())
+
+class ResponseCacheAPIView(APIView):
+    """
+    API view reporting the semantic response cache of this worker.
+    """
+
+    def get(self, request):
+        """
+        Report the cache's lookups by result, hit rate and size, for tuning its threshold.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The cache report.
+        """
+        return Response(response_cache.report())
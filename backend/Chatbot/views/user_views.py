@@ -1,11 +1,15 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from ..models import CustomUser
 from ..serializers import CustomUserSerializer
+from ..outbox import enqueue_users
 from chat_processor.chatbot import Chat
 from chat_processor.user_graph_management import UserService
+from chat_processor.constraints import as_list
+from chat_processor.single_flight import single_flight, flight_key
 
 class CustomUserListCreateAPIView(APIView):
     """
@@ -38,11 +42,43 @@ class CustomUserListCreateAPIView(APIView):
         print(request.data)
         serializer = CustomUserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # The Neo4j provisioning outbox row commits with the user
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         print(serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class CustomUserBulkCreateAPIView(APIView):
+    """
+    API view to import many users at once.
+    """
+    def post(self, request):
+        """
+        Create a list of users in one transaction. Their Neo4j nodes are
+        provisioned in batches through the outbox once the import commits.
+
+        Args:
+            request (Request): The request object containing a list of user data.
+
+        Returns:
+            Response: A response object containing serialized user data or errors.
+        """
+        serializer = CustomUserSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                # bulk_create skips post_save, so the outbox rows are written here
+                users = CustomUser.objects.bulk_create(
+                    [CustomUser(**data) for data in serializer.validated_data]
+                )
+                enqueue_users(users)
+        except IntegrityError as e:
+            return Response({"error": f"Import rejected: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(CustomUserSerializer(users, many=True).data, status=status.HTTP_201_CREATED)
+
 class CustomUserDetailAPIView(APIView):
     """
     API view to retrieve, update, or delete a user by ID.
@@ -110,9 +146,13 @@ class UserProfileAPIView(APIView):
             Response: A response object containing questions.
         """
         user_id = int(request.data.get('user_id'))
-        chat = Chat(user_id=user_id)
         category = request.data.get('category')
-        questions = chat.chat(req_user=user_id, category=category, user_req=None)
+
+        def generate():
+            chat = Chat(user_id=user_id)
+            return chat.chat(req_user=user_id, category=category, user_req=None)
+
+        questions = single_flight.do(flight_key("profile_questions", user_id, category), generate)
         questions = questions[category]
         return Response(questions, status=status.HTTP_200_OK)
 
@@ -131,6 +171,9 @@ class UserProfileAPIView(APIView):
         user_id = int(request.data.get('user_id'))
         for key, value in request.data.get('fields').items():
             service.update_variable(user_id=user_id, field_name=f"{request.data.get('category')}_{key}", value=value)
+            if key == "favorite_anime":
+                # Also as relationships, which seed similar-anime candidates
+                service.record_favorites(user_id, as_list(value))
 
         return Response(status=status.HTTP_202_ACCEPTED)
     
\ No newline at end of file
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import random
+import platform
+import tempfile
+import statistics
+import subprocess
+from utils.tracing import start_trace, end_trace
+from chat_processor.model_router import percentile
+from .memory_graph import GENRES, TYPES, SOURCES, RATINGS
+
+REPLIES = ["Hello", "I love mecha!", "Not much, you?", "Work was long.", "I just finished Frieren.",
+           "Anything with a good mystery", "I'm into sports anime lately", "hi"]
+
+
+def sample_profile(rng):
+    return {
+        "preferred_genres": rng.sample(GENRES, 3),
+        "favorite_anime": [f"Anime {rng.randint(1, 500)}" for _ in range(2)],
+        "themes": rng.sample(["friendship", "revenge", "coming of age", "found family", "time travel"], 2),
+        "experience_level": rng.choice(["beginner", "casual", "veteran"]),
+    }
+
+
+def sample_history(rng, turns):
+    return [{"system": f"Question {turn}?", "user": rng.choice(REPLIES), "turn": turn} for turn in range(1, turns + 1)]
+
+
+def create_user(user_id):
+    from chat_processor.user_graph_management import UserService
+    UserService().create_users([{"id": user_id, "email": f"bench{user_id}@example.com", "username": f"bench{user_id}"}])
+
+
+def profile_embedding(rng, iterations):
+    """`Chat.prepare_user_profile_embedding` over a full profile and history window."""
+    from chat_processor.chatbot import Chat
+    chat = Chat(rng.randint(10 ** 6, 10 ** 7))
+    profile, history = sample_profile(rng), sample_history(rng, 12)
+    summary = {"text": "The user likes " + ", ".join(profile["preferred_genres"]) + ".", "through": 4}
+    return lambda: chat.prepare_user_profile_embedding(profile, history, summary)
+
+
+def generate_response(rng, iterations):
+    """`Chat.generate_response` through the model router and the stub model."""
+    from chat_processor.chatbot import Chat
+    user_id = rng.randint(10 ** 6, 10 ** 7)
+    create_user(user_id)
+    chat, profile = Chat(user_id), sample_profile(rng)
+    return lambda: chat.generate_response(rng.choice(REPLIES), profile)
+
+
+def similarity_search(rng, iterations):
+    """`Chat.similarity_search`: embed, retrieve, re-rank, hydrate and the LLM pass."""
+    from chat_processor.chatbot import Chat
+    user_id = rng.randint(10 ** 6, 10 ** 7)
+    create_user(user_id)
+    chat, profile = Chat(user_id), sample_profile(rng)
+    return lambda: chat.similarity_search(profile)
+
+
+def mal_enrichment(rng, iterations, count=10):
+    """`API_CALL.enrich_recommendations` of a page against the stub MAL."""
+    from chat_processor.mal_api import API_CALL
+    api, batches = API_CALL(), iter(range(iterations * 2))
+
+    def run():
+        # Fresh titles per call, so results shared by single flight are not reused
+        batch = next(batches)
+        return api.enrich_recommendations([{"title": f"Bench Title {batch}-{index}"} for index in range(count)])
+    return run
+
+
+def dataloader_batch(rng, iterations, rows=200, dims=768):
+    """`Neo4JDataloader.process_data_in_batches` of a synthetic CSV frame."""
+    import pandas as pd
+    from utils.dataloader import Neo4JDataloader
+    from utils.neo4j_connection import Neo4jConnection
+
+    checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.txt")
+    loader = Neo4JDataloader(checkpoint_file=checkpoint, driver=Neo4jConnection().get_driver())
+    batches = iter(range(iterations * 2))
+
+    def frame(offset):
+        return pd.DataFrame([{
+            "anime_id": offset + index, "Name": f"Loaded {offset + index}", "Synopsis": "A loaded story.",
+            "Episodes": 12, "Aired": "2020", "Status": "Finished Airing", "Duration": "24 min",
+            "Score": 7.5, "Image URL": "https://cdn.example/loaded.jpg", "Genres": ", ".join(rng.sample(GENRES, 2)),
+            "Type": rng.choice(TYPES), "Source": rng.choice(SOURCES), "Rating": rng.choice(RATINGS),
+            "embedded_text": json.dumps([rng.random() for _ in range(dims)]),
+        } for index in range(rows)])
+
+    def run():
+        df = frame(10 ** 6 * (next(batches) + 1))
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        loader.process_data_in_batches(df)
+        return rows
+    return run
+
+
+BENCHMARKS = {
+    "profile_embedding": (profile_embedding, 200),
+    "similarity_search": (similarity_search, 1),
+    "mal_enrichment": (mal_enrichment, 1),
+    "dataloader_batch": (dataloader_batch, 1),
+    "generate_response": (generate_response, 1),
+}
+
+
+def measure(setup, iterations, inner=1, seed=0, warmup=1):
+    """
+    Time a benchmark, tracing each sample to break it down by stage.
+
+    Args:
+        setup (callable): Called with (rng, iterations); returns the operation to time.
+        iterations (int): Samples to take.
+        inner (int): Operations per sample, for sub-millisecond operations.
+        seed (int): Seed of the sample data.
+        warmup (int): Untimed samples taken first.
+
+    Returns:
+        dict: Per-operation latency in milliseconds and the mean time per stage.
+    """
+    rng = random.Random(seed)
+    operation = setup(rng, iterations + warmup)
+    for _ in range(warmup):
+        operation()
+
+    samples, stages = [], {}
+    for _ in range(iterations):
+        trace, token = start_trace(1.0)
+        start = time.perf_counter()
+        try:
+            for _ in range(inner):
+                operation()
+        finally:
+            end_trace(token)
+        samples.append((time.perf_counter() - start) * 1000 / inner)
+        for stage, seconds in trace.totals().items():
+            stages.setdefault(stage, []).append(seconds * 1000 / inner)
+
+    return {
+        "iterations": iterations,
+        "inner": inner,
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "stages_ms": {stage: statistics.mean(values) for stage, values in stages.items()},
+    }
+
+
+def run_suite(names=None, iterations=10, seed=0):
+    """
+    Run the component benchmarks. Call inside an `OfflineEnvironment`.
+
+    Args:
+        names (list): Benchmarks to run, every one if omitted.
+        iterations (int): Samples per benchmark.
+        seed (int): Seed of the sample data.
+
+    Returns:
+        dict: Results by benchmark name; benchmarks whose optional
+        dependencies are not installed are marked as skipped.
+    """
+    results = {}
+    # generate_response queues background preference updates, so it runs last
+    for name, (setup, inner) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            results[name] = measure(setup, iterations, inner=inner, seed=seed)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, config):
+    """Wrap results with what is needed to compare them across commits."""
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance=0.1, metrics=("p50_ms", "p95_ms")):
+    """
+    Compare two reports benchmark by benchmark.
+
+    Args:
+        baseline (dict): The earlier report.
+        current (dict): The new report.
+        tolerance (float): Relative slow-down tolerated before flagging a regression.
+        metrics (tuple): The latency statistics compared.
+
+    Returns:
+        list: One dict per benchmark and metric with the change and whether it regressed.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None or "skipped" in before or "skipped" in result:
+            continue
+        for metric in metrics:
+            change = result[metric] / before[metric] - 1 if before[metric] else 0.0
+            rows.append({"benchmark": name, "metric": metric, "baseline": before[metric],
+                         "current": result[metric], "change": change, "regressed": change > tolerance})
+    return rows
@@ -0,0 +1,97 @@
+import os
+import tempfile
+from contextlib import ExitStack
+from django.test.utils import override_settings
+from .stubs import StubOllama, StubMAL
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class OfflineEnvironment:
+    """
+    Runs the chat services in this process against local stand-ins: stub
+    Ollama and MAL servers, an in-memory graph and a local-memory cache.
+
+    Must be entered before anything creates the Neo4j driver, the Ollama
+    clients or the embedding service, since they read their endpoints once.
+    """
+
+    def __init__(self, ollama_latency=0.2, tokens_per_second=60.0, ollama_parallel=4, embed_latency=0.01,
+                 mal_latency=0.05, anime=2000, dims=768, graph_latency_ms=0.0, seed=0):
+        """
+        Args:
+            ollama_latency (float): Seconds before a generation's first token.
+            tokens_per_second (float): Stub generation speed.
+            ollama_parallel (int): Concurrent stub generations.
+            embed_latency (float): Seconds per stub embedding batch.
+            mal_latency (float): Seconds per stub MAL request.
+            anime (int): Size of the synthetic catalog.
+            dims (int): Embedding dimensions.
+            graph_latency_ms (float): Simulated round trip per graph query.
+            seed (int): Seed of the synthetic catalog.
+        """
+        self.ollama = StubOllama(latency=ollama_latency, tokens_per_second=tokens_per_second,
+                                 parallel=ollama_parallel, embed_latency=embed_latency, dims=dims)
+        self.mal = StubMAL(latency=mal_latency)
+        self.neo4j_uri = f"memory://?anime={anime}&dims={dims}&seed={seed}&latency_ms={graph_latency_ms}"
+        self.config = {
+            "ollama_latency": ollama_latency, "tokens_per_second": tokens_per_second,
+            "ollama_parallel": ollama_parallel, "embed_latency": embed_latency, "mal_latency": mal_latency,
+            "anime": anime, "dims": dims, "graph_latency_ms": graph_latency_ms, "seed": seed,
+        }
+        self._stack = None
+
+    @property
+    def environ(self):
+        """The environment variables pointing the services at the stand-ins."""
+        return {"OLLAMA_HOST": self.ollama.url, "MAL_API_URL": self.mal.api_url, "NEO4J_URI": self.neo4j_uri}
+
+    @property
+    def graph(self):
+        from utils.neo4j_connection import Neo4jConnection
+        return Neo4jConnection().get_driver().graph
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(self.ollama)
+        self._stack.enter_context(self.mal)
+        previous = {key: os.environ.get(key) for key in self.environ}
+        os.environ.update(self.environ)
+        self._stack.callback(restore_environ, previous)
+
+        # No trained CF model or compact index, so results do not depend on
+        # whatever the data directory holds
+        data_dir = self._stack.enter_context(tempfile.TemporaryDirectory())
+        self._stack.enter_context(override_settings(
+            CACHES=LOCAL_CACHES,
+            CF_MODEL_PATH=os.path.join(data_dir, "cf_model.npz"),
+            COMPACT_INDEX_PATH=os.path.join(data_dir, "compact_index.npz"),
+        ))
+        # Closed first: background work queued by the run finishes against
+        # the stand-ins, not the real Redis and Neo4j once settings revert
+        self._stack.callback(shutdown_background_work)
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+
+def shutdown_background_work():
+    """Drain and stop the services' background executors, upstream ones first."""
+    from chat_processor.preference_vector import preference_updater
+    from chat_processor.recommendation_store import materializer
+    from chat_processor.conversation_memory import conversation_memory
+    from Chatbot.outbox import drainer
+    from utils.query_log import query_log
+
+    # A landed preference blend schedules a materialisation, which logs queries
+    for service in (preference_updater, conversation_memory, drainer, materializer, query_log):
+        service.shutdown()
+
+
+def restore_environ(previous):
+    for key, value in previous.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
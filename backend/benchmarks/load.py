@@ -0,0 +1,191 @@
+import time
+import random
+import logging
+import threading
+import requests
+from chat_processor.model_router import percentile
+from .memory_graph import GENRES
+from .components import REPLIES
+
+ENDPOINTS = ("signup", "profile_questions", "profile_update", "chat", "recommend")
+
+# Profile questions the load-test server is started with
+QUESTIONS = {
+    "anime": [
+        {"question": "Which genres do you enjoy the most?", "type": "multiple_choice", "Options": GENRES,
+         "var_name": "preferred_genres"},
+        {"question": "What is your favorite anime?", "type": "text", "Options": [], "var_name": "favorite_anime"},
+    ],
+    "personal": [
+        {"question": "How old are you?", "type": "number", "Options": [], "var_name": "age"},
+        {"question": "What do you do when you are not watching anime?", "type": "text", "Options": [],
+         "var_name": "hobbies"},
+    ],
+}
+
+
+class EndpointStats:
+    """Latencies and outcomes of one endpoint during a stage."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, status):
+        with self._lock:
+            self.latencies.append(seconds)
+            if status in (429, 503):
+                self.shed += 1
+            elif status is None or status >= 400:
+                self.errors += 1
+
+    def summary(self, duration):
+        with self._lock:
+            latencies, errors, shed = list(self.latencies), self.errors, self.shed
+        count = len(latencies)
+        return {
+            "requests": count,
+            "throughput_rps": count / duration if duration else 0.0,
+            "errors": errors,
+            "shed": shed,
+            "error_rate": (errors + shed) / count if count else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+
+class VirtualUser(threading.Thread):
+    """
+    Runs simulated sessions back to back until stopped: sign up, answer the
+    profile questions, chat for a few turns and ask for recommendations.
+    """
+
+    def __init__(self, base_url, stats, stop, chat_turns=3, think_time=0.0, timeout=120, seed=0, prefix="load"):
+        super().__init__(daemon=True, name=f"{prefix}u{seed}")
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.stop = stop
+        self.chat_turns = chat_turns
+        self.think_time = think_time
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.sessions = 0
+        self.http = requests.Session()
+
+    def call(self, endpoint, method, path, payload):
+        start = time.perf_counter()
+        status, body = None, None
+        try:
+            response = self.http.request(method, f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            status = response.status_code
+            if response.ok and response.content:
+                body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logging.debug(f"{endpoint} failed: {e}")
+        self.stats[endpoint].record(time.perf_counter() - start, status)
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+        return status, body
+
+    def answer(self, question):
+        if question.get("Options"):
+            return self.rng.sample(question["Options"], min(2, len(question["Options"])))
+        if question.get("var_name") == "favorite_anime":
+            return f"Anime {self.rng.randint(1, 500)}"
+        return self.rng.choice(REPLIES)
+
+    def session(self):
+        name = f"{self.name}s{self.sessions}r{self.rng.randrange(10 ** 9)}"
+        status, user = self.call("signup", "POST", "/api/users/", {"email": f"{name}@example.com", "username": name})
+        if status != 201:
+            return False
+        user_id = user["id"]
+
+        for category in QUESTIONS:
+            if self.stop.is_set():
+                return False
+            # The profile endpoint reads the user and category from the body
+            status, questions = self.call("profile_questions", "GET", "/api/profile/",
+                                          {"user_id": user_id, "category": category})
+            fields = {question["var_name"]: self.answer(question)
+                      for question in (questions if isinstance(questions, list) else QUESTIONS[category])
+                      if isinstance(question, dict) and question.get("var_name")}
+            self.call("profile_update", "POST", "/api/profile/",
+                      {"user_id": user_id, "category": category, "fields": fields})
+
+        for _ in range(self.chat_turns):
+            if self.stop.is_set():
+                return False
+            self.call("chat", "POST", "/api/chat/", {"user_id": user_id, "reply": self.rng.choice(REPLIES)})
+
+        status, _ = self.call("recommend", "POST", "/api/chat/", {"user_id": user_id, "reply": "/recommend"})
+        return status == 200
+
+    def run(self):
+        while not self.stop.is_set():
+            if self.session():
+                self.sessions += 1
+
+
+def run_stage(base_url, concurrency, duration, chat_turns=3, think_time=0.0, timeout=120, seed=0):
+    """
+    Keep `concurrency` virtual users running sessions for `duration` seconds.
+
+    Sessions still running at the end finish their current request and are
+    dropped, so only requests started within the stage are measured.
+
+    Returns:
+        dict: Per-endpoint throughput, error rates and latency percentiles.
+    """
+    stats = {endpoint: EndpointStats() for endpoint in ENDPOINTS}
+    stop = threading.Event()
+    users = [VirtualUser(base_url, stats, stop, chat_turns=chat_turns, think_time=think_time, timeout=timeout,
+                         seed=seed * 100003 + index, prefix=f"load{seed}c{concurrency}")
+             for index in range(concurrency)]
+    start = time.perf_counter()
+    for user in users:
+        user.start()
+    time.sleep(duration)
+    stop.set()
+    for user in users:
+        user.join(timeout)
+    elapsed = time.perf_counter() - start
+
+    endpoints = {endpoint: stats[endpoint].summary(elapsed) for endpoint in ENDPOINTS}
+    requests_total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "sessions": sum(user.sessions for user in users),
+        "throughput_rps": requests_total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def find_limit(stages, endpoint="chat", p95_budget_ms=10000, max_error_rate=0.01):
+    """
+    The lowest concurrency at which an endpoint misses its latency budget
+    or starts failing, and the stage with the highest total throughput.
+
+    Returns:
+        dict: {"falls_over_at": concurrency or None, "reason": str, "peak_throughput_at": concurrency}.
+    """
+    limit = {"falls_over_at": None, "reason": None, "peak_throughput_at": None}
+    if not stages:
+        return limit
+    limit["peak_throughput_at"] = max(stages, key=lambda stage: stage["throughput_rps"])["concurrency"]
+    for stage in stages:
+        stats = stage["endpoints"][endpoint]
+        if stats["error_rate"] > max_error_rate:
+            limit.update(falls_over_at=stage["concurrency"],
+                         reason=f"{endpoint} error rate {stats['error_rate'] * 100:.1f}%")
+            break
+        if stats["p95_ms"] > p95_budget_ms:
+            limit.update(falls_over_at=stage["concurrency"],
+                         reason=f"{endpoint} p95 {stats['p95_ms']:.0f} ms over the {p95_budget_ms:.0f} ms budget")
+            break
+    return limit
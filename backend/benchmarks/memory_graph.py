@@ -0,0 +1,491 @@
+import re
+import time
+import logging
+import threading
+import numpy as np
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from neo4j import Record, Bookmarks
+from utils.query_log import normalise_query, fingerprint
+
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance",
+          "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller", "Mecha", "Music", "Psychological"]
+
+TYPES = ["TV", "Movie", "OVA", "ONA", "Special"]
+
+SOURCES = ["Manga", "Light novel", "Original", "Visual novel", "Web manga"]
+
+RATINGS = ["G - All Ages", "PG - Children", "PG-13 - Teens 13 or older", "R - 17+ (violence & profanity)"]
+
+STATUSES = ["Finished Airing", "Currently Airing", "Not yet aired"]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class UnhandledQueryError(Exception):
+    """A query the memory graph has no handler for."""
+
+
+class MemorySummary:
+    """The parts of a driver ResultSummary that `utils.query_log` reads."""
+
+    def __init__(self, elapsed_ms, query_type):
+        self.result_available_after = int(elapsed_ms)
+        self.result_consumed_after = 0
+        self.query_type = query_type
+        self.plan = None
+        self.profile = None
+
+
+class MemoryResult:
+    def __init__(self, rows, summary):
+        self._records = [Record(row) for row in rows]
+        self._summary = summary
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self):
+        return [record.data() for record in self._records]
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return self._summary
+
+
+class MemoryTransaction:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.graph.run(query, {**(parameters or {}), **kwargs})
+
+
+class MemorySession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.graph.run(query, {**(parameters or {}), **kwargs})
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(MemoryTransaction(self.graph), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        with self.graph.lock:
+            return work(MemoryTransaction(self.graph), *args, **kwargs)
+
+    def last_bookmarks(self):
+        return Bookmarks()
+
+    def close(self):
+        pass
+
+
+class MemoryGraphDriver:
+    """
+    Stands in for `neo4j.Driver` over a `MemoryGraph`, so the services run
+    offline without a Neo4j server. Selected with a `memory://` NEO4J_URI.
+    """
+
+    _graphs = {}
+    _graphs_lock = threading.Lock()
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    @classmethod
+    def from_uri(cls, uri):
+        """
+        Return a driver over the graph a URI describes, shared by every
+        driver of the same URI, e.g. `memory://?anime=2000&dims=768&seed=0&latency_ms=1`.
+        """
+        options = {key: values[0] for key, values in parse_qs(urlparse(uri).query).items()}
+        with cls._graphs_lock:
+            if uri not in cls._graphs:
+                cls._graphs[uri] = MemoryGraph(
+                    anime=int(options.get("anime", 2000)),
+                    dims=int(options.get("dims", 768)),
+                    seed=int(options.get("seed", 0)),
+                    latency_ms=float(options.get("latency_ms", 0)),
+                )
+            return cls(cls._graphs[uri])
+
+    def session(self, **config):
+        return MemorySession(self.graph)
+
+    def verify_connectivity(self, **config):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryGraph:
+    """
+    An in-memory graph answering the Cypher queries this project issues,
+    matched by shape, over a synthetic catalog.
+
+    Each anime's embedding is a mix of its genres' centroids plus noise, so
+    similarity search behaves like on real data: anime sharing genres are
+    close. A query without a handler raises `UnhandledQueryError` and is
+    counted in `unhandled`, so a changed production query cannot silently
+    be measured against the wrong stand-in.
+    """
+
+    def __init__(self, anime=2000, dims=768, seed=0, latency_ms=0.0):
+        """
+        Args:
+            anime (int): Catalog size.
+            dims (int): Embedding dimensions.
+            seed (int): Seed of the synthetic catalog.
+            latency_ms (float): Simulated round trip per query.
+        """
+        self.dims = dims
+        self.latency = latency_ms / 1000
+        self.lock = threading.RLock()
+        self.anime = {}
+        self.users = {}
+        self.similar = {}
+        self.queries = Counter()
+        self.unhandled = Counter()
+        self._matrix = None
+        self._handlers = [(re.compile(pattern), getattr(self, name)) for pattern, name in self.HANDLERS]
+        self.generate(anime, seed)
+
+    HANDLERS = [
+        (r"^(PROFILE|EXPLAIN) ", "_plan"),
+        (r"^CREATE INDEX", "_noop"),
+        (r"gds\.similarity\.cosine", "_candidates"),
+        (r"UNWIND \$anime_ids AS anime_id", "_hydrate"),
+        (r"UNWIND \$users AS row MERGE \(u:User", "_create_users"),
+        (r"^CREATE \(u:User", "_create_user"),
+        (r"MERGE \(u\)-\[r:\w+\]->\(n\)", "_relate"),
+        (r"AS version, coalesce\(u\.preference_updates, 0\) AS updates$", "_version"),
+        (r"SET u\.preference_vector = .* u\.preference_updates", "_blend"),
+        (r"SET u\.\w+ = \$value", "_set_variable"),
+        (r"RETURN u\.preference_vector AS vector", "_preference_vector"),
+        (r"WHERE u\.preference_vector IS NOT NULL", "_recorded_profiles"),
+        (r"^MATCH \(u:User \{id: \$user_id\}\) RETURN u$", "_profile"),
+        (r"toLower\(anime\.name\) = toLower\(\$anime_name\)", "_anime_exists"),
+        (r"toLower\(genre\.name\) = toLower\(\$genre\)", "_genre_exists"),
+        (r"SIMILAR_TO \{score: neighbour\.score\}", "_write_neighbours"),
+        (r"max\(s\.score\) AS score", "_seed_candidates"),
+        (r"\(:Anime \{anime_id: \$anime_id\}\)-\[s:SIMILAR_TO\]", "_neighbours"),
+        (r"RETURN a\.anime_id AS anime_id, vector", "_embeddings"),
+        (r"^MATCH \(a:Anime\) RETURN a\.anime_id AS anime_id, a\.status AS status", "_attributes"),
+        (r"^MATCH \(u:User \{id: \$user_id\}\)-\[:([\w|]+)\]->\(n\)", "_user_items"),
+        (r"^MATCH \(u:User\)-\[:([\w|]+)\]->\(n\)", "_interactions"),
+        (r"^MERGE \(\w+:Anime \{anime_id: \$id", "_merge_anime"),
+        (r"MERGE \(\w+:(Genre|Type|Source|Rating) \{name: row\.\w+\}\)", "_link"),
+    ]
+
+    def generate(self, count, seed):
+        rng = np.random.default_rng(seed)
+        centroids = rng.standard_normal((len(GENRES), self.dims)).astype(np.float32)
+        for anime_id in range(1, count + 1):
+            genres = sorted(rng.choice(len(GENRES), size=rng.integers(1, 4), replace=False))
+            vector = centroids[genres].mean(axis=0) + 0.6 * rng.standard_normal(self.dims).astype(np.float32)
+            self.anime[anime_id] = {
+                "anime_id": anime_id,
+                "name": f"Anime {anime_id}",
+                "synopsis": f"A {' and '.join(GENRES[g].lower() for g in genres)} story, number {anime_id}.",
+                "image_url": f"https://cdn.example/{anime_id}.jpg",
+                "aired": f"{2000 + anime_id % 24}-04-01",
+                "status": STATUSES[int(rng.integers(len(STATUSES)))],
+                "duration": f"{int(rng.choice([12, 24, 24, 24, 45, 100]))} min per ep",
+                "no_episodes": int(rng.choice([1, 12, 12, 13, 24, 25, 50, 100])),
+                "score": round(float(rng.uniform(5.0, 9.2)), 2),
+                "embedded_text": (vector / np.linalg.norm(vector)).tolist(),
+                "genres": [GENRES[g] for g in genres],
+                "types": [TYPES[int(rng.integers(len(TYPES)))]],
+                "sources": [SOURCES[int(rng.integers(len(SOURCES)))]],
+                "ratings": [RATINGS[int(rng.integers(len(RATINGS)))]],
+            }
+
+    def run(self, query, params):
+        if self.latency:
+            time.sleep(self.latency)
+        start = time.perf_counter()
+        text = _WHITESPACE.sub(" ", query).strip()
+        for pattern, handler in self._handlers:
+            match = pattern.search(text)
+            if match:
+                self.queries[handler.__name__] += 1
+                with self.lock:
+                    rows = handler(params, match)
+                query_type = "r" if handler.__name__ in self.READS else "w"
+                return MemoryResult(rows, MemorySummary((time.perf_counter() - start) * 1000, query_type))
+
+        key = fingerprint(query)
+        if key not in self.unhandled:
+            logging.warning(f"Memory graph has no handler for query {key}: {normalise_query(query)}")
+        self.unhandled[key] += 1
+        raise UnhandledQueryError(f"Memory graph has no handler for query {key}")
+
+    READS = {"_plan", "_candidates", "_hydrate", "_preference_vector", "_recorded_profiles", "_version", "_profile",
+             "_anime_exists", "_genre_exists", "_seed_candidates", "_neighbours", "_embeddings", "_attributes", "_user_items",
+             "_interactions"}
+
+    # Catalog
+
+    @property
+    def matrix(self):
+        """The normalised embeddings as (anime IDs, matrix), rebuilt after catalog writes."""
+        if self._matrix is None:
+            ids = [anime_id for anime_id, anime in self.anime.items()
+                   if anime.get("embedded_text") and len(anime["embedded_text"]) == self.dims]
+            vectors = np.array([self.anime[anime_id]["embedded_text"] for anime_id in ids], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True) if len(ids) else np.ones((0, 1))
+            norms[norms == 0] = 1.0
+            self._matrix = (np.array(ids), vectors / norms if len(ids) else np.zeros((0, self.dims), np.float32))
+        return self._matrix
+
+    def _plan(self, params, match):
+        return []
+
+    def _noop(self, params, match):
+        return []
+
+    def _candidates(self, params, match):
+        ids, vectors = self.matrix
+        if not len(ids):
+            return []
+        if "anime_ids" in params:
+            # Re-scoring a known candidate set by ID
+            chosen = set(params["anime_ids"])
+
+            def candidate(anime_id):
+                return anime_id in chosen
+        else:
+            preferred = params.get("preferred_genres") or []
+            preferred = set([preferred] if isinstance(preferred, str) else preferred)
+            seeds = set(params.get("seed_anime_ids") or [])
+
+            def candidate(anime_id):
+                return anime_id in seeds or not preferred.isdisjoint(self.anime[anime_id]["genres"])
+        admissible = self._admissible(params)
+        mask = np.array([candidate(anime_id) and admissible(self.anime[anime_id]) for anime_id in ids])
+        query = np.asarray(params["queryEmbedding"], dtype=np.float32)
+        if not mask.any() or len(query) != self.dims:
+            return []
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = vectors[mask] @ query
+        order = np.argsort(-scores)[:params["limit"]]
+        rows = []
+        for index in order:
+            anime = self.anime[int(ids[mask][index])]
+            rows.append({"anime_id": anime["anime_id"], "score": anime["score"], "status": anime["status"],
+                         "similarity": float(scores[index]), "genres": list(anime["genres"]),
+                         "types": list(anime["types"])})
+        return rows
+
+    def _admissible(self, params):
+        """The constraint predicates of the candidate query, as a function of an anime."""
+        excluded_ids = set(params.get("excluded_anime_ids") or ())
+        statuses, max_episodes = params.get("statuses"), params.get("max_episodes")
+        excluded_genres = set(params.get("excluded_genres") or ())
+        excluded_ratings = set(params.get("excluded_ratings") or ())
+
+        def admissible(anime):
+            episodes = anime.get("no_episodes") if isinstance(anime.get("no_episodes"), int) else 0
+            return (anime["anime_id"] not in excluded_ids
+                    and (statuses is None or anime.get("status") in statuses)
+                    and (max_episodes is None or episodes <= 0 or episodes <= max_episodes)
+                    and excluded_genres.isdisjoint(anime["genres"])
+                    and excluded_ratings.isdisjoint(anime["ratings"]))
+        return admissible
+
+    def _attributes(self, params, match):
+        return [{"anime_id": anime["anime_id"], "status": anime.get("status"), "no_episodes": anime.get("no_episodes"),
+                 "genres": list(anime["genres"]), "ratings": list(anime["ratings"])} for anime in self.anime.values()]
+
+    def _hydrate(self, params, match):
+        fields = ("anime_id", "name", "synopsis", "image_url", "aired", "status", "duration", "no_episodes")
+        return [
+            {**{field: self.anime[anime_id].get(field) for field in fields},
+             "ratings": list(self.anime[anime_id]["ratings"]), "types": list(self.anime[anime_id]["types"]),
+             "sources": list(self.anime[anime_id]["sources"])}
+            for anime_id in params["anime_ids"] if anime_id in self.anime
+        ]
+
+    def _merge_anime(self, params, match):
+        anime_id = params["id"]
+        if anime_id not in self.anime:
+            fields = ("name", "synopsis", "no_episodes", "aired", "status", "duration", "score", "image_url")
+            self.anime[anime_id] = {"anime_id": anime_id, **{field: params.get(field) for field in fields},
+                                    "embedded_text": params.get("embedded_text") or params.get("embedding"),
+                                    "genres": [], "types": [], "sources": [], "ratings": []}
+            self._matrix = None
+        return []
+
+    def _link(self, params, match):
+        field = {"Genre": "genres", "Type": "types", "Source": "sources", "Rating": "ratings"}[match.group(1)]
+        key = {"Genre": "genre", "Type": "type", "Source": "source", "Rating": "rating"}[match.group(1)]
+        for row in params["batch"]:
+            anime = self.anime.get(row["anime_id"])
+            if anime is not None and row[key] not in anime[field]:
+                anime[field].append(row[key])
+        return []
+
+    def _anime_exists(self, params, match):
+        name = str(params["anime_name"]).lower()
+        for anime in self.anime.values():
+            if str(anime["name"]).lower() == name:
+                return [{"exists": True, "unique_id": f"anime:{anime['anime_id']}"}]
+        # Grouping by elementId of no match returns no row, as on Neo4j
+        return []
+
+    def _genre_exists(self, params, match):
+        name = str(params["genre"]).lower()
+        for genre in GENRES:
+            if genre.lower() == name:
+                return [{"exists": True, "unique_id": f"genre:{genre}"}]
+        return []
+
+    def _embeddings(self, params, match):
+        ids, vectors = self.matrix
+        return [{"anime_id": int(anime_id), "vector": self.anime[int(anime_id)]["embedded_text"]} for anime_id in ids]
+
+    def _write_neighbours(self, params, match):
+        for row in params["rows"]:
+            self.similar[row["anime_id"]] = [(neighbour["anime_id"], neighbour["score"])
+                                             for neighbour in row["neighbours"]]
+        return []
+
+    def _neighbours(self, params, match):
+        rows = []
+        for anime_id, score in sorted(self.similar.get(params["anime_id"], []), key=lambda item: -item[1]):
+            anime = self.anime[anime_id]
+            rows.append({"anime_id": anime_id, "title": anime["name"], "image_url": anime["image_url"],
+                         "score": anime["score"], "similarity": score})
+        return rows[:params["limit"]]
+
+    def _seed_candidates(self, params, match):
+        user = self.users.get(params["user_id"])
+        if user is None:
+            return []
+        related = {node for _, node in user["relations"]}
+        scores = {}
+        for relation, node in user["relations"]:
+            if relation != "favorite_anime" or not node.startswith("anime:"):
+                continue
+            for anime_id, score in self.similar.get(int(node.split(":", 1)[1]), []):
+                if f"anime:{anime_id}" not in related:
+                    scores[anime_id] = max(score, scores.get(anime_id, score))
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:params["limit"]]
+        return [{"anime_id": anime_id, "score": score} for anime_id, score in ranked]
+
+    # Users
+
+    def _create_user(self, params, match):
+        user = self._merge_user(params)
+        user["props"].update(email=params["email"], username=params["username"])
+        return [{"u": dict(user["props"])}]
+
+    def _create_users(self, params, match):
+        for row in params["users"]:
+            self._create_user({"user_id": row["id"], "email": row["email"], "username": row["username"]}, match)
+        return [{"id": row["id"]} for row in params["users"]]
+
+    def _user(self, params):
+        return self.users.get(params["user_id"])
+
+    def _merge_user(self, params):
+        return self.users.setdefault(params["user_id"], {
+            "props": {"id": params["user_id"], "profile_version": 0}, "relations": set()})
+
+    def _bump(self, user):
+        user["props"]["profile_version"] = user["props"].get("profile_version", 0) + 1
+
+    def _blend_into(self, user, vector, alpha):
+        if vector is None:
+            return
+        current = user["props"].get("preference_vector")
+        if current is None or len(current) != len(vector):
+            user["props"]["preference_vector"] = list(vector)
+        else:
+            user["props"]["preference_vector"] = [(1 - alpha) * old + alpha * new for old, new in zip(current, vector)]
+
+    def _node(self, element_id):
+        kind, _, key = str(element_id).partition(":")
+        if kind == "anime" and int(key) in self.anime:
+            anime = self.anime[int(key)]
+            return {field: value for field, value in anime.items() if field not in ("genres", "types", "sources", "ratings")}
+        if kind == "genre":
+            return {"name": key}
+        return None
+
+    def _relate(self, params, match):
+        node = self._node(params.get("related_node_id"))
+        if node is None:
+            return []
+        user = self._merge_user(params)
+        relation = re.search(r"\[r:(\w+)\]", match.group(0)).group(1)
+        user["relations"].add((relation, params["related_node_id"]))
+        self._blend_into(user, node.get("embedded_text"), params["alpha"])
+        self._bump(user)
+        return [{"u": dict(user["props"]), "r": {"type": relation}, "n": node}]
+
+    def _set_variable(self, params, match):
+        user = self._merge_user(params)
+        field = re.search(r"SET u\.(\w+) = \$value", match.string).group(1)
+        user["props"][field] = params["value"]
+        self._bump(user)
+        return [{"u": dict(user["props"])}]
+
+    def _blend(self, params, match):
+        user = self._user(params)
+        if user is None:
+            return []
+        self._blend_into(user, params["vector"], params["alpha"])
+        user["props"]["preference_updates"] = user["props"].get("preference_updates", 0) + 1
+        return [{"updates": user["props"]["preference_updates"]}]
+
+    def _preference_vector(self, params, match):
+        user = self._user(params)
+        return [{"vector": user["props"].get("preference_vector")}] if user else []
+
+    def _recorded_profiles(self, params, match):
+        return [
+            {"user_id": user_id, "vector": user["props"]["preference_vector"],
+             "genres": [node.split(":", 1)[1] for _, node in user["relations"] if node.startswith("genre:")]}
+            for user_id, user in self.users.items() if user["props"].get("preference_vector") is not None
+        ][:params["limit"]]
+
+    def _version(self, params, match):
+        user = self._user(params)
+        return [{"version": user["props"].get("profile_version", 0),
+                 "updates": user["props"].get("preference_updates", 0)}] if user else []
+
+    def _profile(self, params, match):
+        user = self._user(params)
+        return [{"u": dict(user["props"])}] if user else []
+
+    def _item_key(self, node):
+        kind, _, key = node.partition(":")
+        return f"Anime:{key}" if kind == "anime" else f"Genre:{key}"
+
+    def _user_items(self, params, match):
+        user = self._user(params)
+        if user is None:
+            return []
+        return [{"item": item} for item in self._liked_items(user, match.group(1).split("|"))]
+
+    def _interactions(self, params, match):
+        return [
+            {"user_id": user_id, "item": item}
+            for user_id, user in self.users.items()
+            for item in self._liked_items(user, match.group(1).split("|"))
+        ]
+
+    def _liked_items(self, user, relations):
+        return dict.fromkeys(self._item_key(node) for relation, node in user["relations"] if relation in relations)
@@ -0,0 +1,274 @@
+import time
+import numpy as np
+from django.conf import settings
+from utils.graph_store import GraphStore
+from chat_processor.candidate_fetch import CandidateFetcher
+from chat_processor.compact_index import CompactEmbeddingIndex, MODES, NEO4J_FLOAT_BYTES, normalise
+from chat_processor.model_router import percentile
+from chat_processor.similar_anime import SimilarAnimeGraph
+
+RECORDED_PROFILES_QUERY = """
+    MATCH (u:User)
+    WHERE u.preference_vector IS NOT NULL
+    RETURN u.id AS user_id, u.preference_vector AS vector,
+        [(u)-[]->(g:Genre) | g.name] AS genres
+    LIMIT $limit
+"""
+
+
+class Catalog:
+    """The full-precision catalog embeddings and the exact cosine ranking over them."""
+
+    def __init__(self, driver):
+        """
+        Args:
+            driver (neo4j.Driver): The Neo4j driver.
+        """
+        self.driver = driver
+        anime_ids, embeddings = SimilarAnimeGraph(driver).fetch_embeddings()
+        self.anime_ids = np.asarray(anime_ids, dtype=np.int64)
+        self.embeddings = embeddings
+        self.vectors = normalise(embeddings) if len(anime_ids) else embeddings
+        self.rows = {int(anime_id): row for row, anime_id in enumerate(self.anime_ids)}
+
+    def __len__(self):
+        return len(self.anime_ids)
+
+    @property
+    def dims(self):
+        return self.vectors.shape[1] if len(self) else 0
+
+    def similarity(self, query):
+        """Exact cosine similarity of a query to every anime."""
+        return self.vectors @ normalise(query)
+
+    def top_k(self, scores, k):
+        """Anime IDs of the k best scores, best first."""
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        return [int(anime_id) for anime_id in self.anime_ids[top[np.argsort(-scores[top])]]]
+
+    def genres(self, anime_ids):
+        """Genre names per anime, read with the production candidate query."""
+        rows = CandidateFetcher(self.driver).fetch_candidates(
+            self.embeddings[self.rows[anime_ids[0]]].tolist(), preferred_genres=[],
+            seed_anime_ids=anime_ids, limit=len(anime_ids),
+        )
+        return {row["anime_id"]: row["genres"] for row in rows}
+
+
+def synthetic_profiles(catalog, count, rng, neighbours=50, noise=0.3):
+    """
+    Build profiles around a few favorites each: a random anime and some of
+    its nearest neighbours, averaged with noise, so a profile sits in a
+    region of the catalog the way a real preference vector does.
+
+    Args:
+        catalog (Catalog): The catalog.
+        count (int): The number of profiles.
+        rng (np.random.Generator): The random source.
+        neighbours (int): Neighbourhood the other favorites are drawn from.
+        noise (float): Scale of the Gaussian noise relative to the unit mean.
+
+    Returns:
+        list: Profiles with source, vector, the favorites' genres and favorites.
+    """
+    profiles = []
+    if not len(catalog):
+        return profiles
+    for _ in range(count):
+        anchor = int(catalog.anime_ids[rng.integers(len(catalog))])
+        nearby = catalog.top_k(catalog.similarity(catalog.vectors[catalog.rows[anchor]]), neighbours)
+        favorites = [anchor] + [int(anime_id) for anime_id in
+                                rng.choice(nearby[1:], size=min(int(rng.integers(0, 5)), len(nearby) - 1),
+                                           replace=False)]
+        vector = normalise(catalog.vectors[[catalog.rows[anime_id] for anime_id in favorites]].mean(axis=0))
+        vector = vector + noise * rng.standard_normal(catalog.dims).astype(np.float32) / np.sqrt(catalog.dims)
+        genres = catalog.genres(favorites)
+        profiles.append({
+            "source": "synthetic",
+            "vector": normalise(vector).tolist(),
+            "genres": sorted({genre for anime_id in favorites for genre in genres.get(anime_id, [])}),
+            "favorites": favorites,
+        })
+    return profiles
+
+
+def recorded_profiles(driver, limit, dims):
+    """
+    Read stored user preference vectors and the genres the users picked.
+
+    Args:
+        driver (neo4j.Driver): The Neo4j driver.
+        limit (int): The maximum number of users.
+        dims (int): The catalog dimension; vectors of another model are skipped.
+
+    Returns:
+        list: Profiles with source, vector and genres.
+    """
+    records = GraphStore(driver).read(RECORDED_PROFILES_QUERY, limit=limit)
+    return [
+        {"source": "recorded", "user_id": record["user_id"], "vector": list(record["vector"]),
+         "genres": list(record["genres"])}
+        for record in records if len(record["vector"]) == dims
+    ]
+
+
+def exact_mode(catalog, k, candidates):
+    """The baseline: exact cosine over the full-precision catalog in memory."""
+    def search(profile):
+        return catalog.top_k(catalog.similarity(profile["vector"]), k)
+    memory = {"bytes_per_vector": catalog.dims * 4, "build_seconds": 0.0}
+    return search, memory
+
+
+def compact_mode(mode, dims=None, rescore=False):
+    """
+    The compact index in one encoding, alone or with its top candidates
+    re-scored at full precision as `similarity_search` does.
+    """
+    def setup(catalog, k, candidates):
+        start = time.perf_counter()
+        index = CompactEmbeddingIndex(mode=mode, dims=dims).fit(catalog.anime_ids, catalog.embeddings)
+        build_seconds = time.perf_counter() - start
+
+        def search(profile):
+            nearest = list(index.search(profile["vector"], k=candidates if rescore else k))
+            if not rescore:
+                return nearest
+            rows = [catalog.rows[anime_id] for anime_id in nearest]
+            scores = catalog.vectors[rows] @ normalise(profile["vector"])
+            return [nearest[position] for position in np.argsort(-scores)[:k]]
+        memory = index.memory_report()
+        return search, {"bytes_per_vector": memory["bytes_per_vector"], "dims": memory["dims"],
+                        "build_seconds": build_seconds}
+    return setup
+
+
+def graph_mode(compact=False):
+    """
+    The production candidate queries: with `compact`, the compact index's
+    nearest neighbours re-scored by ID in Neo4j, otherwise the fallback exact
+    cosine over the anime in the profile's genres.
+    """
+    def setup(catalog, k, candidates):
+        fetcher = CandidateFetcher(catalog.driver)
+        index = CompactEmbeddingIndex(mode=settings.COMPACT_INDEX_MODE, dims=settings.COMPACT_INDEX_DIMS).fit(
+            catalog.anime_ids, catalog.embeddings) if compact else None
+
+        def search(profile):
+            if compact:
+                nearest = index.search(profile["vector"], k=candidates)
+                rows = fetcher.rescore_candidates(profile["vector"], anime_ids=nearest, limit=k)
+            else:
+                rows = fetcher.fetch_candidates(profile["vector"], preferred_genres=profile["genres"], limit=k)
+            return [row["anime_id"] for row in rows]
+        return search, {"bytes_per_vector": catalog.dims * NEO4J_FLOAT_BYTES, "build_seconds": 0.0}
+    return setup
+
+
+def retrieval_modes(pca_dims=()):
+    """
+    Every retrieval configuration to evaluate, by name.
+
+    Args:
+        pca_dims (iterable): PCA dimensions to try the compact encodings with.
+
+    Returns:
+        dict: name -> setup(catalog, k, candidates) returning (search, memory).
+    """
+    modes = {"exact": exact_mode}
+    for mode in MODES:
+        for dims in (None, *pca_dims):
+            name = f"compact_{mode}" + (f"_pca{dims}" if dims else "")
+            modes[name] = compact_mode(mode, dims)
+            modes[f"{name}+rescore"] = compact_mode(mode, dims, rescore=True)
+    modes["graph_genre_filter"] = graph_mode()
+    modes["graph_compact+rescore"] = graph_mode(compact=True)
+    return modes
+
+
+def ndcg(found, exact_scores, ideal):
+    """
+    NDCG of a ranking, graded by each anime's exact cosine similarity.
+
+    Args:
+        found (list): Row indices returned, best first.
+        exact_scores (np.ndarray): Exact similarity of every row.
+        ideal (list): Row indices of the exact top-k, best first.
+
+    Returns:
+        float: 1.0 for the exact ranking.
+    """
+    discounts = 1 / np.log2(np.arange(2, len(ideal) + 2))
+    gains = np.clip(exact_scores, 0, None)
+    best = float(gains[ideal] @ discounts[:len(ideal)])
+    if not best:
+        return 1.0
+    return float(gains[found] @ discounts[:len(found)]) / best if found else 0.0
+
+
+def evaluate(catalog, profiles, modes, k=10, candidates=200):
+    """
+    Run each retrieval mode over the profiles against the exact cosine top-k.
+
+    Args:
+        catalog (Catalog): The catalog.
+        profiles (list): The profiles to query with.
+        modes (dict): name -> setup, as from `retrieval_modes`.
+        k (int): The cut-off of recall and NDCG.
+        candidates (int): Compact-index candidates re-scored.
+
+    Returns:
+        dict: Per mode recall@k and NDCG@k (overall and by profile source),
+            latency percentiles and memory per vector.
+    """
+    truths = []
+    for profile in profiles:
+        scores = catalog.similarity(profile["vector"])
+        ideal = [catalog.rows[anime_id] for anime_id in catalog.top_k(scores, k)]
+        truths.append((scores, ideal))
+
+    results = {}
+    for name, setup in modes.items():
+        search, memory = setup(catalog, k, candidates)
+        latencies, recalls, ndcgs, by_source = [], [], [], {}
+        for profile, (scores, ideal) in zip(profiles, truths):
+            start = time.perf_counter()
+            found = search(profile)[:k]
+            latencies.append((time.perf_counter() - start) * 1000)
+            rows = [catalog.rows[anime_id] for anime_id in found if anime_id in catalog.rows]
+            recall = len(set(rows) & set(ideal)) / len(ideal) if ideal else 1.0
+            gain = ndcg(rows, scores, ideal)
+            recalls.append(recall)
+            ndcgs.append(gain)
+            by_source.setdefault(profile["source"], []).append((recall, gain))
+
+        results[name] = {
+            "recall_at_k": float(np.mean(recalls)) if recalls else 0.0,
+            "ndcg_at_k": float(np.mean(ndcgs)) if ndcgs else 0.0,
+            "by_source": {
+                source: {"profiles": len(values),
+                         "recall_at_k": float(np.mean([recall for recall, _ in values])),
+                         "ndcg_at_k": float(np.mean([gain for _, gain in values]))}
+                for source, values in by_source.items()
+            },
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            **memory,
+        }
+    return results
+
+
+def choose(results, tolerance=0.02):
+    """
+    The fastest mode by p50 whose recall@k and NDCG@k are both within
+    `tolerance` of the exact baseline.
+
+    Returns:
+        str: The mode name, "exact" if no other mode qualifies.
+    """
+    qualifying = [name for name, result in results.items()
+                  if result["recall_at_k"] >= 1 - tolerance and result["ndcg_at_k"] >= 1 - tolerance]
+    return min(qualifying, key=lambda name: results[name]["p50_ms"], default="exact")
@@ -0,0 +1,293 @@
+import re
+import ast
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from chat_processor import prompts
+
+_TOKEN = re.compile(r"\s*\S{1,4}|\s+")
+
+_NAN = re.compile(r"\bnan\b")
+
+
+def text_seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+def tokenize(text):
+    """Split text into roughly token-sized chunks, about four characters each."""
+    return _TOKEN.findall(text) or [""]
+
+
+def stub_vector(text, dims):
+    """A deterministic unit vector per text."""
+    vector = np.random.default_rng(text_seed(text)).standard_normal(dims)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubServer:
+    """
+    A local HTTP server in a daemon thread that stands in for an external
+    service, counting the requests it serves.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        """
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port, any free port if 0.
+        """
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.count()
+                stub.handle_get(self)
+
+            def do_POST(self):
+                stub.count()
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.handle_post(self, body)
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except ConnectionError:
+                    # The client gave up, e.g. a load-test server shutting down mid-stream
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def handle_get(self, request):
+        send_json(request, {"error": "not found"}, status=404)
+
+    def handle_post(self, request, body):
+        send_json(request, {"error": "not found"}, status=404)
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self.handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def send_json(request, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    request.send_response(status)
+    request.send_header("Content-Type", "application/json")
+    request.send_header("Content-Length", str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
+
+
+class StubOllama(StubServer):
+    """
+    Stand-in for the Ollama HTTP API (`/api/generate`, `/api/embed` and the
+    legacy `/api/embeddings`).
+
+    Generations take `latency` seconds before the first token and then stream
+    at `tokens_per_second`; at most `parallel` run at once and the rest
+    queue, as with OLLAMA_NUM_PARALLEL. Completions are well-formed answers
+    for each prompt prefix of `chat_processor.prompts`, and embeddings are
+    deterministic unit vectors of the text.
+    """
+
+    def __init__(self, latency=0.2, tokens_per_second=60.0, parallel=4, embed_latency=0.01, dims=768, **kwargs):
+        """
+        Args:
+            latency (float): Seconds of prompt evaluation before the first token.
+            tokens_per_second (float): Generation speed, unlimited if 0.
+            parallel (int): Concurrent generations.
+            embed_latency (float): Seconds per embedding batch.
+            dims (int): Embedding dimensions.
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.embed_latency = embed_latency
+        self.dims = dims
+        self._slots = threading.BoundedSemaphore(parallel)
+
+    def handle_get(self, request):
+        if urlparse(request.path).path == "/api/tags":
+            send_json(request, {"models": []})
+        else:
+            super().handle_get(request)
+
+    def handle_post(self, request, body):
+        path = urlparse(request.path).path
+        if path == "/api/generate":
+            self.generate(request, body)
+        elif path == "/api/embed":
+            time.sleep(self.embed_latency)
+            inputs = body.get("input") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            send_json(request, {"model": body.get("model"), "embeddings": [stub_vector(text, self.dims) for text in inputs]})
+        elif path == "/api/embeddings":
+            time.sleep(self.embed_latency)
+            send_json(request, {"embedding": stub_vector(body.get("prompt", ""), self.dims)})
+        else:
+            super().handle_post(request, body)
+
+    def generate(self, request, body):
+        prompt = body.get("prompt", "")
+        tokens = tokenize(self.completion(prompt))
+        max_tokens = (body.get("options") or {}).get("num_predict")
+        if max_tokens is not None and max_tokens >= 0:
+            tokens = tokens[:max_tokens]
+        stream = body.get("stream", True)
+        chunk = {"model": body.get("model"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+        queued = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            time.sleep(self.latency)
+            prefilled = time.perf_counter()
+            if stream:
+                request.send_response(200)
+                request.send_header("Content-Type", "application/x-ndjson")
+                request.send_header("Transfer-Encoding", "chunked")
+                request.end_headers()
+            for token in tokens:
+                if self.tokens_per_second:
+                    time.sleep(1 / self.tokens_per_second)
+                if stream:
+                    write_chunk(request, {**chunk, "response": token, "done": False})
+            finished = time.perf_counter()
+
+        final = {
+            **chunk,
+            "response": "" if stream else "".join(tokens),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((finished - queued) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(tokenize(prompt)),
+            "prompt_eval_duration": int((prefilled - started) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int((finished - prefilled) * 1e9),
+        }
+        if stream:
+            write_chunk(request, final)
+            request.wfile.write(b"0\r\n\r\n")
+        else:
+            send_json(request, final)
+
+    def completion(self, prompt):
+        """Answer a prompt in the format its task expects."""
+        if prompt.startswith(prompts.SMALL_TALK_PREFIX):
+            number = text_seed(prompt) % 1000
+            return json.dumps({"question": f"What made you start watching anime, and what do you like about it ({number})?"})
+        if prompt.startswith(prompts.RECOMMENDATION_PREFIX):
+            _, _, data = prompt.partition("**Anime Data**:\n")
+            return json.dumps({"Recommendations": literal(data, [])}, default=str)
+        if prompt.startswith(prompts.QUESTION_PARAPHRASE_PREFIX):
+            questions, _, category = prompt[len(prompts.QUESTION_PARAPHRASE_PREFIX):].rpartition("\n\nCategory: ")
+            category = category.strip()
+            return json.dumps({category: literal(questions, {}).get(category, [])})
+        if prompt.startswith(prompts.SUMMARY_PREFIX):
+            return "The user enjoys anime and has been chatting about their favourite shows."
+        return "OK"
+
+
+def literal(text, default):
+    """Parse the Python literal the prompt builders interpolate, tolerating NaN."""
+    try:
+        return ast.literal_eval(_NAN.sub("None", text.strip()))
+    except (ValueError, SyntaxError):
+        return default
+
+
+def write_chunk(request, payload):
+    data = json.dumps(payload).encode("utf-8") + b"\n"
+    request.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+    request.wfile.flush()
+
+
+class StubMAL(StubServer):
+    """
+    Stand-in for the MyAnimeList `/v2/anime` search, answering every title
+    with a deterministic anime after `latency` seconds.
+    """
+
+    GENRES = ["Action", "Adventure", "Comedy", "Drama", "Fantasy", "Romance", "Sci-Fi", "Slice of Life"]
+
+    def __init__(self, latency=0.05, **kwargs):
+        """
+        Args:
+            latency (float): Seconds per request.
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v2"
+
+    def handle_get(self, request):
+        url = urlparse(request.path)
+        if url.path != "/v2/anime":
+            return super().handle_get(request)
+        time.sleep(self.latency)
+        title = parse_qs(url.query).get("q", [""])[0]
+        send_json(request, {"data": [{"node": self.node(title)}]})
+
+    def node(self, title):
+        seed = text_seed(title.lower())
+        anime_id = seed % 50000 + 1
+        return {
+            "id": anime_id,
+            "title": title,
+            "main_picture": {"medium": f"https://cdn.example/{anime_id}m.jpg",
+                             "large": f"https://cdn.example/{anime_id}l.jpg"},
+            "alternative_titles": {"en": title},
+            "synopsis": f"The story of {title}.",
+            "media_type": "tv",
+            "num_episodes": seed % 50 + 1,
+            "start_date": "2020-01-01",
+            "end_date": "2020-06-30",
+            "status": "finished_airing",
+            "average_episode_duration": 1440,
+            "rating": "pg_13",
+            "mean": round(5 + seed % 450 / 100, 2),
+            "genres": [{"id": index, "name": self.GENRES[(seed >> index) % len(self.GENRES)]} for index in range(2)],
+        }
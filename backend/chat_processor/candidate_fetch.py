@@ -0,0 +1,179 @@
+import json
+import logging
+from django.conf import settings
+from utils.graph_store import GraphStore
+from .constraints import RecommendationConstraints
+
+# Hard constraints are predicates of both candidate queries, so excluded
+# anime are never scored.
+CONSTRAINT_PREDICATES = """
+    NOT a.anime_id IN $excluded_anime_ids
+        AND ($statuses IS NULL OR a.status IN $statuses)
+        AND ($max_episodes IS NULL OR coalesce(toInteger(a.no_episodes), 0) <= 0
+             OR toInteger(a.no_episodes) <= $max_episodes)
+        AND NOT EXISTS { MATCH (a)-[:IN_GENRE]->(excluded:Genre) WHERE excluded.name IN $excluded_genres }
+        AND NOT EXISTS { MATCH (a)-[:RATED_AS]->(rating:Rating) WHERE rating.name IN $excluded_ratings }
+"""
+
+# Only the fields the re-ranker needs travel for every candidate; the
+# embedding stays on the server and is only read by the cosine function.
+SCORED_CANDIDATES = """
+    WITH a, gds.similarity.cosine(a.embedded_text, $queryEmbedding) AS similarity
+    ORDER BY similarity DESC
+    LIMIT $limit
+    RETURN a.anime_id AS anime_id,
+        a.score AS score,
+        a.status AS status,
+        similarity,
+        [(a)-[:IN_GENRE]->(genre:Genre) | genre.name] AS genres,
+        [(a)-[:HAS_TYPE]->(t:Type) | t.name] AS types
+    ORDER BY similarity DESC
+"""
+
+# Fallback without a compact index: every anime in the user's genres, plus seeds
+CANDIDATE_QUERY = """
+    MATCH (a:Anime)-[:IN_GENRE]->(g:Genre)
+    WHERE g.name IN $preferred_genres OR a.anime_id IN $seed_anime_ids
+    WITH DISTINCT a
+    WHERE""" + CONSTRAINT_PREDICATES + SCORED_CANDIDATES
+
+# Candidates already chosen by the compact index and the seeds, looked up by
+# ID and re-scored at full precision
+RESCORE_QUERY = """
+    UNWIND $anime_ids AS anime_id
+    MATCH (a:Anime {anime_id: anime_id})
+    WHERE""" + CONSTRAINT_PREDICATES + SCORED_CANDIDATES
+
+# Display metadata, fetched for the final top-k only
+HYDRATE_QUERY = """
+    UNWIND $anime_ids AS anime_id
+    MATCH (a:Anime {anime_id: anime_id})
+    RETURN a.anime_id AS anime_id,
+        a.name AS name,
+        a.synopsis AS synopsis,
+        a.image_url AS image_url,
+        a.aired AS aired,
+        a.status AS status,
+        a.duration AS duration,
+        a.no_episodes AS no_episodes,
+        [(a)-[:RATED_AS]->(r:Rating) | r.name] AS ratings,
+        [(a)-[:HAS_TYPE]->(t:Type) | t.name] AS types,
+        [(a)-[:SOURCED_FROM]->(s:Source) | s.name] AS sources
+"""
+
+# The attributes constraints filter on, packed into the catalog-wide compact index
+ATTRIBUTES_QUERY = """
+    MATCH (a:Anime)
+    RETURN a.anime_id AS anime_id,
+        a.status AS status,
+        a.no_episodes AS no_episodes,
+        [(a)-[:IN_GENRE]->(g:Genre) | g.name] AS genres,
+        [(a)-[:RATED_AS]->(r:Rating) | r.name] AS ratings
+"""
+
+
+def payload_size(rows):
+    """Approximate the wire size of a result set by its JSON encoding."""
+    return len(json.dumps(rows, default=str).encode("utf-8"))
+
+
+class CandidateFetcher:
+    """
+    Two-stage retrieval for `similarity_search`: a narrow candidate fetch for
+    ranking, then metadata hydration for the final top-k only.
+    """
+
+    def __init__(self, driver):
+        """
+        Args:
+            driver (neo4j.Driver): The Neo4j driver.
+        """
+        self.driver = driver
+        self.store = GraphStore(driver)
+        self.stats = {}
+
+    def _run(self, stage, query, fetch_size=None, **params):
+        rows = [record.data() for record in self.store.read(query, params, fetch_size=fetch_size)]
+        self.stats[stage] = {"rows": len(rows), "bytes": payload_size(rows)}
+        return rows
+
+    def ensure_indexes(self):
+        """Index the properties the constraint predicates filter on."""
+        self.store.write("CREATE INDEX anime_status IF NOT EXISTS FOR (a:Anime) ON (a.status)")
+
+    def fetch_candidates(self, query_embedding, preferred_genres, seed_anime_ids=(), limit=100, constraints=None):
+        """
+        Fetch the most similar candidates with only the fields used for ranking.
+
+        Args:
+            query_embedding (list): The user profile embedding.
+            preferred_genres (list): Genres a candidate may belong to.
+            seed_anime_ids (iterable): Collaborative and favorite-neighbour candidates
+                admitted regardless of genre.
+            limit (int): The maximum number of candidates.
+            constraints (RecommendationConstraints): Hard filters no candidate may violate.
+
+        Returns:
+            list: Rows with anime_id, score, status, similarity, genres and types, best first.
+        """
+        return self._run(
+            "candidates", CANDIDATE_QUERY,
+            # Pull every candidate in one batch rather than several round trips
+            fetch_size=limit,
+            queryEmbedding=query_embedding,
+            preferred_genres=list(preferred_genres or []),
+            seed_anime_ids=list(seed_anime_ids),
+            limit=limit,
+            **(constraints or RecommendationConstraints()).query_params(),
+        )
+
+    def rescore_candidates(self, query_embedding, anime_ids, limit=100, constraints=None):
+        """
+        Score a known candidate set at full precision with only the fields used for ranking.
+
+        Args:
+            query_embedding (list): The user profile embedding.
+            anime_ids (iterable): The candidates, from the compact index and the seeds.
+            limit (int): The maximum number of candidates.
+            constraints (RecommendationConstraints): Hard filters no candidate may violate.
+
+        Returns:
+            list: Rows with anime_id, score, status, similarity, genres and types, best first.
+        """
+        return self._run(
+            "candidates", RESCORE_QUERY,
+            fetch_size=limit,
+            queryEmbedding=query_embedding,
+            anime_ids=list(anime_ids),
+            limit=limit,
+            **(constraints or RecommendationConstraints()).query_params(),
+        )
+
+    def fetch_attributes(self):
+        """
+        Read the attributes constraints filter on for the whole catalog.
+
+        Returns:
+            list: Rows with anime_id, status, no_episodes, genres and ratings.
+        """
+        return [record.data() for record in self.store.read(ATTRIBUTES_QUERY, fetch_size=settings.EXPORT_FETCH_SIZE)]
+
+    def hydrate(self, anime_ids):
+        """
+        Fetch display metadata for the selected anime.
+
+        Args:
+            anime_ids (list): The IDs of the selected anime.
+
+        Returns:
+            dict: anime_id -> metadata row.
+        """
+        rows = self._run("hydrate", HYDRATE_QUERY, anime_ids=list(anime_ids))
+        return {row["anime_id"]: row for row in rows}
+
+    def report(self):
+        """Log and return the rows and bytes fetched by each stage of this request."""
+        total_rows = sum(stage["rows"] for stage in self.stats.values())
+        total_bytes = sum(stage["bytes"] for stage in self.stats.values())
+        logging.info(f"Similarity fetch: {total_rows} rows, {total_bytes} bytes ({self.stats})")
+        return {**self.stats, "total": {"rows": total_rows, "bytes": total_bytes}}
@@ -1,17 +1,42 @@
 import os
-import json
+import logging
 from dotenv import load_dotenv
-from django.core.cache import cache
-from langchain_ollama import OllamaLLM
+from django.conf import settings
 from .user_graph_management import UserService
-from langchain_community.graphs import Neo4jGraph
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_community.embeddings import OllamaEmbeddings
+from .recommendation_engine import get_engine, fetch_user_items
+from .reranker import HybridReranker
+from .candidate_fetch import CandidateFetcher
+from .constraints import RecommendationConstraints
+from .similar_anime import SimilarAnimeGraph
+from .compact_index import get_compact_index
+from .ranked_list import ranked_list_cache, build_recommendation
+from .llm_clients import get_parser, load_questions
+from .prompts import question_paraphrase_prompt, small_talk_prompt, recommendation_prompt
+from .model_router import model_router
+from .embedding_service import get_embedding_service
+from .preference_vector import preference_updater
+from .conversation_memory import conversation_memory
+from .response_cache import response_cache, normalise_reply, profile_bucket
+from utils.tracing import span
+from utils.resilience import DependencyError
 
 load_dotenv(r'D:\Projects\AnimeBot\config.env')
 
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
 
+QUESTIONS_PATH = os.getenv('QUESTIONS_PATH', r'D:\Projects\AnimeBot\backend\chat_processor\questions.json')
+
+# Asked instead of a generated question while the chat model is unavailable
+FALLBACK_QUESTION = "What's an anime you've enjoyed recently, and what did you like about it?"
+
+
+def _as_float(value):
+    """Coerce a stored numeric field to float, mapping missing or unknown values to NaN."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
 class Chat:
     def __init__(self, user_id):
         """
@@ -21,32 +46,36 @@ class Chat:
             user_id (str): The ID of the user.
         """
         self.user_id = user_id
-        self.llm = OllamaLLM(model="llama3.2")
-        self.parser = JsonOutputParser()
-        self.questions = json.load(open(r'D:\Projects\AnimeBot\backend\chat_processor\questions.json'))
+        self.router = model_router
+        self.parser = get_parser()
         self.user_service = UserService()
-        self.embedder = OllamaEmbeddings(model="nomic-embed-text")
-        self.kg = Neo4jGraph(
-            os.getenv('NEO4J_URI'), 
-            username=os.getenv('NEO4J_USERNAME'), 
-            password=os.getenv('NEO4J_PASSWORD')
-        )
+        self.embedder = get_embedding_service()
+        self.reranker = HybridReranker()
+        self.fetcher = CandidateFetcher(self.user_service.driver)
+        self.fetch_stats = {}
+
+        # Load the rolling summary and recent turns from Redis
+        with span("redis.session_history"):
+            self.summary, self.session_history = conversation_memory.load(self.user_id)
 
-        # Load session history from Redis
-        self.session_history = cache.get(f"session_history_{self.user_id}", [])
+    @property
+    def questions(self):
+        # Only profile question requests need the questions data
+        return load_questions(QUESTIONS_PATH)
 
     def save_session_history(self):
         """
         Save the current session history to Redis with a 1-hour timeout.
         """
-        cache.set(f"session_history_{self.user_id}", self.session_history, timeout=3600)
+        with span("redis.session_history"):
+            conversation_memory.save(self.user_id, self.session_history, self.summary)
 
     def reset_session_history(self):
         """
         Clear the session history from Redis and reset the local session history.
         """
-        cache.delete(f"session_history_{self.user_id}")
-        self.session_history = []
+        conversation_memory.clear(self.user_id)
+        self.summary, self.session_history = conversation_memory.load(self.user_id)
 
     def generation_questions(self, category):
         """
@@ -58,52 +87,41 @@ class Chat:
         Returns:
             dict: The paraphrased questions.
         """
-        preffered_response = """{
-            "{category}": [
-                {
-                    "question": "Paraphrased question",
-                    "type": "Question Type",
-                    "Options": [], # options if any are available
-                    "var_name": "" # variable name
-                },
-            ]
-        }"""
-
-        prompt_template = f"""
-            <|system|> 
-            You are a chatbot engine for an anime recommendation application that uses a graph database. You are provided a questions data, which category to generate questions, and you will paraphrase all the questions in the category to make the questions sound more human.
-            IMPORTANT: The way the questions data is organized as different categories, and each category has an array of questions. You need to paraphrase all the questions in the given category.
-
-            IMPORTANT: Format your response as a single-line JSON string, without line breaks or escaped characters.
-
-            Questions Data:  
-            {self.questions}  
-
-            Category: {category}
-
-            Preffered Response: {preffered_response}
-
-            Contextual Instructions:
-            - Paraphrase the question in the questions format to sound and feel like chatting with a human.
-            - Paraphrase all the questions in the given category.
-            - Use the provided questions data to generate a response.
-            - Only return the requested category data. As in do not include any other category in the response.
-            
-            Rules for JSON:
-            1. Keep the structure of the JSON question, type, options and varname.
-            1. Use double quotes for all variables and values.
-            2. Return ONLY the JSON string without any additional text or comments.
-            3. No line breaks or backticks; respond only with JSON.
-            4. Do not include any additional information in the JSON response.
-            
-        """
+        prompt_template = question_paraphrase_prompt(self.questions, category)
 
-        response = self.llm.invoke(prompt_template)
+        try:
+            with span("ollama.generation_questions"):
+                response = self.router.invoke("question_paraphrase", prompt_template)
+        except DependencyError as e:
+            # Degrade to the original, un-paraphrased questions
+            logging.warning(f"Serving unparaphrased {category} questions: {e}")
+            return {category: self.questions.get(category, [])}
 
         formatted_response = self.parser.parse(response)
 
         return formatted_response
     
+    def cache_question(self, reply, vector, bucket, question):
+        """
+        Store a generated question in the response cache. A reply not yet
+        embedded for a lookup is embedded off the request path.
+
+        Args:
+            reply (str): The user's reply.
+            vector (list): The reply's embedding, or None.
+            bucket (str): The profile bucket.
+            question (str): The generated question.
+        """
+        if vector is not None:
+            response_cache.store(vector, bucket, question)
+            return
+
+        def store(future):
+            if future.exception() is None:
+                response_cache.store(future.result(), bucket, question)
+
+        self.embedder.submit(normalise_reply(reply)).add_done_callback(store)
+
     def generate_response(self, reply, user_profile):
         """
         Generate a conversational response based on previous chat history and user profile.
@@ -115,194 +133,244 @@ class Chat:
         Returns:
             dict: The chatbot response.
         """
-        prompt_template = f"""
-            <|system|> 
-            You are a chatbot designed for an anime recommendation application, but you are also friendly and conversational. Your goal is to engage users with questions that feel like chatting with a friend. While some questions can focus on anime, others should feel more personal and casual to build rapport with the user.
-
-            **User Profile**:
-            {user_profile}
-
-            **Session History**:
-            {self.session_history[-5:]}
-
-            **User Reply**:
-            {reply}
-
-            **Contextual Instructions**:
-            - Alternate between anime-related and personal/casual questions to make the conversation more engaging.
-            - Use a friendly and casual tone, avoiding overly formal or robotic phrasing.
-            - Avoid repeating questions from previous conversations or those closely related to the most recent question.
-            - Frame questions as if you’re genuinely curious about the user’s likes, hobbies, and thoughts.
-            - Keep the questions open-ended to encourage more detailed responses from the user.
-
-            **Output Format**:
-            {{
-                "question": "A conversational, open-ended question in a friendly tone."
-            }}
-
-            **Examples of Friendly Questions**:
-            - "What’s something fun you’ve been up to lately?"
-            - "What’s your favorite thing about your all-time favorite anime?"
-            - "If you could visit a place from an anime in real life, where would it be and why?"
-            - "When you’re not watching anime, how do you usually spend your time?"
-            - "Is there an anime character you’d love to hang out with in real life?"
-            - "What kind of stories inspire you the most—anime or otherwise?"
-
-            Respond with a single JSON object containing the question, formatted exactly as specified above.
-        """
+        # Early turns may reuse a question generated for a near-identical
+        # reply from a similar profile instead of a new generation
+        vector, bucket, question = None, None, None
+        cacheable = response_cache.eligible(self.session_history, self.summary)
+        if cacheable:
+            bucket = profile_bucket(user_profile)
+            # Nothing in an empty bucket can match, so skip embedding the reply
+            if not response_cache.has_entries(bucket):
+                response_cache.count("miss")
+            else:
+                try:
+                    with span("ollama.embed_reply"):
+                        vector = self.embedder.embed_query(normalise_reply(reply))
+                    with span("response_cache.lookup"):
+                        question = response_cache.lookup(vector, bucket, self.session_history)
+                except DependencyError as e:
+                    logging.warning(f"Skipping the response cache: {e}")
+                    cacheable = False
+
+        if question is not None:
+            formatted_response = {"question": question}
+        else:
+            formatted_response = self.generate_question(reply, user_profile)
+            if cacheable and formatted_response["question"] != FALLBACK_QUESTION:
+                self.cache_question(reply, vector, bucket, formatted_response["question"])
+
+        # Append the question to session history
+        conversation_memory.append(self.session_history, self.summary, formatted_response["question"], reply)
+
+        # Fold the turn into the long-term preference vector in the background
+        preference_updater.record(
+            self.user_id,
+            f"Chat history: System -> {formatted_response['question']}, User -> {reply}",
+            settings.PREFERENCE_CHAT_ALPHA,
+        )
 
-        response = self.llm.invoke(prompt_template)
+        return formatted_response
 
-        # Parse and append the generated question to session history
-        formatted_response = self.parser.parse(response)
-        self.session_history.append({
-            "system": formatted_response["question"],
-            "user": reply
-        })
+    def generate_question(self, reply, user_profile):
+        """
+        Generate the next small-talk question with the LLM.
 
-        return formatted_response
+        Args:
+            reply (str): The user's reply.
+            user_profile (dict): The user's profile data.
 
-    
-    def prepare_user_profile_embedding(self, user_profile, session_history):
+        Returns:
+            dict: The parsed response with the question, or the fallback question.
+        """
+        prompt_template = small_talk_prompt(user_profile, self.summary["text"],
+                                            conversation_memory.window(self.session_history, self.summary), reply)
+
+        try:
+            with span("ollama.generate_response"):
+                response = self.router.invoke("small_talk", prompt_template)
+            # Parse the generated question
+            return self.parser.parse(response)
+        except DependencyError as e:
+            logging.warning(f"Serving the fallback question: {e}")
+            return {"question": FALLBACK_QUESTION}
+
+    def prepare_user_profile_embedding(self, user_profile, session_history, summary=None):
         """
         Create a user profile string for embedding based on profile and chat history.
 
         Args:
             user_profile (dict): The user's profile data.
             session_history (list): The chat session history.
+            summary (dict): The rolling conversation summary, if any.
 
         Returns:
             str: The concatenated user profile string.
         """
         profile = []
+        summary = summary or {"text": "", "through": 0}
 
         # Prioritize user preferences
         for key, value in user_profile.items():
             if key in ["preferred_genres", "favorite_anime", "themes"]:
                 profile.append(f"{key}: {value}")
 
+        # Earlier turns survive only as the rolling summary
+        if summary["text"]:
+            profile.append(f"Conversation summary: {summary['text']}")
+
         # Include recent chat history with lower weight
-        for chat in session_history[-5:]:  # Consider only the most recent history
+        for chat in conversation_memory.window(session_history, summary):
             profile.append(f"Chat history: System -> {chat['system']}, User -> {chat['user']}")
 
         return " ".join(profile)
 
-    def similarity_search(self, user_profile):
+    def rank_candidates(self, user_profile, user_profile_text=None):
         """
-        Perform an improved similarity search using Neo4j and embeddings.
+        Retrieve and rank every candidate for the user, without hydrating
+        display metadata.
 
         Args:
             user_profile (dict): The user's profile data.
+            user_profile_text (str): The profile text, embedded only if the user has no preference vector.
 
         Returns:
-            dict: The search results with anime recommendations.
+            list: Ranked candidate rows, best first.
         """
-        # Prepare the user profile for embedding
-        user_profile_text = self.prepare_user_profile_embedding(user_profile, self.session_history)
-        user_profile_embedding = self.embedder.embed_query(user_profile_text)
-
-        # Query the Neo4j database with additional filtering for genres
-        search_query = """
-            MATCH (a:Anime)-[:IN_GENRE]->(g:Genre)
-            WHERE g.name IN $preferred_genres
-            WITH a, gds.similarity.cosine(a.embedded_text, $queryEmbedding) AS similarity
-            OPTIONAL MATCH (a)-[:RATED_AS]->(r:Rating),
-                        (a)-[:HAS_TYPE]->(t:Type),
-                        (a)-[:SOURCED_FROM]->(s:Source),
-                        (a)-[:IN_GENRE]->(genre:Genre)
-            RETURN a, similarity, 
-                COLLECT(DISTINCT r.name) AS ratings, 
-                COLLECT(DISTINCT t.name) AS types, 
-                COLLECT(DISTINCT s.name) AS sources, 
-                COLLECT(DISTINCT genre.name) AS genres
-            ORDER BY similarity DESC
-            LIMIT 100
+        # Use the incrementally maintained preference vector, only embedding
+        # the profile text for users who have none yet
+        user_profile_embedding = self.user_service.get_preference_vector(self.user_id)
+        if user_profile_embedding is None:
+            if user_profile_text is None:
+                user_profile_text = self.prepare_user_profile_embedding(user_profile, self.session_history, self.summary)
+            with span("ollama.embed_query"):
+                user_profile_embedding = self.embedder.embed_query(user_profile_text)
+
+        # "Users like you also liked" candidates from the collaborative model
+        with span("cf.recommend"):
+            user_items = fetch_user_items(self.user_service.driver, self.user_id)
+            cf_scores = get_engine(settings.CF_MODEL_PATH).recommend(user_items, k=settings.CF_CANDIDATES)
+
+        # Hard constraints from the profile answers, with the anime the user
+        # already has as seen; every retrieval stage below applies them
+        constraints = RecommendationConstraints.from_profile(user_profile, user_items)
+
+        # Neighbours of the user's favorites, one SIMILAR_TO hop away
+        with span("neo4j.favorite_seeds"):
+            favorite_seeds = SimilarAnimeGraph(self.user_service.driver).seed_candidates(
+                self.user_id, limit=settings.SIMILAR_ANIME_SEEDS
+            )
+
+        seeds = (set(cf_scores) | set(favorite_seeds)) - set(constraints.excluded_anime_ids)
+
+        # Catalog-wide nearest neighbours from the compact in-memory index
+        with span("compact_index.search"):
+            index = get_compact_index(settings.COMPACT_INDEX_PATH)
+            nearest = None
+            if index is not None and len(user_profile_embedding) == index.source_dims:
+                nearest = index.search(user_profile_embedding, k=settings.COMPACT_INDEX_CANDIDATES,
+                                       allowed=constraints.row_filter(index))
+
+        # Fetch ranking fields with cosine at full precision: for the index's
+        # candidates and the seeds by ID, or without an index for every anime
+        # in the user's genres plus the seeds
+        with span("neo4j.similarity"):
+            if nearest is not None:
+                results = self.fetcher.rescore_candidates(
+                    user_profile_embedding, anime_ids=seeds | set(nearest), constraints=constraints,
+                )
+            else:
+                results = self.fetcher.fetch_candidates(
+                    user_profile_embedding,
+                    preferred_genres=constraints.preferred_genres,
+                    seed_anime_ids=seeds,
+                    constraints=constraints,
+                )
+
+        # Score and diversify the whole candidate list in one vectorised pass,
+        # so later pages keep the same diversified order
+        with span("rerank"):
+            selected, relevance = self.reranker.rerank(
+                similarity=[result["similarity"] for result in results],
+                genres=[result["genres"] for result in results],
+                preferred_genres=constraints.preferred_genres,
+                disliked_genres=constraints.excluded_genres,
+                k=len(results),
+                collaborative=[cf_scores.get(result["anime_id"], 0.0) for result in results],
+                score=[_as_float(result["score"]) for result in results],
+            )
+
+        return [{**results[index], "final_score": float(relevance[index])} for index in selected]
+
+    def rank_and_hydrate(self, user_profile):
+        """
+        Rank the user's candidates and hydrate display metadata for the first page.
+
+        Args:
+            user_profile (dict): The user's profile data.
+
+        Returns:
+            tuple: (profile text, full ranked list, anime_id -> metadata of the first page).
         """
-        results = self.kg.query(search_query, params={
-            'queryEmbedding': user_profile_embedding,
-            'preferred_genres': user_profile.get("preferred_genres", [])
-        })
-
-        # Refine and rank results
-        recommendations = []
-        for result in results:
-            # Calculate final score with additional weights
-            genre_match_score = len(set(user_profile.get("preferred_genres", [])) & set(result["genres"]))
-            final_score = result["similarity"] * 0.7 + genre_match_score * 0.3
-
-            recommendations.append({
-                "anime_id": result["a"]["anime_id"],
-                "title": result["a"]["name"],
-                "similarity": result["similarity"],
-                "final_score": final_score,
-                "synopsis": result["a"]["synopsis"],
-                "image_url": result["a"]["image_url"],
-                "score": result["a"]["score"],
-                "aired": result["a"]["aired"],
-                "status": result["a"]["status"],
-                "duration": result["a"]["duration"],
-                "no_episodes": result["a"]["no_episodes"],
-                "rating": result["ratings"],
-                "type": result["types"],
-                "sourced_from": result["sources"],
-                "genres": result["genres"]
-            })
-
-        # Sort by final score and take the top 5
-        recommendations = sorted(recommendations, key=lambda x: x["final_score"], reverse=True)[:10]
+        user_profile_text = self.prepare_user_profile_embedding(user_profile, self.session_history, self.summary)
+        ranked = self.rank_candidates(user_profile, user_profile_text)
+
+        # Hydrate display metadata for the first page only
+        with span("neo4j.hydrate"):
+            metadata = self.fetcher.hydrate([candidate["anime_id"] for candidate in ranked[:10]])
+        self.fetch_stats = self.fetcher.report()
+        return user_profile_text, ranked, metadata
+
+    def explain(self, user_profile_text, ranked, metadata):
+        """
+        Have the LLM present the first page of a ranked list.
+
+        Args:
+            user_profile_text (str): The profile text the list was ranked for.
+            ranked (list): The ranked candidates.
+            metadata (dict): anime_id -> display metadata of the first page.
+
+        Returns:
+            dict: The recommendations, as formatted by the LLM when it is available.
+        """
+        recommendations = [
+            build_recommendation(candidate, metadata.get(candidate["anime_id"], {}))
+            for candidate in ranked[:10]
+        ]
 
         # Generate JSON response
-        prompt_template = f"""
-            <|system|> 
-            You are an anime recommendation chatbot using a graph database. Your primary task is to recommend anime based on a user profile and anime data obtained through vector similarity search and metadata analysis. But do not change or modify the original fields for anime_id, synopsis, or image_url.
-
-            IMPORTANT RULES:
-            - DO NOT PARAPHRASE, ALTER, REPLACE OR CHANGE the original fields for **anime_id**, **synopsis**, or **image_url**.
-
-            **User Profile**:
-            {user_profile_text}
-
-            **Anime Data**:
-            {recommendations}
-
-            **Contextual Instructions**:
-            - Focus on aligning the recommendations with the user's preferences, especially genres and themes.
-            - Rank recommendations by both similarity score and genre match.
-            - Ensure diversity in recommendations while respecting the user's dislikes (if any).
-
-            **Output Format**:
-            {{
-                "Recommendations": [
-                    {{
-                        "anime_id": recommendations["anime_id"] # do not change the original anime_id in the Anime Data,
-                        "title": recommendations["Original title"],
-                        "similarity": "Similarity Score (0.0 to 1.0)",
-                        "synopsis": recommendations["synopsis"],
-                        "image_url": recommendations["image_url"],
-                        "score": "Original Anime Score",
-                        "aired": "Original Aired Date",
-                        "status": "Original Status",
-                        "duration": "Original Episode Duration",
-                        "no_episodes": "Original Number of Episodes",
-                        "rating": ["Original Rating"],
-                        "type": ["Original Anime Type"],
-                        "sourced_from": ["Original Source Material"],
-                        "genres": ["Original List of Genres"]
-                    }}
-                ]
-            }}
-
-            Respond ONLY with the JSON object. Do not add extra explanations or context.
-            """
-
-
-        response = self.llm.invoke(prompt_template)
+        prompt_template = recommendation_prompt(user_profile_text, recommendations)
+
+        try:
+            with span("ollama.recommendation"):
+                response = self.router.invoke("recommendation", prompt_template)
+        except DependencyError as e:
+            # The ranked, hydrated list is already a complete answer
+            logging.warning(f"Serving recommendations without the LLM pass: {e}")
+            return {"Recommendations": recommendations}
         
         # Parse the LLM response
         formatted_response = self.parser.parse(response)
 
         return formatted_response
 
+    def similarity_search(self, user_profile):
+        """
+        Perform an improved similarity search using Neo4j and embeddings.
+
+        Args:
+            user_profile (dict): The user's profile data.
+
+        Returns:
+            dict: The search results with anime recommendations.
+        """
+        user_profile_text, ranked, metadata = self.rank_and_hydrate(user_profile)
+
+        # Keep the full ranked list so further pages are a cache read
+        with span("redis.ranked_list"):
+            ranked_list_cache.save(self.user_id, ranked, hydrated=metadata)
+
+        return self.explain(user_profile_text, ranked, metadata)
+
     def chat(self, req_user, user_req, category):
         """
         Handle the chat interaction with the user.
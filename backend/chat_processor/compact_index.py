@@ -0,0 +1,292 @@
+import os
+import threading
+import numpy as np
+from .reranker import GenreVocabulary
+
+MODES = ("int8", "float16")
+
+# Bytes per component of the embedding lists stored on Anime nodes
+NEO4J_FLOAT_BYTES = 8
+
+# Packed per-row attributes saved with the index when it was built with them
+ATTRIBUTES = ("genre_masks", "rating_masks", "status_codes", "episodes")
+
+
+def normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def episode_count(value):
+    """An episode count as stored on Anime nodes, 0 when unknown."""
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class CompactEmbeddingIndex:
+    """
+    In-memory catalog index with compact vectors: int8 scalar-quantised or
+    float16, optionally PCA-projected to fewer dimensions. It is used for
+    candidate generation only; candidates are re-scored with the
+    full-precision embeddings in Neo4j.
+    """
+
+    def __init__(self, mode="int8", dims=None, block_size=65536):
+        """
+        Args:
+            mode (str): "int8" or "float16".
+            dims (int): PCA output dimensions, None to keep the full dimension.
+            block_size (int): Vectors decoded and scored per matrix product.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+        self.mode = mode
+        self.dims = dims
+        self.block_size = block_size
+        self.anime_ids = np.array([], dtype=np.int64)
+        self.codes = None
+        self.scale = None
+        self.mean = None
+        self.components = None
+        self.source_dims = 0
+        # Per-row filter attributes, see `set_attributes`
+        self.genre_masks = None
+        self.rating_masks = None
+        self.status_codes = None
+        self.episodes = None
+        self.genre_vocabulary = None
+        self.rating_vocabulary = None
+        self.status_names = []
+
+    def __len__(self):
+        return len(self.anime_ids)
+
+    def fit(self, anime_ids, embeddings, pca_sample=20000, seed=0):
+        """
+        Fit the projection and quantisation on the catalog and encode it.
+
+        Args:
+            anime_ids (list): Anime IDs by row.
+            embeddings (np.ndarray): Full-precision vectors of shape (n, dim).
+            pca_sample (int): Rows used to fit the PCA projection.
+            seed (int): Seed of the PCA sample.
+
+        Returns:
+            CompactEmbeddingIndex: self.
+        """
+        vectors = normalise(embeddings)
+        self.source_dims = vectors.shape[1]
+        self.anime_ids = np.asarray(anime_ids, dtype=np.int64)
+
+        if self.dims and self.dims < self.source_dims:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(pca_sample, len(vectors)), replace=False)]
+            self.mean = sample.mean(axis=0)
+            _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+            self.components = vt[:self.dims].astype(np.float32)
+
+        projected = self.project(vectors)
+        if self.mode == "int8":
+            # Symmetric per-dimension scale, folded into the query at search time
+            self.scale = np.abs(projected).max(axis=0) / 127
+            self.scale[self.scale == 0] = 1.0
+            self.codes = np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+        else:
+            self.scale = None
+            self.codes = projected.astype(np.float16)
+        return self
+
+    def set_attributes(self, rows):
+        """
+        Pack the attributes constraints filter on, one entry per indexed row:
+        genre and rating sets as uint64 bitmasks, the airing status as a
+        small code and the episode count (0 when unknown).
+
+        Args:
+            rows (list): Records with anime_id, genres, ratings, status and no_episodes.
+
+        Returns:
+            CompactEmbeddingIndex: self.
+        """
+        by_id = {row["anime_id"]: row for row in rows}
+        ordered = [by_id.get(int(anime_id), {}) for anime_id in self.anime_ids]
+        self.genre_vocabulary = GenreVocabulary(sorted({genre for row in ordered for genre in row.get("genres") or ()}))
+        self.rating_vocabulary = GenreVocabulary(sorted({rating for row in ordered for rating in row.get("ratings") or ()}))
+        self.genre_masks = self.genre_vocabulary.masks([row.get("genres") for row in ordered])
+        self.rating_masks = self.rating_vocabulary.masks([row.get("ratings") for row in ordered])
+        self.status_names = sorted({row["status"] for row in ordered if row.get("status")})
+        self.status_codes = np.array([self.status_names.index(row["status"]) if row.get("status") else -1
+                                      for row in ordered], dtype=np.int16)
+        self.episodes = np.array([episode_count(row.get("no_episodes")) for row in ordered], dtype=np.int32)
+        return self
+
+    def project(self, vectors):
+        """Project normalised vectors into the index space, re-normalised for cosine."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is not None:
+            vectors = (vectors - self.mean) @ self.components.T
+        return normalise(vectors)
+
+    def scores(self, query):
+        """
+        Approximate cosine similarity of a query to every indexed anime.
+
+        Args:
+            query (list): A full-precision query embedding.
+
+        Returns:
+            np.ndarray: float32 scores by row.
+        """
+        query = self.project(normalise(query)[None, :])[0]
+        if self.scale is not None:
+            query = query * self.scale
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.codes[start:start + self.block_size].astype(np.float32)
+            scores[start:start + self.block_size] = block @ query
+        return scores
+
+    def search(self, query, k=200, allowed=None):
+        """
+        Find the approximate top-k anime for a query.
+
+        Args:
+            query (list): A full-precision query embedding.
+            k (int): The number of candidates.
+            allowed (np.ndarray): bool mask of the rows that may be returned,
+                e.g. from `RecommendationConstraints.row_filter`.
+
+        Returns:
+            dict: anime_id -> approximate similarity, best first.
+        """
+        if not len(self):
+            return {}
+        scores = self.scores(query)
+        if allowed is not None:
+            # Excluded rows never compete for the top-k slots
+            scores[~allowed] = -np.inf
+            k = min(k, int(allowed.sum()))
+            if k == 0:
+                return {}
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return {int(self.anime_ids[index]): float(scores[index]) for index in top}
+
+    def bytes_per_vector(self):
+        """Return the stored bytes per anime, the shared projection amortised over the catalog."""
+        if self.codes is None or not len(self):
+            return 0.0
+        shared = sum(array.nbytes for array in (self.scale, self.mean, self.components) if array is not None)
+        return self.codes.nbytes / len(self) + shared / len(self)
+
+    def memory_report(self):
+        """Compare the compact representation with full-precision storage."""
+        compact = self.bytes_per_vector()
+        float32 = self.source_dims * 4
+        return {
+            "vectors": len(self),
+            "mode": self.mode,
+            "dims": self.codes.shape[1] if self.codes is not None else 0,
+            "source_dims": self.source_dims,
+            "bytes_per_vector": round(compact, 1),
+            "float32_bytes_per_vector": float32,
+            "neo4j_bytes_per_vector": self.source_dims * NEO4J_FLOAT_BYTES,
+            "compression_vs_float32": round(float32 / compact, 1) if compact else 0.0,
+        }
+
+    def recall(self, embeddings, queries, k=10, candidates=200):
+        """
+        Measure recall against exact cosine over the full-precision catalog.
+
+        Args:
+            embeddings (np.ndarray): The full-precision catalog, in index row order.
+            queries (np.ndarray): Query vectors.
+            k (int): The cut-off of the exact top-k.
+            candidates (int): Candidates passed on to exact re-scoring.
+
+        Returns:
+            dict: recall@k of the compact ranking alone, and the share of the
+                exact top-k found among the candidates (recall after re-scoring).
+        """
+        exact = normalise(embeddings)
+        top_k_hits = candidate_hits = 0
+        for query in normalise(queries):
+            truth = set(np.argpartition(exact @ query, -k)[-k:])
+            scores = self.scores(query)
+            approx = np.argsort(-scores)
+            top_k_hits += len(truth & set(approx[:k]))
+            candidate_hits += len(truth & set(approx[:candidates]))
+        total = k * len(queries)
+        return {
+            "k": k,
+            "candidates": candidates,
+            "recall_at_k": round(top_k_hits / total, 4) if total else 0.0,
+            "recall_after_rescoring": round(candidate_hits / total, 4) if total else 0.0,
+        }
+
+    def save(self, path):
+        arrays = {
+            "anime_ids": self.anime_ids,
+            "codes": self.codes,
+            "mode": np.array(self.mode),
+            "source_dims": np.array(self.source_dims),
+        }
+        for name in ("scale", "mean", "components") + ATTRIBUTES:
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        if self.genre_masks is not None:
+            arrays["genre_names"] = np.array(self.genre_vocabulary.names, dtype=str)
+            arrays["rating_names"] = np.array(self.rating_vocabulary.names, dtype=str)
+            arrays["status_names"] = np.array(self.status_names, dtype=str)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            index = cls(mode=str(archive["mode"]))
+            index.anime_ids = archive["anime_ids"]
+            index.codes = archive["codes"]
+            index.source_dims = int(archive["source_dims"])
+            for name in ("scale", "mean", "components") + ATTRIBUTES:
+                if name in archive:
+                    setattr(index, name, archive[name])
+            if "genre_names" in archive:
+                index.genre_vocabulary = GenreVocabulary(archive["genre_names"].tolist())
+                index.rating_vocabulary = GenreVocabulary(archive["rating_names"].tolist())
+                index.status_names = archive["status_names"].tolist()
+        index.dims = index.components.shape[0] if index.components is not None else None
+        return index
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_compact_index(path):
+    """
+    Return the worker's compact index, reloading it when `build_compact_index`
+    has written a newer file.
+
+    Args:
+        path (str): The index file.
+
+    Returns:
+        CompactEmbeddingIndex: The loaded index, or None if none has been built.
+    """
+    global _index, _index_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _index_lock:
+        if _index is None or mtime != _index_mtime:
+            _index = CompactEmbeddingIndex.load(path)
+            _index_mtime = mtime
+        return _index
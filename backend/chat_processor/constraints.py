@@ -0,0 +1,195 @@
+import re
+import numpy as np
+from django.conf import settings
+from .recommendation_engine import ANIME_PREFIX
+
+# Profile fields read by the constraint model. Answers are stored on the
+# User node as `<category>_<var_name>`, so fields are matched by suffix.
+CONSTRAINT_FIELDS = ("preferred_genres", "disliked_genres", "age", "max_episodes", "airing_status")
+
+# Airing statuses as the catalog stores them: the dataset's labels and the
+# MAL API codes of titles fetched later.
+AIRING_STATUSES = {
+    "finished": ("Finished Airing", "finished_airing"),
+    "airing": ("Currently Airing", "currently_airing"),
+    "upcoming": ("Not yet aired", "not_yet_aired"),
+}
+
+# Free-text wordings of each status, tried in order, so "not yet aired" is
+# upcoming and "finished airing" is not currently airing.
+STATUS_PATTERNS = (
+    ("upcoming", re.compile(r"not yet|upcoming|unaired|yet to air|announced|future")),
+    ("finished", re.compile(r"finish|complet|ended|\bdone\b|\baired\b|\bold\b")),
+    ("airing", re.compile(r"airing|ongoing|current|running|seasonal|simulcast|\bnew\b")),
+)
+
+# Answers that accept any status
+NO_PREFERENCE = re.compile(r"\b(any|anything|both|either|all|whatever|none|matter|care)\b|no pref")
+
+def profile_fields(user_profile):
+    """
+    Flatten a profile into its field values, accepting either a plain dict
+    or the `{"u": node}` record returned by `UserService.get_user_profile`.
+    """
+    if user_profile is None:
+        return {}
+    profile = dict(user_profile)
+    if set(profile) == {"u"}:
+        profile = dict(profile["u"] or {})
+    return profile
+
+
+def field(profile, name):
+    """The value of a profile field, stored as `name` or `<category>_name`."""
+    if name in profile:
+        return profile[name]
+    for key, value in profile.items():
+        if key.endswith(f"_{name}"):
+            return value
+    return None
+
+
+def as_list(value):
+    """Normalise a multiple-choice or free-text answer to a list of names."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in re.split(r"[,;/]", value) if part.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def as_int(value):
+    """The first whole number in an answer, None if there is none."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r"\d+", str(value or ""))
+    return int(match.group()) if match else None
+
+
+def airing_statuses(value):
+    """
+    Map an airing-status answer onto the catalog's statuses. Answers that
+    accept any status ("both", "no preference") or name none do not filter.
+
+    Args:
+        value: The answer, free text or a list of choices.
+
+    Returns:
+        list: The catalog statuses allowed, empty for no filter.
+    """
+    answers = [answer.lower().replace("_", " ") for answer in as_list(value)]
+    if any(NO_PREFERENCE.search(answer) for answer in answers):
+        return []
+    found = set()
+    for answer in answers:
+        for part in re.split(r"\band\b|\bor\b|&", answer):
+            found.update(next(([status] for status, pattern in STATUS_PATTERNS if pattern.search(part)), []))
+    if not found or found == set(AIRING_STATUSES):
+        return []
+    return [label for status in AIRING_STATUSES if status in found for label in AIRING_STATUSES[status]]
+
+
+def seen_anime_ids(user_items):
+    """Anime IDs among the item keys from `fetch_user_items`."""
+    return [int(item[len(ANIME_PREFIX):]) for item in user_items if item.startswith(ANIME_PREFIX)]
+
+
+class RecommendationConstraints:
+    """
+    Hard filters derived from the user's profile and pushed into candidate
+    retrieval: as predicates of the Neo4j candidate query, and as bitmask
+    filters over the compact index, so excluded anime are never scored,
+    fetched or sent to the LLM.
+    """
+
+    def __init__(self, preferred_genres=(), excluded_genres=(), excluded_ratings=(), statuses=(),
+                 max_episodes=None, excluded_anime_ids=()):
+        """
+        Args:
+            preferred_genres (iterable): Genres a candidate may belong to; retrieval hint, not a filter.
+            excluded_genres (iterable): Genres no candidate may belong to.
+            excluded_ratings (iterable): Ratings no candidate may carry.
+            statuses (iterable): Allowed catalog airing statuses, any if empty.
+            max_episodes (int): The longest series allowed; unknown counts always pass.
+            excluded_anime_ids (iterable): Anime the user has already seen.
+        """
+        self.preferred_genres = list(dict.fromkeys(preferred_genres))
+        self.excluded_genres = sorted(set(excluded_genres) - set(self.preferred_genres))
+        self.excluded_ratings = sorted(set(excluded_ratings))
+        self.statuses = sorted(set(statuses))
+        self.max_episodes = max_episodes
+        self.excluded_anime_ids = sorted(set(excluded_anime_ids))
+
+    @classmethod
+    def from_profile(cls, user_profile, user_items=()):
+        """
+        Derive the constraints from the user's profile answers and graph items.
+
+        Args:
+            user_profile (dict): The profile, or the record from `get_user_profile`.
+            user_items (list): The user's item keys, whose anime count as seen.
+
+        Returns:
+            RecommendationConstraints: The constraints.
+        """
+        profile = profile_fields(user_profile)
+        age = as_int(field(profile, "age"))
+        excluded_ratings = [] if age is None else [
+            rating for rating, min_age in settings.RATING_MIN_AGE.items() if age < min_age
+        ]
+        return cls(
+            preferred_genres=as_list(field(profile, "preferred_genres")),
+            excluded_genres=as_list(field(profile, "disliked_genres")),
+            excluded_ratings=excluded_ratings,
+            statuses=airing_statuses(field(profile, "airing_status")),
+            max_episodes=as_int(field(profile, "max_episodes")),
+            excluded_anime_ids=seen_anime_ids(user_items),
+        )
+
+    def query_params(self):
+        """Parameters of the constraint predicates in `CANDIDATE_QUERY`."""
+        return {
+            "excluded_genres": self.excluded_genres,
+            "excluded_ratings": self.excluded_ratings,
+            "statuses": self.statuses or None,
+            "max_episodes": self.max_episodes,
+            "excluded_anime_ids": self.excluded_anime_ids,
+        }
+
+    def row_filter(self, index):
+        """
+        Evaluate the constraints over every row of a compact index with
+        packed attributes, as bitmask and vector comparisons.
+
+        Args:
+            index (CompactEmbeddingIndex): The index.
+
+        Returns:
+            np.ndarray: bool array of allowed rows, or None if the index has no attributes.
+        """
+        if index.genre_masks is None:
+            return None
+        allowed = ~np.isin(index.anime_ids, self.excluded_anime_ids)
+        for names, vocabulary, masks in ((self.excluded_genres, index.genre_vocabulary, index.genre_masks),
+                                         (self.excluded_ratings, index.rating_vocabulary, index.rating_masks)):
+            # Only names the catalog knows, so answers never grow the shared vocabulary
+            known = set(vocabulary.names).intersection(names)
+            if known:
+                allowed &= ~(masks & vocabulary.mask(known, masks.shape[1])).any(axis=1)
+        if self.statuses:
+            codes = [index.status_names.index(status) for status in self.statuses if status in index.status_names]
+            allowed &= np.isin(index.status_codes, codes)
+        if self.max_episodes is not None:
+            allowed &= (index.episodes <= 0) | (index.episodes <= self.max_episodes)
+        return allowed
+
+    def to_dict(self):
+        return {
+            "excluded_genres": self.excluded_genres,
+            "excluded_ratings": self.excluded_ratings,
+            "statuses": self.statuses,
+            "max_episodes": self.max_episodes,
+            "excluded_anime": len(self.excluded_anime_ids),
+        }
@@ -0,0 +1,175 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from utils.resilience import DependencyError
+
+SESSION_HISTORY_KEY = "session_history_{user_id}"
+
+SUMMARY_KEY = "conversation_summary_{user_id}"
+
+# Bumped by every clear, so a refresh that started before it is discarded
+GENERATION_KEY = "conversation_generation_{user_id}"
+
+SESSION_TIMEOUT = 3600
+
+
+def clip(text, limit):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+class ConversationMemory:
+    """
+    Keeps each user's conversation as a short rolling summary plus the last
+    few raw turns in Redis. Older turns are folded into the summary by a
+    background job every few turns, so prompts stay bounded in size while
+    earlier preferences are still remembered.
+
+    Turns are numbered; the summary records the last turn it covers, so the
+    request path and the summariser never need to coordinate beyond that.
+    Clearing a conversation bumps its generation, which fences off a refresh
+    still running against the old one.
+    """
+
+    def __init__(self, raw_turns=None, summarize_every=None, turn_chars=None, max_workers=1):
+        """
+        Args:
+            raw_turns (int): Recent turns always kept verbatim.
+            summarize_every (int): Unsummarised turns beyond `raw_turns` that trigger a refresh.
+            turn_chars (int): Characters kept per message in prompts.
+            max_workers (int): Concurrent summary refreshes.
+        """
+        self.raw_turns = raw_turns or settings.CONVERSATION_RAW_TURNS
+        self.summarize_every = summarize_every or settings.CONVERSATION_SUMMARY_EVERY
+        self.turn_chars = turn_chars or settings.CONVERSATION_TURN_CHARS
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="conversation-summary")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Let queued summary refreshes finish and stop the executor."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def load(self, user_id):
+        """
+        Load a user's conversation.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            tuple: (summary dict with "text" and "through", numbered turns).
+        """
+        entries = cache.get_many([SESSION_HISTORY_KEY.format(user_id=user_id), SUMMARY_KEY.format(user_id=user_id)])
+        summary = entries.get(SUMMARY_KEY.format(user_id=user_id)) or {"text": "", "through": 0}
+        history = entries.get(SESSION_HISTORY_KEY.format(user_id=user_id)) or []
+        # Histories stored before turns were numbered
+        for number, turn in enumerate(history, start=summary["through"] + 1):
+            turn.setdefault("turn", number)
+        return summary, history
+
+    def append(self, history, summary, system, user):
+        """Append a turn to a loaded history, numbering it after the latest known turn."""
+        last = history[-1]["turn"] if history else summary["through"]
+        history.append({"system": system, "user": user, "turn": last + 1})
+        return history
+
+    def window(self, history, summary):
+        """
+        The raw turns to show next to the summary: those not yet summarised,
+        capped in count and clipped in length.
+
+        Returns:
+            list: Turns as {"system", "user"} dicts, oldest first.
+        """
+        pending = [turn for turn in history if turn["turn"] > summary["through"]]
+        return [
+            {"system": clip(turn["system"], self.turn_chars), "user": clip(turn["user"], self.turn_chars)}
+            for turn in pending[-(self.raw_turns + self.summarize_every):]
+        ]
+
+    def save(self, user_id, history, summary):
+        """
+        Store a user's history, dropping turns the summary already covers,
+        and queue a summary refresh when enough turns have accumulated.
+        """
+        history = [turn for turn in history if turn["turn"] > summary["through"]]
+        cache.set(SESSION_HISTORY_KEY.format(user_id=user_id), history, timeout=SESSION_TIMEOUT)
+        if len(history) >= self.raw_turns + self.summarize_every:
+            self.schedule(user_id)
+
+    def generation(self, user_id):
+        return cache.get(GENERATION_KEY.format(user_id=user_id), 0)
+
+    def clear(self, user_id):
+        key = GENERATION_KEY.format(user_id=user_id)
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+        cache.delete_many([SESSION_HISTORY_KEY.format(user_id=user_id), SUMMARY_KEY.format(user_id=user_id)])
+
+    def schedule(self, user_id):
+        with self._lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self.executor.submit(self._run, user_id)
+
+    def _run(self, user_id):
+        with self._lock:
+            self._pending.discard(user_id)
+        try:
+            self.refresh(user_id)
+        except DependencyError as e:
+            logging.warning(f"Conversation summary of user {user_id} not refreshed: {e}")
+        except Exception as e:
+            logging.error(f"Failed to refresh the conversation summary of user {user_id}: {e}")
+
+    def refresh(self, user_id):
+        """
+        Fold every turn older than the raw window into the summary. The
+        result is discarded if the conversation was cleared meanwhile.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            dict: The stored summary, or None if the conversation was cleared.
+        """
+        from .model_router import model_router
+        from .prompts import summary_prompt
+
+        generation = self.generation(user_id)
+        summary, history = self.load(user_id)
+        pending = [turn for turn in history if turn["turn"] > summary["through"]]
+        folded = pending[:-self.raw_turns] if len(pending) > self.raw_turns else []
+        if not folded:
+            return summary
+
+        turns = [{"system": clip(turn["system"], self.turn_chars), "user": clip(turn["user"], self.turn_chars)}
+                 for turn in folded]
+        text = model_router.invoke("summary", summary_prompt(summary["text"], turns,
+                                                             settings.CONVERSATION_SUMMARY_MAX_WORDS))
+        summary = {"text": text.strip(), "through": folded[-1]["turn"]}
+        if self.generation(user_id) != generation:
+            return None
+        cache.set(SUMMARY_KEY.format(user_id=user_id), summary, timeout=SESSION_TIMEOUT)
+        # A clear landing between the check and the write missed it
+        if self.generation(user_id) != generation:
+            cache.delete(SUMMARY_KEY.format(user_id=user_id))
+            return None
+        return summary
+
+
+conversation_memory = ConversationMemory()
@@ -0,0 +1,199 @@
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from django.conf import settings
+from utils.resilience import dependency, DependencyError, DependencyTimeout
+
+# The prefixes LangChain's `OllamaEmbeddings` adds, which the dataloader
+# embedded the stored Anime vectors with: documents as passages, searches as
+# queries. Keeping both sides the same keeps the vectors comparable.
+QUERY_INSTRUCTION = "query: "
+
+DOCUMENT_INSTRUCTION = "passage: "
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingService:
+    """
+    Shared embedding client that coalesces concurrent single-text requests
+    into one batched Ollama `/api/embed` call and caches vectors by text hash.
+    """
+
+    def __init__(self, model, window_ms=5, max_batch=32, cache_size=2048, client=None):
+        """
+        Args:
+            model (str): The Ollama embedding model.
+            window_ms (float): How long to wait for more requests after the first one.
+            max_batch (int): The largest batch sent to Ollama.
+            cache_size (int): How many vectors to keep in the LRU cache.
+            client (ollama.Client): The Ollama client, created lazily if omitted.
+        """
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._client = client
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "embedded": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import ollama
+            self._client = ollama.Client(timeout=dependency("ollama_embed").timeout)
+        return self._client
+
+    def embed_query(self, text, timeout=None):
+        """
+        Embed a single search text, waiting for the batch it joins.
+
+        Args:
+            text (str): The text to embed.
+            timeout (float): Seconds to wait for the vector, `EMBEDDING_TIMEOUT` by default.
+
+        Returns:
+            list: The embedding vector.
+
+        Raises:
+            DependencyTimeout: If the vector did not arrive in time.
+        """
+        return self._wait(self.submit(text), timeout)
+
+    def embed_documents(self, texts, timeout=None):
+        """
+        Embed many catalog documents, sharing batches with concurrent callers.
+
+        Args:
+            texts (list): The texts to embed.
+            timeout (float): Seconds to wait for each vector, `EMBEDDING_TIMEOUT` by default.
+
+        Returns:
+            list: One embedding vector per text.
+
+        Raises:
+            DependencyTimeout: If a vector did not arrive in time.
+        """
+        futures = [self.submit(text, DOCUMENT_INSTRUCTION) for text in texts]
+        return [self._wait(future, timeout) for future in futures]
+
+    def _wait(self, future, timeout):
+        timeout = timeout if timeout is not None else settings.EMBEDDING_TIMEOUT
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise DependencyTimeout(f"No embedding within {timeout} seconds")
+
+    def submit(self, text, instruction=QUERY_INSTRUCTION):
+        """
+        Queue a text for embedding.
+
+        Args:
+            text (str): The text to embed.
+            instruction (str): The prefix marking the text as a query or a document.
+
+        Returns:
+            Future: Resolves to the embedding vector.
+        """
+        text = instruction + text
+        key = text_key(text)
+        with self._lock:
+            self.stats["requests"] += 1
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(vector)
+                return future
+
+            # An identical text already waiting or in flight shares its result
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+
+            future = self._inflight[key] = Future()
+            self._ensure_worker()
+        self._queue.put((key, text, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._embed_batch(batch)
+
+    def _embed_batch(self, batch):
+        try:
+            response = dependency("ollama_embed").call(lambda: self.client.embed(
+                model=self.model,
+                input=[text for _, text, _ in batch],
+                keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            ), idempotent=True)
+            vectors = response["embeddings"]
+            if len(vectors) != len(batch):
+                raise DependencyError(f"Ollama returned {len(vectors)} embeddings for {len(batch)} inputs")
+        except Exception as e:
+            logging.error(f"Embedding batch of {len(batch)} failed: {e}")
+            # Resolve every waiter and forget the keys, so later requests for
+            # the same text start a new batch instead of a dead future
+            with self._lock:
+                for key, _, future in batch:
+                    self._inflight.pop(key, None)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["embedded"] += len(batch)
+            for (key, _, _), vector in zip(batch, vectors):
+                self._inflight.pop(key, None)
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """Return the worker's shared embedding service."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService(
+                model=settings.OLLAMA_EMBED_MODEL,
+                window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+                max_batch=settings.EMBEDDING_MAX_BATCH,
+                cache_size=settings.EMBEDDING_CACHE_SIZE,
+            )
+        return _service
@@ -0,0 +1,45 @@
+import json
+import functools
+from django.conf import settings
+from utils.resilience import dependency
+
+# LangChain modules are heavy to import, so they are only loaded the first
+# time a client is requested and the clients are shared by the worker.
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model):
+    """
+    Return the shared Ollama LLM client for a model.
+
+    Args:
+        model (str): The Ollama model name.
+
+    Returns:
+        OllamaLLM: The LLM client.
+    """
+    from langchain_ollama import OllamaLLM
+    # The HTTP timeout frees the pool thread if Ollama hangs past the deadline
+    return OllamaLLM(model=model, keep_alive=settings.OLLAMA_KEEP_ALIVE,
+                     client_kwargs={"timeout": dependency("ollama").timeout})
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser():
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser()
+
+
+@functools.lru_cache(maxsize=None)
+def load_questions(path):
+    """
+    Load the profile questions data once per worker.
+
+    Args:
+        path (str): The questions JSON file.
+
+    Returns:
+        dict: The questions by category.
+    """
+    with open(path) as f:
+        return json.load(f)
@@ -1,9 +1,13 @@
 import os
 import logging
 import requests
-from neo4j import GraphDatabase
 from dotenv import load_dotenv
-from langchain_community.embeddings import OllamaEmbeddings
+from utils.tracing import traced
+from utils.resilience import dependency, DependencyError
+from utils.query_log import query_log
+from utils.graph_store import GraphStore
+from utils.neo4j_connection import Neo4jConnection
+from .single_flight import SingleFlightError
 
 # Load environment variables
 load_dotenv(r'D:\Projects\AnimeBot\config.env')
@@ -14,13 +18,18 @@ logging.basicConfig(level=logging.INFO,
 
 
 class API_CALL:
-    def __init__(self):
-        self.NEO4J_URI = os.getenv('NEO4J_URI')
-        self.NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
-        self.NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
-        self.AUTH = (self.NEO4J_USERNAME, self.NEO4J_PASSWORD)
-        self.driver = GraphDatabase.driver(self.NEO4J_URI, auth=self.AUTH)
-        self.embedder = OllamaEmbeddings(model="nomic-embed-text")
+    def __init__(self, driver=None, api_url=None):
+        # Share the worker's driver and its connection pool unless given one
+        self.driver = driver or Neo4jConnection().get_driver()
+        # MAL_API_URL points the client at a local stand-in for benchmarks
+        self.api_url = api_url or os.getenv('MAL_API_URL', 'https://api.myanimelist.net/v2')
+        self.store = GraphStore(self.driver)
+        self.mal = dependency("mal")
+
+    @property
+    def embedder(self):
+        from .embedding_service import get_embedding_service
+        return get_embedding_service()
 
     def create_anime_text(self, row):
         genres = ", ".join([genre['name'] for genre in row['genres']])
@@ -39,6 +48,7 @@ class API_CALL:
         ]
         return " ".join(attributes)
 
+    @traced("neo4j.anime_exists_name")
     def anime_exists_name(self, anime_name):
         query = """
         MATCH (anime:Anime)
@@ -46,19 +56,35 @@ class API_CALL:
         RETURN COUNT(anime) > 0 AS exists, elementId(anime) AS unique_id
         """
 
-        with self.driver.session() as session:
-            result = session.run(query, {'anime_name': anime_name})
-            record = result.single()
-            exists = record['exists']
-            unique_id = record['unique_id'] if exists else None
-            return exists, unique_id
+        record = self.store.read_single(query, {'anime_name': anime_name})
+        # No match groups into no row at all
+        exists = record is not None and record['exists']
+        unique_id = record['unique_id'] if exists else None
+        return exists, unique_id
         
+    @traced("mal.anime_data")
     def anime_data(self, anime_name):
-        api_url = f"https://api.myanimelist.net/v2/anime?q={
+        # Concurrent lookups of the same title share one MAL call
+        from .single_flight import single_flight, flight_key
+        return single_flight.do(flight_key("mal_anime_data", payload=anime_name.lower()),
+                                lambda: self._anime_data(anime_name))
+
+    def _get(self, api_url):
+        # Reads are idempotent, so they are retried and hedged; server errors
+        # and rate limiting raise so they count against the circuit breaker
+        def request():
+            response = requests.request('GET', api_url, headers={
+                "X-MAL-CLIENT-ID": os.getenv('CLIENT_ID')
+            }, timeout=self.mal.timeout)
+            if response.status_code >= 500 or response.status_code == 429:
+                response.raise_for_status()
+            return response
+        return self.mal.call(request, idempotent=True)
+
+    def _anime_data(self, anime_name):
+        api_url = f"{self.api_url}/anime?q={
             anime_name}&limit=1&fields=synopsis"
-        response = requests.request('GET', api_url, headers={
-            "X-MAL-CLIENT-ID": os.getenv('CLIENT_ID')
-        })
+        response = self._get(api_url)
 
         if response.status_code == 200:
             data = response.json()['data'][0]['node']
@@ -67,7 +93,24 @@ class API_CALL:
 
             return url, synopsis
 
-
+    @traced("mal.enrich")
+    def enrich_recommendations(self, recommendations):
+        # Enrichment is optional: when MAL is slow or down the catalog's own
+        # image and synopsis are kept, and an open circuit skips it quickly
+        for recommendation in recommendations:
+            try:
+                data = self.anime_data(recommendation["title"])
+            except (DependencyError, SingleFlightError) as e:
+                logging.warning(f"Skipping MAL enrichment of {recommendation['title']}: {e}")
+                continue
+            if data is None:
+                continue
+            url, synopsis = data
+            recommendation["image_url"] = url or recommendation.get("image_url")
+            recommendation["synopsis"] = synopsis or recommendation.get("synopsis")
+        return recommendations
+
+    @traced("neo4j.genre_exists")
     def genre_exists(self, genre_name):
         query = """
         MATCH (genre:Genre)
@@ -75,22 +118,21 @@ class API_CALL:
         RETURN COUNT(genre) > 0 AS exists, elementId(genre) AS unique_id
         """
 
-        with self.driver.session() as session:
-            result = session.run(query, {'genre': genre_name})
-            record = result.single()
-            exists = record['exists']
-            unique_id = record['unique_id'] if exists else None
-            return exists, unique_id
+        record = self.store.read_single(query, {'genre': genre_name})
+        exists = record is not None and record['exists']
+        unique_id = record['unique_id'] if exists else None
+        return exists, unique_id
 
+    @traced("ollama.embed_documents")
     def embed_text(self, text):
-        return self.embedder.embed_query(text)
+        # Anime are documents, embedded like the dataloader's catalog
+        return self.embedder.embed_documents([text])[0]
 
+    @traced("mal.get_data")
     def get_data(self, anime_name):
-        api_url = f"https://api.myanimelist.net/v2/anime?q={
+        api_url = f"{self.api_url}/anime?q={
             anime_name}&limit=1"
-        response = requests.request('GET', api_url, headers={
-            "X-MAL-CLIENT-ID": os.getenv('CLIENT_ID')
-        })
+        response = self._get(api_url)
 
         if response.status_code == 200:
             data = response.json()['data'][0]['node']
@@ -132,13 +174,15 @@ class API_CALL:
                 {'batch': genre_data}
             ))
 
-            with self.driver.session() as session:
+            # The anime and its genres are written as one retryable unit
+            def load(tx):
                 for query, params in queries:
-                    session.run(query, params)
+                    query_log.run(tx, query, params)
+
+            self.store.execute_write(load)
 
             logging.info(f"Anime {anime_id} data loaded successfully.")
 
     def close(self):
-        if self.driver:
-            self.driver.close()
-            logging.info("Neo4J driver closed")
+        # The driver outlives the client; it is closed with Neo4jConnection
+        pass
@@ -0,0 +1,206 @@
+import time
+import threading
+from collections import deque
+from django.conf import settings
+from prometheus_client import Counter, Histogram
+from utils.tracing import LATENCY_BUCKETS
+from utils.resilience import dependency
+from .llm_clients import get_llm
+
+MODEL_SECONDS = Histogram(
+    "animebot_model_seconds",
+    "Generation latency per chat model and task.",
+    ["model", "task"],
+    buckets=LATENCY_BUCKETS,
+)
+
+MODEL_QUEUE_SECONDS = Histogram(
+    "animebot_model_queue_seconds",
+    "Time LLM calls waited for a free Ollama slot.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ROUTING_DECISIONS = Counter(
+    "animebot_model_routes_total",
+    "Chat model routing decisions.",
+    ["task", "model", "reason"],
+)
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by nearest rank, 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ModelStats:
+    """
+    Recent latency and queue-time samples of one model. Samples age out, so
+    a model that was downgraded is tried again once its slow period is over.
+    """
+
+    def __init__(self, window=50, window_seconds=300):
+        self.window_seconds = window_seconds
+        self.latencies = deque(maxlen=window)
+        self.queue_times = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def _recent(self, samples):
+        cutoff = time.monotonic() - self.window_seconds
+        return [value for at, value in samples if at >= cutoff]
+
+    def record(self, latency=None, queue_time=None):
+        with self._lock:
+            now = time.monotonic()
+            if latency is not None:
+                self.latencies.append((now, latency))
+            if queue_time is not None:
+                self.queue_times.append((now, queue_time))
+
+    def summary(self):
+        with self._lock:
+            latencies = self._recent(self.latencies)
+            queue_times = self._recent(self.queue_times)
+        return {
+            "samples": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "queue_p95": percentile(queue_times, 95),
+        }
+
+
+class ModelRouter:
+    """
+    Picks the chat model for each task: the task's escalation tier while that
+    model's recent p95 latency and queue time are within the task's budgets,
+    else the preferred tier under the same test, otherwise the next smaller
+    tier.
+    """
+
+    def __init__(self, routes=None, tiers=None, window=None, window_seconds=None, probe_every=None):
+        """
+        Args:
+            routes (dict): Task -> {"tiers": [preferred, ..., smallest], "escalate": tier (optional),
+                "p95_budget": seconds, "queue_budget": seconds}.
+            tiers (dict): Tier name -> Ollama model.
+            window (int): Samples kept per model.
+            window_seconds (float): Age after which samples are dropped.
+            probe_every (int): Send one call in this many to an escalation tier with no
+                recent samples, 0 to never probe.
+        """
+        self.routes = routes or settings.MODEL_ROUTES
+        self.tiers = tiers or settings.OLLAMA_MODEL_TIERS
+        self.window = window or settings.MODEL_ROUTER_WINDOW
+        self.window_seconds = window_seconds or settings.MODEL_ROUTER_WINDOW_SECONDS
+        self.probe_every = settings.MODEL_ROUTER_PROBE_EVERY if probe_every is None else probe_every
+        self.stats = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def models(self):
+        """Return every model a task may be routed to, escalation and preferred tiers first."""
+        return list(dict.fromkeys(
+            self.tiers[tier]
+            for route in self.routes.values()
+            for tier in ([route["escalate"]] if "escalate" in route else []) + route["tiers"]
+        ))
+
+    def stats_for(self, model):
+        with self._lock:
+            if model not in self.stats:
+                self.stats[model] = ModelStats(self.window, self.window_seconds)
+            return self.stats[model]
+
+    def choose(self, task):
+        """
+        Pick the model for a task.
+
+        Args:
+            task (str): The task type, a key of `MODEL_ROUTES`.
+
+        Returns:
+            tuple: (model, reason) where reason is "escalated", "probe", "preferred",
+                "slow" or "queued".
+        """
+        route = self.routes[task]
+        escalation = self._escalation(task, route)
+        if escalation is not None:
+            return escalation
+
+        reason = "preferred"
+        for tier in route["tiers"][:-1]:
+            model = self.tiers[tier]
+            summary = self.stats_for(model).summary()
+            if summary["queue_p95"] > route["queue_budget"]:
+                reason = "queued"
+            elif summary["p95"] > route["p95_budget"]:
+                reason = "slow"
+            else:
+                return model, reason
+        return self.tiers[route["tiers"][-1]], reason
+
+    def _escalation(self, task, route):
+        """Return the escalation tier's (model, reason) when the task may use it, else None."""
+        tier = route.get("escalate")
+        if tier is None:
+            return None
+        model = self.tiers[tier]
+        summary = self.stats_for(model).summary()
+        if summary["samples"]:
+            within = summary["queue_p95"] <= route["queue_budget"] and summary["p95"] <= route["p95_budget"]
+            return (model, "escalated") if within else None
+
+        # Unmeasured (or aged out): an occasional call finds out whether it fits the budget
+        with self._lock:
+            self._calls[task] = calls = self._calls.get(task, 0) + 1
+        if self.probe_every and calls % self.probe_every == 0:
+            return model, "probe"
+        return None
+
+    def invoke(self, task, prompt):
+        """
+        Generate a completion for a task with the routed model, through the
+        Ollama dependency's deadline and circuit breaker.
+
+        Args:
+            task (str): The task type.
+            prompt (str): The prompt.
+
+        Returns:
+            str: The completion.
+
+        Raises:
+            DependencyError: If Ollama is unavailable.
+        """
+        model, reason = self.choose(task)
+        ROUTING_DECISIONS.labels(task=task, model=model, reason=reason).inc()
+        stats = self.stats_for(model)
+        submitted = time.perf_counter()
+
+        def generate():
+            started = time.perf_counter()
+            stats.record(queue_time=started - submitted)
+            MODEL_QUEUE_SECONDS.labels(model=model).observe(started - submitted)
+            try:
+                return get_llm(model).invoke(prompt)
+            finally:
+                # Failures and timeouts count too, so a struggling model is avoided
+                latency = time.perf_counter() - started
+                stats.record(latency=latency)
+                MODEL_SECONDS.labels(model=model, task=task).observe(latency)
+
+        return dependency("ollama").call(generate)
+
+    def report(self):
+        """Return the routing table and recent per-model latency for tuning."""
+        return {
+            "routes": {task: dict(zip(("model", "reason"), self.choose(task))) for task in self.routes},
+            "models": {model: self.stats_for(model).summary() for model in self.models()},
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,57 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Profile fields whose text feeds the preference vector, matching the keys
+# `Chat.prepare_user_profile_embedding` prioritises.
+PREFERENCE_FIELDS = ("preferred_genres", "favorite_anime", "themes")
+
+
+class PreferenceUpdater:
+    """
+    Embeds preference signals (chat turns, liked genres, profile answers) off
+    the request path and blends them into the user's stored preference vector.
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="preference-updater")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Let queued preference updates finish and stop the executor; `record` starts a new one."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def record(self, user_id, text, alpha):
+        """
+        Queue a preference signal for a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            text (str): The text describing the preference.
+            alpha (float): The blend weight of the new signal, between 0 and 1.
+
+        Returns:
+            Future: Resolves once the vector has been updated.
+        """
+        return self.executor.submit(self._update, user_id, text, alpha)
+
+    def _update(self, user_id, text, alpha):
+        from .embedding_service import get_embedding_service
+        from .user_graph_management import UserService
+
+        try:
+            vector = get_embedding_service().embed_query(text)
+            UserService().blend_preference_vector(user_id, vector, alpha)
+        except Exception as e:
+            logging.error(f"Failed to update preference vector for user {user_id}: {e}")
+
+
+preference_updater = PreferenceUpdater()
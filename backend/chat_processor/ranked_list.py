@@ -0,0 +1,150 @@
+import json
+import uuid
+import base64
+from django.conf import settings
+from django.core.cache import cache
+
+
+def build_recommendation(candidate, anime):
+    """
+    Merge a ranked candidate with its hydrated metadata into the
+    recommendation shape returned by the API.
+
+    Args:
+        candidate (dict): The ranked candidate row.
+        anime (dict): The hydrated metadata row, empty if not hydrated.
+
+    Returns:
+        dict: The recommendation.
+    """
+    return {
+        "anime_id": candidate["anime_id"],
+        "title": anime.get("name"),
+        "similarity": candidate["similarity"],
+        "final_score": candidate["final_score"],
+        "synopsis": anime.get("synopsis"),
+        "image_url": anime.get("image_url"),
+        "score": candidate["score"],
+        "aired": anime.get("aired"),
+        "status": candidate.get("status", anime.get("status")),
+        "duration": anime.get("duration"),
+        "no_episodes": anime.get("no_episodes"),
+        "rating": anime.get("ratings", []),
+        "type": candidate.get("types", anime.get("types", [])),
+        "sourced_from": anime.get("sources", []),
+        "genres": candidate["genres"]
+    }
+
+
+def encode_cursor(run_id, position, filters):
+    payload = json.dumps({"run": run_id, "pos": position, "filters": filters}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a pagination cursor.
+
+    Args:
+        cursor (str): The opaque cursor from a previous page.
+
+    Returns:
+        tuple: (run_id, position, filters).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return payload["run"], int(payload["pos"]), payload.get("filters", {})
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def matches(candidate, filters):
+    """Check a ranked candidate against the type, status and min_score filters."""
+    if filters.get("type") and filters["type"] not in (candidate.get("types") or []):
+        return False
+    if filters.get("status") and candidate.get("status") != filters["status"]:
+        return False
+    if filters.get("min_score") is not None:
+        try:
+            if float(candidate["score"]) < float(filters["min_score"]):
+                return False
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+class RankedListCache:
+    """
+    Caches the full ranked candidate list of a recommendation run per user,
+    so further pages and filtered views are served without re-ranking.
+    """
+
+    run_key_template = "ranked_candidates_{user_id}_{run_id}"
+    latest_key_template = "ranked_candidates_{user_id}_latest"
+
+    def save(self, user_id, ranked, hydrated=None):
+        """
+        Store a ranked list as the user's latest run.
+
+        Args:
+            user_id (int): The ID of the user.
+            ranked (list): Ranked candidate rows, best first.
+            hydrated (dict): anime_id -> metadata already fetched for the run.
+
+        Returns:
+            str: The run ID.
+        """
+        run_id = uuid.uuid4().hex[:12]
+        entry = {"run_id": run_id, "ranked": ranked, "hydrated": hydrated or {}}
+        cache.set_many({
+            self.run_key_template.format(user_id=user_id, run_id=run_id): entry,
+            self.latest_key_template.format(user_id=user_id): run_id,
+        }, timeout=settings.RANKED_LIST_TIMEOUT)
+        return run_id
+
+    def load(self, user_id, run_id=None):
+        """
+        Load a run, or the user's latest run when no run ID is given.
+
+        Returns:
+            dict: The run entry, or None if it expired.
+        """
+        run_id = run_id or cache.get(self.latest_key_template.format(user_id=user_id))
+        if run_id is None:
+            return None
+        return cache.get(self.run_key_template.format(user_id=user_id, run_id=run_id))
+
+    def add_hydrated(self, user_id, entry, metadata):
+        """Remember metadata hydrated for a page so revisiting it is a cache read."""
+        entry["hydrated"].update(metadata)
+        cache.set(self.run_key_template.format(user_id=user_id, run_id=entry["run_id"]), entry,
+                  timeout=settings.RANKED_LIST_TIMEOUT)
+
+    def page(self, entry, position=0, limit=10, filters=None):
+        """
+        Slice a page of filtered candidates from a run.
+
+        Args:
+            entry (dict): The run entry.
+            position (int): Index in the ranked list to resume from.
+            limit (int): The page size.
+            filters (dict): Optional type, status and min_score filters.
+
+        Returns:
+            tuple: (candidates, next cursor or None).
+        """
+        filters = filters or {}
+        ranked = entry["ranked"]
+        page = []
+        while position < len(ranked) and len(page) < limit:
+            if matches(ranked[position], filters):
+                page.append(ranked[position])
+            position += 1
+        more = any(matches(candidate, filters) for candidate in ranked[position:])
+        return page, encode_cursor(entry["run_id"], position, filters) if more else None
+
+
+ranked_list_cache = RankedListCache()
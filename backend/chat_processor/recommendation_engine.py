@@ -0,0 +1,233 @@
+import os
+import logging
+import threading
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from utils.graph_store import GraphStore
+from .similar_anime import FAVORITE_RELATION
+
+# Items are typed so that genre likes and anime likes share one matrix:
+# users who like a genre "also liked" the anime other fans of it liked.
+ITEM_KEY = """
+    CASE WHEN n:Anime THEN 'Anime:' + toString(n.anime_id)
+         ELSE 'Genre:' + n.name END
+"""
+
+ANIME_PREFIX = "Anime:"
+
+# Relationships are named after the profile field they answer
+PREFERRED_GENRE_RELATION = "preferred_genres"
+
+# The like-style relationships `UserService.update_relationship` writes.
+# Only these are positive interactions; any other edge from a user, e.g. a
+# dislike, never becomes a "users like you also liked" signal.
+LIKED_RELATIONS = (FAVORITE_RELATION, PREFERRED_GENRE_RELATION)
+
+LIKED_PATTERN = "|".join(LIKED_RELATIONS)
+
+
+class CollaborativeFilteringEngine:
+    """
+    Item-item collaborative filtering over the User->Anime/Genre likes
+    (`LIKED_RELATIONS`) written by `UserService.update_relationship`.
+
+    The similarity matrix is built offline by `build` and kept in memory for
+    serving, so a lookup is one sparse matrix-vector product.
+    """
+
+    def __init__(self, neighbours=50):
+        """
+        Args:
+            neighbours (int): How many most-similar items to keep per item.
+        """
+        self.neighbours = neighbours
+        self.items = np.array([], dtype=object)
+        self.item_index = {}
+        self.similarity = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.is_anime = np.array([], dtype=bool)
+
+    def fetch_interactions(self, driver):
+        """
+        Read every User->Anime/Genre like from Neo4j.
+
+        Args:
+            driver (neo4j.Driver): The Neo4j driver.
+
+        Returns:
+            list: (user_id, item_key) pairs. A retried read may repeat
+            pairs, which `build` ignores.
+        """
+        query = f"""
+        MATCH (u:User)-[:{LIKED_PATTERN}]->(n)
+        WHERE n:Anime OR n:Genre
+        RETURN DISTINCT u.id AS user_id, {ITEM_KEY} AS item
+        """
+        interactions = []
+        # Keep plain tuples rather than buffering every driver Record
+        GraphStore(driver).read_each(query, lambda record: interactions.append((record["user_id"], record["item"])),
+                                     fetch_size=settings.EXPORT_FETCH_SIZE)
+        return interactions
+
+    def build(self, interactions):
+        """
+        Build the sparse user-item matrix and precompute item-item cosine
+        co-occurrence similarities, keeping the top neighbours per item.
+
+        Args:
+            interactions (list): (user_id, item_key) pairs.
+
+        Returns:
+            CollaborativeFilteringEngine: self, for chaining.
+        """
+        users = {}
+        items = {}
+        rows, cols = [], []
+        for user_id, item in interactions:
+            rows.append(users.setdefault(user_id, len(users)))
+            cols.append(items.setdefault(item, len(items)))
+
+        data = np.ones(len(rows), dtype=np.float32)
+        user_item = sparse.csr_matrix((data, (rows, cols)), shape=(len(users), len(items)))
+        # Repeated pairs would otherwise be summed into weights > 1
+        user_item.data[:] = 1.0
+
+        co_occurrence = (user_item.T @ user_item).tocsr()
+        co_occurrence.setdiag(0)
+        co_occurrence.eliminate_zeros()
+
+        norms = np.sqrt(np.asarray(user_item.sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        inverse = sparse.diags(1.0 / norms)
+        similarity = (inverse @ co_occurrence @ inverse).tocsr()
+
+        self.items = np.array(list(items), dtype=object)
+        self.item_index = items
+        self.similarity = self._prune(similarity).astype(np.float32)
+        self.is_anime = np.array([item.startswith(ANIME_PREFIX) for item in self.items], dtype=bool)
+
+        logging.info(f"Built CF model over {len(users)} users, {len(items)} items, "
+                     f"{self.similarity.nnz} similarities")
+        return self
+
+    def _prune(self, similarity):
+        """Keep only the `neighbours` strongest similarities in each row."""
+        rows, cols, data = [], [], []
+        for row in range(similarity.shape[0]):
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            values = similarity.data[start:end]
+            indices = similarity.indices[start:end]
+            if len(values) > self.neighbours:
+                keep = np.argpartition(values, -self.neighbours)[-self.neighbours:]
+                values, indices = values[keep], indices[keep]
+            rows.extend([row] * len(values))
+            cols.extend(indices)
+            data.extend(values)
+        return sparse.csr_matrix((data, (rows, cols)), shape=similarity.shape)
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            items=self.items.astype(str),
+            data=self.similarity.data,
+            indices=self.similarity.indices,
+            indptr=self.similarity.indptr,
+            shape=np.array(self.similarity.shape),
+            neighbours=np.array(self.neighbours),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            engine = cls(neighbours=int(archive["neighbours"]))
+            engine.items = archive["items"].astype(object)
+            engine.similarity = sparse.csr_matrix(
+                (archive["data"], archive["indices"], archive["indptr"]),
+                shape=tuple(archive["shape"]),
+            )
+        engine.item_index = {item: index for index, item in enumerate(engine.items)}
+        engine.is_anime = np.array([item.startswith(ANIME_PREFIX) for item in engine.items], dtype=bool)
+        return engine
+
+    def recommend(self, user_items, k=50):
+        """
+        Score anime by how strongly they co-occur with the user's liked items.
+
+        Args:
+            user_items (list): Item keys the user is related to.
+            k (int): The number of candidates to return.
+
+        Returns:
+            dict: anime_id -> score in [0, 1], best first.
+        """
+        seen = [self.item_index[item] for item in user_items if item in self.item_index]
+        if not seen or k <= 0:
+            return {}
+
+        profile = np.zeros(len(self.items), dtype=np.float32)
+        profile[seen] = 1.0
+        scores = self.similarity.T @ profile
+        scores[seen] = 0.0
+        scores[~self.is_anime] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) == 0:
+            return {}
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        top = scores[candidates[0]]
+        return {
+            int(self.items[index][len(ANIME_PREFIX):]): float(scores[index] / top)
+            for index in candidates
+        }
+
+
+def fetch_user_items(driver, user_id):
+    """
+    Read the item keys a single user likes.
+
+    Args:
+        driver (neo4j.Driver): The Neo4j driver.
+        user_id (int): The ID of the user.
+
+    Returns:
+        list: The user's item keys.
+    """
+    query = f"""
+    MATCH (u:User {{id: $user_id}})-[:{LIKED_PATTERN}]->(n)
+    WHERE n:Anime OR n:Genre
+    RETURN DISTINCT {ITEM_KEY} AS item
+    """
+    records = GraphStore(driver).read(query, for_user=user_id, user_id=user_id)
+    return [record["item"] for record in records]
+
+
+_engine = None
+_engine_mtime = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(path):
+    """
+    Return the in-memory engine for this worker, reloading it when the batch
+    job has written a newer model file.
+
+    Args:
+        path (str): The model file written by `build_cf_model`.
+
+    Returns:
+        CollaborativeFilteringEngine: The loaded engine, empty if no model exists yet.
+    """
+    global _engine, _engine_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    with _engine_lock:
+        if _engine is None or mtime != _engine_mtime:
+            _engine = CollaborativeFilteringEngine.load(path) if mtime else CollaborativeFilteringEngine()
+            _engine_mtime = mtime
+        return _engine
@@ -0,0 +1,195 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+
+
+class RecommendationStore:
+    """
+    Redis-backed store of materialised recommendation lists, stamped with the
+    profile version and preference vector updates they were computed from.
+    """
+
+    key_template = "recommendations_{user_id}"
+
+    def key(self, user_id):
+        return self.key_template.format(user_id=user_id)
+
+    def get(self, user_id):
+        """
+        Fetch the stored entry for a user.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            dict: The entry with `version`, `computed_at` and `recommendations`, or None.
+        """
+        return cache.get(self.key(user_id))
+
+    def get_fresh(self, user_id, version):
+        """
+        Fetch the stored entry only if it matches the given version stamp.
+
+        Args:
+            user_id (int): The ID of the user.
+            version (tuple): The current stamp from `UserService.get_profile_version`.
+
+        Returns:
+            dict: The entry, as from `get`, or None when missing or stale.
+        """
+        entry = self.get(user_id)
+        if entry is None or version is None or entry["version"] != version:
+            return None
+        # Stored before the ranked list was kept alongside
+        if "ranked" not in entry:
+            return None
+        return entry
+
+    def set(self, user_id, version, recommendations, ranked=(), hydrated=None):
+        """
+        Store a recommendation list under its version stamp.
+
+        Args:
+            user_id (int): The ID of the user.
+            version (tuple): The stamp the list was computed from.
+            recommendations (list): The enriched recommendation list.
+            ranked (list): The full ranked candidate list behind it, for paging.
+            hydrated (dict): anime_id -> display metadata of the first page.
+
+        Returns:
+            dict: The stored entry, or None if a newer one was kept.
+        """
+        entry = cache.get(self.key(user_id))
+        # Never let a slow, older computation overwrite a newer one
+        if entry is not None and version is not None and entry["version"] > version:
+            return None
+        entry = {
+            "version": version,
+            "computed_at": time.time(),
+            "recommendations": recommendations,
+            "ranked": list(ranked),
+            "hydrated": hydrated or {},
+        }
+        cache.set(self.key(user_id), entry, timeout=settings.RECOMMENDATION_STORE_TIMEOUT)
+        return entry
+
+    def invalidate(self, user_id):
+        cache.delete(self.key(user_id))
+
+
+class RecommendationMaterializer:
+    """
+    Recomputes a user's recommendation list in the background once their
+    profile stops changing, so `/recommend` can be served straight from the
+    store. A questionnaire's burst of answers is debounced into one run.
+
+    Runs only write the store; the ranked list a user is paging through is
+    replaced when they next ask for recommendations, not behind their back.
+    """
+
+    def __init__(self, store=None, max_workers=None, delay=None):
+        """
+        Args:
+            store (RecommendationStore): Where lists are stored.
+            max_workers (int): Concurrent recomputations.
+            delay (float): Seconds without profile changes before a user is recomputed.
+        """
+        self.store = store or RecommendationStore()
+        self.max_workers = max_workers or settings.RECOMMENDATION_MATERIALIZER_WORKERS
+        self.delay = delay if delay is not None else settings.RECOMMENDATION_MATERIALIZER_DELAY
+        self._executor = None
+        self._pending = set()
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="recommendation-materializer")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Drop debounced recomputations, let queued ones finish and stop the executor."""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def schedule(self, user_id):
+        """
+        Queue a recomputation for a user once `delay` seconds pass without
+        another change. Each change restarts the wait, and requests for a
+        user that is already queued are coalesced into the pending run.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        with self._lock:
+            timer = self._timers.get(user_id)
+            if timer is not None:
+                timer.cancel()
+            timer = self._timers[user_id] = threading.Timer(self.delay, self._submit, args=(user_id, ))
+            timer.daemon = True
+            timer.start()
+
+    def _submit(self, user_id):
+        with self._lock:
+            self._timers.pop(user_id, None)
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self.executor.submit(self._run, user_id)
+
+    def _run(self, user_id):
+        with self._lock:
+            self._pending.discard(user_id)
+        try:
+            self.materialize(user_id)
+        except Exception as e:
+            logging.error(f"Failed to materialise recommendations for user {user_id}: {e}")
+
+    def materialize(self, user_id, chat=None):
+        """
+        Compute, enrich and store the recommendation list for a user, with
+        the ranked list behind it. The user's paging session is left as is.
+
+        Args:
+            user_id (int): The ID of the user.
+            chat (Chat): An existing chat instance to reuse, if any.
+
+        Returns:
+            dict: The stored entry, as from `RecommendationStore.get`.
+        """
+        from .chatbot import Chat
+        from .mal_api import API_CALL
+
+        chat = chat or Chat(user_id=user_id)
+        # Read the stamp before computing so a concurrent profile write, or a
+        # preference blend landing mid-computation, leaves the stored list
+        # stale rather than wrongly fresh.
+        version = chat.user_service.get_profile_version(user_id)
+        user_profile = chat.user_service.get_user_profile(user_id)
+        user_profile_text, ranked, metadata = chat.rank_and_hydrate(user_profile)
+        response = chat.explain(user_profile_text, ranked, metadata)
+
+        mal_api = API_CALL()
+        try:
+            recommendations = mal_api.enrich_recommendations(response["Recommendations"])
+        finally:
+            mal_api.close()
+
+        entry = self.store.set(user_id, version, recommendations, ranked=ranked, hydrated=metadata)
+        # A newer list was stored meanwhile; this one is still the answer computed
+        return entry or {"version": version, "recommendations": recommendations, "ranked": ranked,
+                         "hydrated": metadata}
+
+
+recommendation_store = RecommendationStore()
+materializer = RecommendationMaterializer(store=recommendation_store)
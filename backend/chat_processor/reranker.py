@@ -0,0 +1,216 @@
+import threading
+import numpy as np
+from django.conf import settings
+
+# Number of set bits for every byte value, used to popcount packed masks
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def popcount(masks):
+    """
+    Count the set bits of packed uint64 masks along the last axis.
+
+    Args:
+        masks (np.ndarray): uint64 array of shape (..., words).
+
+    Returns:
+        np.ndarray: int array of shape (...).
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    counts = _POPCOUNT[masks.view(np.uint8)]
+    # Explicit byte axis, so empty candidate sets reshape too
+    return counts.reshape(*masks.shape, 8).sum(axis=(-2, -1), dtype=np.int32)
+
+
+class GenreVocabulary:
+    """
+    Assigns every genre name a fixed bit so genre sets can be packed into
+    uint64 masks once and compared with bitwise operations.
+    """
+
+    def __init__(self, genres=()):
+        self._index = {}
+        self._lock = threading.Lock()
+        for genre in genres:
+            self.bit(genre)
+
+    def bit(self, genre):
+        index = self._index.get(genre)
+        if index is None:
+            with self._lock:
+                index = self._index.setdefault(genre, len(self._index))
+        return index
+
+    @property
+    def names(self):
+        """The known genres in bit order."""
+        return sorted(self._index, key=self._index.get)
+
+    @property
+    def words(self):
+        return max(1, (len(self._index) + 63) // 64)
+
+    def mask(self, genres, words=None):
+        """
+        Pack a genre collection into a single mask row.
+
+        Args:
+            genres (iterable): Genre names.
+            words (int): The mask width in uint64 words.
+
+        Returns:
+            np.ndarray: uint64 array of shape (words,).
+        """
+        return self.masks([genres], words)[0]
+
+    def masks(self, genre_lists, words=None):
+        """
+        Pack many genre collections into a mask matrix.
+
+        Args:
+            genre_lists (list): One genre collection per candidate.
+            words (int): The mask width in uint64 words, defaults to the vocabulary width.
+
+        Returns:
+            np.ndarray: uint64 array of shape (len(genre_lists), words).
+        """
+        rows, bits = [], []
+        for row, genres in enumerate(genre_lists):
+            for genre in genres or ():
+                rows.append(row)
+                bits.append(self.bit(genre))
+
+        words = words or self.words
+        masks = np.zeros((len(genre_lists), words), dtype=np.uint64)
+        rows = np.asarray(rows, dtype=np.int64)
+        bits = np.asarray(bits, dtype=np.uint64)
+        # Bits past the requested width belong to genres no candidate has
+        keep = bits < words * 64
+        rows, bits = rows[keep], bits[keep]
+        np.bitwise_or.at(masks, (rows, (bits // 64).astype(np.int64)), np.uint64(1) << (bits % 64))
+        return masks
+
+
+class HybridReranker:
+    """
+    Scores candidates as NumPy arrays and diversifies the result with
+    maximal marginal relevance over genre overlap.
+    """
+
+    def __init__(self, weights=None, mmr_lambda=None, vocabulary=None):
+        """
+        Args:
+            weights (dict): Overrides for `settings.RERANKER_WEIGHTS`.
+            mmr_lambda (float): Relevance/diversity trade-off, 1.0 disables diversification.
+                Defaults to `settings.RERANKER_MMR_LAMBDA`.
+            vocabulary (GenreVocabulary): A shared genre vocabulary.
+        """
+        self.weights = {**settings.RERANKER_WEIGHTS, **(weights or {})}
+        self.mmr_lambda = settings.RERANKER_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        self.vocabulary = vocabulary or GenreVocabulary()
+
+    def relevance(self, similarity, genre_masks, preferred_mask, disliked_mask,
+                  collaborative=None, score=None, popularity=None):
+        """
+        Compute the weighted relevance of every candidate.
+
+        Args:
+            similarity (np.ndarray): Cosine similarity per candidate.
+            genre_masks (np.ndarray): Packed genre masks, shape (n, words).
+            preferred_mask (np.ndarray): Packed preferred genres, shape (words,).
+            disliked_mask (np.ndarray): Packed disliked genres, shape (words,).
+            collaborative (np.ndarray): Collaborative filtering score per candidate in [0, 1].
+            score (np.ndarray): MAL score per candidate on a 0-10 scale.
+            popularity (np.ndarray): Popularity prior per candidate in [0, 1].
+
+        Returns:
+            np.ndarray: float32 relevance per candidate.
+        """
+        n = len(similarity)
+        zeros = np.zeros(n, dtype=np.float32)
+        weights = self.weights
+
+        genre_total = popcount(genre_masks).astype(np.float32)
+        genre_total[genre_total == 0] = 1.0
+        preferred = popcount(genre_masks & preferred_mask) / max(1, int(popcount(preferred_mask)))
+        disliked = popcount(genre_masks & disliked_mask) / genre_total
+
+        score_prior = zeros if score is None else np.nan_to_num(np.asarray(score, dtype=np.float32)) / 10.0
+
+        return (
+            weights["cosine"] * np.asarray(similarity, dtype=np.float32)
+            + weights["genre"] * preferred
+            + weights["collaborative"] * (zeros if collaborative is None else collaborative)
+            + weights["score"] * score_prior
+            + weights["popularity"] * (zeros if popularity is None else popularity)
+            - weights["dislike"] * disliked
+        ).astype(np.float32)
+
+    def diversify(self, relevance, genre_masks, k):
+        """
+        Select `k` candidates by maximal marginal relevance, using the genre
+        Jaccard similarity between candidates as redundancy.
+
+        Args:
+            relevance (np.ndarray): Relevance per candidate.
+            genre_masks (np.ndarray): Packed genre masks, shape (n, words).
+            k (int): The number of candidates to select.
+
+        Returns:
+            np.ndarray: Selected candidate indices in rank order.
+        """
+        n = len(relevance)
+        k = min(k, n)
+        if k == 0:
+            return np.zeros(0, dtype=np.int64)
+        if self.mmr_lambda >= 1.0:
+            return np.argsort(-relevance, kind="stable")[:k]
+
+        # Redundancy is the genre Jaccard similarity to the closest pick so
+        # far, updated against one selected row per step.
+        bits = np.unpackbits(np.ascontiguousarray(genre_masks).view(np.uint8), axis=1).astype(np.float32)
+        sizes = bits.sum(axis=1)
+        selected = np.empty(k, dtype=np.int64)
+        available = np.ones(n, dtype=bool)
+        max_redundancy = np.zeros(n, dtype=np.float32)
+        for step in range(k):
+            marginal = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_redundancy
+            marginal[~available] = -np.inf
+            best = int(np.argmax(marginal))
+            selected[step] = best
+            available[best] = False
+
+            intersection = bits @ bits[best]
+            union = np.maximum(sizes + sizes[best] - intersection, 1)
+            np.maximum(max_redundancy, intersection / union, out=max_redundancy)
+        return selected
+
+    def rerank(self, similarity, genres, preferred_genres, disliked_genres=(), k=10,
+               collaborative=None, score=None, popularity=None):
+        """
+        Score and diversify candidates.
+
+        Args:
+            similarity (array-like): Cosine similarity per candidate.
+            genres (list): Genre names per candidate.
+            preferred_genres (iterable): The user's preferred genres.
+            disliked_genres (iterable): The user's disliked genres.
+            k (int): The number of candidates to return.
+            collaborative (array-like): Collaborative filtering score per candidate.
+            score (array-like): MAL score per candidate.
+            popularity (array-like): Popularity prior per candidate.
+
+        Returns:
+            tuple: (selected indices in rank order, relevance of every candidate).
+        """
+        genre_masks = self.vocabulary.masks(genres)
+        words = genre_masks.shape[1]
+        relevance = self.relevance(
+            np.asarray(similarity, dtype=np.float32),
+            genre_masks,
+            self.vocabulary.mask(preferred_genres, words),
+            self.vocabulary.mask(disliked_genres, words),
+            collaborative=None if collaborative is None else np.asarray(collaborative, dtype=np.float32),
+            score=score,
+            popularity=None if popularity is None else np.asarray(popularity, dtype=np.float32),
+        )
+        return self.diversify(relevance, genre_masks, k), relevance
@@ -0,0 +1,195 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from prometheus_client import Counter
+from .constraints import profile_fields, field, as_list
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "animebot_response_cache_lookups_total",
+    "Semantic response cache lookups by result.",
+    ["result"],
+)
+
+RESULTS = ("hit", "miss", "repeat", "skipped")
+
+
+def normalise_reply(reply):
+    """Lower-case a reply and drop punctuation, so "Hi!!" and "hi" embed alike."""
+    text = re.sub(r"[^\w\s]", " ", str(reply or "").lower())
+    return " ".join(text.split()) or "hello"
+
+
+def profile_bucket(user_profile, genres=None):
+    """
+    A coarse profile bucket: the user's first few preferred genres, sorted.
+    Questions are only shared between users of the same bucket.
+
+    Args:
+        user_profile (dict): The profile, or the record from `get_user_profile`.
+        genres (int): Preferred genres that make up the bucket.
+
+    Returns:
+        str: The bucket name, "any" for users without preferred genres.
+    """
+    genres = genres or settings.RESPONSE_CACHE_BUCKET_GENRES
+    preferred = as_list(field(profile_fields(user_profile), "preferred_genres"))[:genres]
+    return "|".join(sorted(genre.lower() for genre in preferred)) or "any"
+
+
+class SemanticResponseCache:
+    """
+    Reuses small-talk questions across users: an early-conversation reply
+    whose embedding is close enough to one already answered, from a user in
+    the same coarse profile bucket, gets that cached question instead of a
+    new generation.
+
+    Entries live in this worker's memory and expire after a TTL; each bucket
+    keeps its newest entries only.
+    """
+
+    def __init__(self, threshold=None, ttl=None, max_turns=None, max_entries=None, max_buckets=None):
+        """
+        Args:
+            threshold (float): Cosine similarity from which a cached reply matches.
+            ttl (float): Seconds an entry is served.
+            max_turns (int): Turns in the session history beyond which replies are not cached.
+            max_entries (int): Entries kept per bucket.
+            max_buckets (int): Buckets kept, least recently used evicted first.
+        """
+        self.threshold = threshold if threshold is not None else settings.RESPONSE_CACHE_THRESHOLD
+        self.ttl = ttl if ttl is not None else settings.RESPONSE_CACHE_TTL
+        self.max_turns = max_turns if max_turns is not None else settings.RESPONSE_CACHE_MAX_TURNS
+        self.max_entries = max_entries if max_entries is not None else settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_buckets = max_buckets if max_buckets is not None else settings.RESPONSE_CACHE_MAX_BUCKETS
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(RESULTS, 0)
+
+    def eligible(self, history, summary):
+        """
+        Whether a turn may be served from the cache: only early turns, whose
+        prompt carries little user-specific context yet.
+
+        Args:
+            history (list): The session history.
+            summary (dict): The rolling conversation summary.
+
+        Returns:
+            bool: True if the cache may be used.
+        """
+        eligible = (settings.RESPONSE_CACHE_ENABLED and not (summary or {}).get("text")
+                    and len(history) < self.max_turns)
+        if not eligible:
+            self.count("skipped")
+        return eligible
+
+    def has_entries(self, bucket):
+        """Whether a bucket has live entries a reply could match, so embedding it for a lookup is worthwhile."""
+        with self._lock:
+            return bool(self._live_entries(bucket))
+
+    def lookup(self, vector, bucket, history=()):
+        """
+        Find the cached question of the most similar reply in a bucket,
+        skipping questions the user was already asked.
+
+        Args:
+            vector (list): The embedding of the normalised reply.
+            bucket (str): The profile bucket.
+            history (list): The session history.
+
+        Returns:
+            str: The cached question, or None.
+        """
+        query = self._normalise(vector)
+        asked = {normalise_reply(turn.get("system")) for turn in history}
+        with self._lock:
+            entries = list(self._live_entries(bucket))
+        if not entries:
+            self.count("miss")
+            return None
+        matrix = np.stack([entry_vector for _, entry_vector, _ in entries])
+        scores = matrix @ query if matrix.shape[1] == len(query) else np.zeros(len(entries))
+
+        matched = False
+        for index in np.argsort(-scores):
+            if scores[index] < self.threshold:
+                break
+            matched = True
+            question = entries[index][2]
+            if normalise_reply(question) not in asked:
+                self.count("hit")
+                return question
+        self.count("repeat" if matched else "miss")
+        return None
+
+    def store(self, vector, bucket, question):
+        """
+        Cache the question generated for a reply.
+
+        Args:
+            vector (list): The embedding of the normalised reply.
+            bucket (str): The profile bucket.
+            question (str): The generated question.
+        """
+        with self._lock:
+            entries = self._live_entries(bucket)
+            entries.append((time.monotonic(), self._normalise(vector), question))
+            del entries[:-self.max_entries]
+            self._buckets[bucket] = entries
+            self._buckets.move_to_end(bucket)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+    def report(self):
+        """Lookup counts and the hit rate of this worker, with the cache size."""
+        with self._lock:
+            stats = dict(self.stats)
+            entries = sum(len(entries) for entries in self._buckets.values())
+            buckets = len(self._buckets)
+        lookups = stats["hit"] + stats["miss"] + stats["repeat"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hit"] / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "buckets": buckets,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self.stats = dict.fromkeys(RESULTS, 0)
+
+    def _live_entries(self, bucket):
+        # Entries are appended in time order, so expired ones form a prefix
+        entries = self._buckets.get(bucket)
+        if entries is None:
+            return []
+        cutoff = time.monotonic() - self.ttl
+        expired = 0
+        while expired < len(entries) and entries[expired][0] < cutoff:
+            expired += 1
+        del entries[:expired]
+        if not entries:
+            del self._buckets[bucket]
+        return entries
+
+    def count(self, result):
+        """Count a lookup result, one of `RESULTS`."""
+        RESPONSE_CACHE_LOOKUPS.labels(result=result).inc()
+        with self._lock:
+            self.stats[result] += 1
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+response_cache = SemanticResponseCache()
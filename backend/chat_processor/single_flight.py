@@ -0,0 +1,135 @@
+import time
+import uuid
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import cache
+
+# Delete the lock only while it still holds the caller's token, so a leader
+# that outlived its lock never releases the next leader's.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlightError(Exception):
+    """Raised to followers when the request they waited on failed."""
+
+
+def flight_key(command, user_id=None, payload=""):
+    """
+    Build the de-duplication key of a request.
+
+    Args:
+        command (str): The operation, e.g. "recommend".
+        user_id (int): The requesting user, None for user-independent work.
+        payload (str): The request input.
+
+    Returns:
+        str: The key shared by identical requests.
+    """
+    digest = hashlib.sha256(str(payload).encode("utf-8")).hexdigest()[:16]
+    return f"{command}:{user_id}:{digest}"
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight requests across workers with a Redis lock
+    and result slot: the first request does the work, duplicates wait for and
+    share its result.
+
+    A failure is only delivered to the duplicates already waiting on the
+    failed leader; requests arriving afterwards run the work again.
+    """
+
+    def __init__(self, lock_timeout=None, result_timeout=None, wait_timeout=None, poll_interval=0.05):
+        """
+        Args:
+            lock_timeout (float): Seconds before an abandoned lock expires.
+            result_timeout (float): Seconds a result is shared with late duplicates, and a
+                failure kept for the duplicates that waited on it.
+            wait_timeout (float): Seconds a duplicate waits before doing the work itself.
+            poll_interval (float): Seconds between checks of the result slot.
+        """
+        self.lock_timeout = lock_timeout or settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        self.result_timeout = result_timeout or settings.SINGLE_FLIGHT_RESULT_TIMEOUT
+        self.wait_timeout = wait_timeout or settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self.poll_interval = poll_interval
+        self._release_script = None
+
+    def do(self, key, func):
+        """
+        Run `func` once for all concurrent callers with the same key.
+
+        Args:
+            key (str): The de-duplication key, see `flight_key`.
+            func (callable): The work, taking no arguments; its result must be picklable.
+
+        Returns:
+            The result of `func`, computed here or by the request holding the lock.
+        """
+        lock_key = f"singleflight_lock_{key}"
+        result_key = f"singleflight_result_{key}"
+        deadline = time.monotonic() + self.wait_timeout
+        # The token of the leader this request waits on, whose failure it shares
+        waiting_on = None
+
+        while True:
+            entry = cache.get(result_key)
+            if entry is not None:
+                return entry["value"]
+
+            if waiting_on is not None:
+                error = cache.get(self._error_key(key, waiting_on))
+                if error is not None:
+                    raise SingleFlightError(error)
+
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, timeout=self.lock_timeout):
+                return self._lead(key, lock_key, result_key, token, func)
+            waiting_on = waiting_on or cache.get(lock_key)
+
+            if time.monotonic() >= deadline:
+                logging.warning(f"Gave up waiting on in-flight request {key}, running it again")
+                return func()
+            time.sleep(self.poll_interval)
+
+    def _lead(self, key, lock_key, result_key, token, func):
+        try:
+            result = func()
+        except Exception as e:
+            # Stored under this leader's token, where only its waiters look
+            cache.set(self._error_key(key, token), f"{type(e).__name__}: {e}", timeout=self.result_timeout)
+            raise
+        else:
+            cache.set(result_key, {"ok": True, "value": result}, timeout=self.result_timeout)
+            return result
+        finally:
+            self._release(lock_key, token)
+
+    def _error_key(self, key, token):
+        return f"singleflight_error_{key}_{token}"
+
+    def _release(self, lock_key, token):
+        try:
+            from django_redis import get_redis_connection
+            redis = get_redis_connection("default")
+        except NotImplementedError:
+            # Not a Redis cache (local memory): one process, check then delete
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+            return
+
+        if self._release_script is None:
+            self._release_script = redis.register_script(RELEASE_LOCK_SCRIPT)
+        try:
+            # Compared as stored, i.e. in the cache's key format and serialisation
+            self._release_script(keys=[cache.client.make_key(lock_key)], args=[cache.client.encode(token)],
+                                 client=redis)
+        except Exception as e:
+            logging.warning(f"Failed to release single-flight lock {lock_key}, it expires on its own: {e}")
+
+
+single_flight = SingleFlight()
@@ -1,67 +1,218 @@
-import os
-from dotenv import load_dotenv
-from neo4j import GraphDatabase
+import logging
+from django.conf import settings
+from django.dispatch import Signal
+from utils.tracing import traced
+from utils.graph_store import GraphStore
+from utils.neo4j_connection import Neo4jConnection
 from .mal_api import API_CALL
+from .preference_vector import preference_updater, PREFERENCE_FIELDS
+from .similar_anime import FAVORITE_RELATION
 
-mal_api = API_CALL()
+# Exponentially-weighted blend of $vector into the user's preference vector,
+# computed server-side so concurrent updates cannot lose each other.
+PREFERENCE_BLEND = """
+    CASE
+        WHEN {vector} IS NULL THEN u.preference_vector
+        WHEN u.preference_vector IS NULL OR size(u.preference_vector) <> size({vector}) THEN {vector}
+        ELSE [i IN range(0, size({vector}) - 1) | (1 - $alpha) * u.preference_vector[i] + $alpha * {vector}[i]]
+    END
+"""
 
-load_dotenv(r'D:\Projects\AnimeBot\config.env')
+# Sent after any write that changes what a user should be recommended.
+# Receivers get `user_id` and the new `version` stamp of the profile.
+profile_changed = Signal()
 
 class UserService:
-    def __init__(self):
-        self.driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")))
+    def __init__(self, driver=None):
+        # Share the worker's driver and its connection pool unless given one
+        self.driver = driver or Neo4jConnection().get_driver()
+        self.store = GraphStore(self.driver)
+        self._mal_api = None
+
+    @property
+    def mal_api(self):
+        if self._mal_api is None:
+            self._mal_api = API_CALL(driver=self.driver)
+        return self._mal_api
 
     def close(self):
-        self.driver.close()
+        # The driver outlives the service; it is closed with Neo4jConnection
+        pass
 
     # 0. Create user
+    @traced("neo4j.create_user")
     def create_user(self, user_id, email, username):
         query = """
-        CREATE (u:User {id: $user_id, email: $email, username: $username})
+        CREATE (u:User {id: $user_id, email: $email, username: $username, profile_version: 0})
         RETURN u
         """
-        with self.driver.session() as session:
-            result = session.run(query, user_id=user_id, email=email, username=username)
-            return result.single()
+        return self.store.write_single(query, for_user=user_id, user_id=user_id, email=email, username=username)
+
+    @traced("neo4j.create_users")
+    def create_users(self, users):
+        """
+        Create or update many User nodes in one transaction.
+
+        MERGE keeps the write idempotent, so a batch retried after a partial
+        failure does not duplicate users.
+
+        Args:
+            users (list): Dicts with id, email and username.
+
+        Returns:
+            list: The IDs of the provisioned users.
+        """
+        query = """
+        UNWIND $users AS row
+        MERGE (u:User {id: row.id})
+        ON CREATE SET u.profile_version = 0
+        SET u.email = row.email, u.username = row.username
+        RETURN u.id AS id
+        """
+        records = self.store.write(query, users=users)
+        return [record["id"] for record in records]
 
     # 1. Update relationship (e.g., favorite_anime)
+    @traced("neo4j.update_relationship")
     def update_relationship(self, user_id, relation_type, node_type, node_value):
         related_node_id = None
         if node_type == "Anime":
-            exists, related_node_id = mal_api.anime_exists_name(node_value)
+            exists, related_node_id = self.mal_api.anime_exists_name(node_value)
             if not exists:
-                mal_api.get_data(node_value)
-                exists, related_node_id = mal_api.anime_exists_name(node_value)
+                self.mal_api.get_data(node_value)
+                exists, related_node_id = self.mal_api.anime_exists_name(node_value)
         elif node_type == "Genre":
-            exists, related_node_id = mal_api.genre_exists(node_value)
+            exists, related_node_id = self.mal_api.genre_exists(node_value)
+        # Anime carry their own embedding, so they are blended into the
+        # preference vector in the same write
+        # MERGE the user, whose node the outbox may not have provisioned yet
         query = f"""
-        MATCH (u:User {{id: $user_id}})
-        MATCH (n {{id: $related_node_id}})
+        MATCH (n) WHERE elementId(n) = $related_node_id
+        MERGE (u:User {{id: $user_id}})
+        ON CREATE SET u.profile_version = 0
         MERGE (u)-[r:{relation_type}]->(n)
+        WITH u, r, n, coalesce(n.embedded_text, n.embedding) AS item_vector
+        SET u.preference_vector = {PREFERENCE_BLEND.format(vector="item_vector")},
+            u.profile_version = coalesce(u.profile_version, 0) + 1
         RETURN u, r, n
         """
-        with self.driver.session() as session:
-            result = session.run(query, user_id=user_id,
-                                 related_node_id=related_node_id)
-            return result.single()
+        record = self.store.write_single(query, for_user=user_id, user_id=user_id,
+                                         related_node_id=related_node_id,
+                                         alpha=settings.PREFERENCE_RELATION_ALPHA)
+        blend = None
+        if record is not None and node_type == "Genre":
+            blend = preference_updater.record(user_id, f"preferred_genres: {node_value}",
+                                              settings.PREFERENCE_RELATION_ALPHA)
+        self._profile_changed(user_id, record, after=blend)
+        return record
 
     # 2. Update simple variable (e.g., age)
+    @traced("neo4j.update_variable")
     def update_variable(self, user_id, field_name, value):
+        # MERGE the user, whose node the outbox may not have provisioned yet
         query = f"""
-        MATCH (u:User {{id: $user_id}})
-        SET u.{field_name} = $value
+        MERGE (u:User {{id: $user_id}})
+        ON CREATE SET u.profile_version = 0
+        SET u.{field_name} = $value,
+            u.profile_version = coalesce(u.profile_version, 0) + 1
         RETURN u
         """
-        with self.driver.session() as session:
-            result = session.run(query, user_id=user_id, value=value)
-            return result.single()
+        record = self.store.write_single(query, for_user=user_id, user_id=user_id, value=value)
+        blend = None
+        if record is not None and field_name.endswith(PREFERENCE_FIELDS):
+            blend = preference_updater.record(user_id, f"{field_name}: {value}",
+                                              settings.PREFERENCE_RELATION_ALPHA)
+        self._profile_changed(user_id, record, after=blend)
+        return record
         
     # 3. Get user profile
+    @traced("neo4j.get_user_profile")
     def get_user_profile(self, user_id):
         query = """
         MATCH (u:User {id: $user_id})
         RETURN u
         """
-        with self.driver.session() as session:
-            result = session.run(query, user_id=user_id)
-            return result.single()
+        return self.store.read_single(query, for_user=user_id, user_id=user_id)
+
+    # 4. Get profile version stamp
+    @traced("neo4j.get_profile_version")
+    def get_profile_version(self, user_id):
+        """
+        The version stamp of everything a recommendation list is computed
+        from: the profile version and the number of blends into the
+        preference vector, which land after the profile write.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            tuple: (profile version, preference vector updates), or None for unknown users.
+        """
+        query = """
+        MATCH (u:User {id: $user_id})
+        RETURN coalesce(u.profile_version, 0) AS version, coalesce(u.preference_updates, 0) AS updates
+        """
+        record = self.store.read_single(query, for_user=user_id, user_id=user_id)
+        return (record["version"], record["updates"]) if record else None
+
+    # 5. Blend a vector into the preference vector
+    @traced("neo4j.blend_preference_vector")
+    def blend_preference_vector(self, user_id, vector, alpha):
+        query = f"""
+        MATCH (u:User {{id: $user_id}})
+        SET u.preference_vector = {PREFERENCE_BLEND.format(vector="$vector")},
+            u.preference_updates = coalesce(u.preference_updates, 0) + 1
+        RETURN u.preference_updates AS updates
+        """
+        return self.store.write_single(query, for_user=user_id, user_id=user_id, vector=vector, alpha=alpha)
+
+    # 6. Get preference vector
+    @traced("neo4j.get_preference_vector")
+    def get_preference_vector(self, user_id):
+        query = """
+        MATCH (u:User {id: $user_id})
+        RETURN u.preference_vector AS vector
+        """
+        record = self.store.read_single(query, for_user=user_id, user_id=user_id)
+        return record["vector"] if record else None
+
+    # 7. Record favorite anime
+    @traced("neo4j.record_favorites")
+    def record_favorites(self, user_id, names):
+        """
+        Relate the user to every named anime as a favorite, fetching titles
+        missing from the catalog from MAL. Favorites seed the SIMILAR_TO
+        candidates and count as seen.
+
+        Args:
+            user_id (int): The ID of the user.
+            names (list): Anime titles.
+
+        Returns:
+            list: The relationship records of the anime found.
+        """
+        records = []
+        for name in names:
+            try:
+                record = self.update_relationship(user_id, FAVORITE_RELATION, "Anime", name)
+            except Exception as e:
+                logging.warning(f"Could not record favorite anime {name!r} of user {user_id}: {e}")
+                continue
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _profile_changed(self, user_id, record, after=None):
+        # With a preference blend queued, receivers are only told once it has
+        # landed, so they never recompute from the previous vector
+        if record is None:
+            return
+
+        def send(*args):
+            profile_changed.send(sender=self.__class__, user_id=user_id,
+                                 version=record["u"].get("profile_version", 0))
+
+        if after is None:
+            send()
+        else:
+            after.add_done_callback(send)
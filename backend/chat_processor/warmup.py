@@ -0,0 +1,175 @@
+import time
+import logging
+import threading
+from django.conf import settings
+from django.core.cache import cache
+
+
+class WarmUp:
+    """
+    Runs the expensive first-use work of a worker once, off the import path:
+    Neo4j connectivity, Ollama model load and in-memory index load. Steps
+    that fail, e.g. while a dependency is briefly down at boot, are retried
+    in the background until they pass.
+    """
+
+    def __init__(self):
+        self.checks = {}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.finished_at is not None and all(check["ok"] for check in self.checks.values())
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "checks": dict(self.checks),
+        }
+
+    def start(self, background=True):
+        """
+        Start warm-up once per worker process.
+
+        Args:
+            background (bool): Run in a daemon thread so the server can accept
+                connections (and answer readiness probes) meanwhile.
+        """
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.time()
+        if background:
+            self._thread = threading.Thread(target=self.run, kwargs={"retry": True}, name="warmup", daemon=True)
+            self._thread.start()
+        else:
+            self.run()
+
+    def run(self, retry=False):
+        """
+        Run every warm-up step.
+
+        Args:
+            retry (bool): Keep re-running the failed steps with exponential
+                backoff until all of them pass.
+        """
+        steps = self.steps()
+        for name, func in steps.items():
+            self._check(name, func)
+        self.finished_at = time.time()
+        logging.info(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s: {self.checks}")
+
+        delay = settings.WARMUP_RETRY_INITIAL
+        while retry and not self.ready:
+            time.sleep(delay)
+            delay = min(delay * 2, settings.WARMUP_RETRY_MAX)
+            for name, func in steps.items():
+                if not self.checks[name]["ok"]:
+                    self._check(name, func)
+            if self.ready:
+                logging.info(f"Warm-up recovered after {time.time() - self.started_at:.1f}s")
+
+    def steps(self):
+        steps = {"neo4j": self.warm_neo4j}
+        for model in self.chat_models():
+            steps[f"chat_model:{model}"] = lambda model=model: self.warm_model(model)
+        steps["embed_model"] = lambda: self.warm_model(settings.OLLAMA_EMBED_MODEL, embedding=True)
+        steps["indexes"] = self.warm_indexes
+        return steps
+
+    def _check(self, name, func):
+        start = time.perf_counter()
+        attempts = self.checks.get(name, {}).get("attempts", 0) + 1
+        try:
+            func()
+            self.checks[name] = {"ok": True, "seconds": round(time.perf_counter() - start, 3), "attempts": attempts}
+        except Exception as e:
+            logging.error(f"Warm-up step {name} failed (attempt {attempts}): {e}")
+            self.checks[name] = {"ok": False, "seconds": round(time.perf_counter() - start, 3),
+                                 "attempts": attempts, "error": str(e)}
+
+    def chat_models(self):
+        """The preferred model of every routed task; fallback and escalation tiers load on first use."""
+        return list(dict.fromkeys(
+            settings.OLLAMA_MODEL_TIERS[route["tiers"][0]] for route in settings.MODEL_ROUTES.values()
+        ))
+
+    def warm_neo4j(self):
+        from utils.neo4j_connection import Neo4jConnection
+        Neo4jConnection().get_driver().verify_connectivity()
+
+    def warm_model(self, model, embedding=False):
+        """Load a model into Ollama memory without generating, pinned by keep_alive."""
+        import ollama
+        from utils.resilience import dependency
+        client = ollama.Client(timeout=dependency("ollama_embed" if embedding else "ollama").timeout)
+        if embedding:
+            client.embeddings(model=model, prompt="warm-up", keep_alive=settings.OLLAMA_KEEP_ALIVE)
+        else:
+            client.generate(model=model, prompt="", keep_alive=settings.OLLAMA_KEEP_ALIVE)
+
+    def warm_indexes(self):
+        from .chatbot import QUESTIONS_PATH
+        from .llm_clients import get_llm, get_parser, load_questions
+        from .embedding_service import get_embedding_service
+        from .recommendation_engine import get_engine
+        from .compact_index import get_compact_index
+
+        for model in self.chat_models():
+            get_llm(model)
+        get_embedding_service()
+        get_parser()
+        load_questions(QUESTIONS_PATH)
+        get_engine(settings.CF_MODEL_PATH)
+        get_compact_index(settings.COMPACT_INDEX_PATH)
+
+
+class KeepWarm:
+    """
+    Periodically re-pins the routed chat models and the embedding model in
+    Ollama memory, so a quiet period never ends with a cold model reload.
+    """
+
+    lock_key = "ollama_keep_warm"
+
+    def __init__(self, interval=None):
+        """
+        Args:
+            interval (float): Seconds between pings, below `OLLAMA_KEEP_ALIVE`.
+        """
+        self.interval = interval or settings.OLLAMA_KEEP_WARM_INTERVAL
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or not self.interval:
+            return
+        self._thread = threading.Thread(target=self._run, name="keep-warm", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.ping()
+
+    def ping(self):
+        # One worker pings per interval; the others find the lock taken
+        if not cache.add(self.lock_key, 1, timeout=max(1, int(self.interval) - 1)):
+            return
+        for model in warmup.chat_models():
+            self._ping(model)
+        self._ping(settings.OLLAMA_EMBED_MODEL, embedding=True)
+
+    def _ping(self, model, embedding=False):
+        try:
+            warmup.warm_model(model, embedding=embedding)
+        except Exception as e:
+            logging.warning(f"Keep-warm ping of {model} failed: {e}")
+
+
+warmup = WarmUp()
+keep_warm = KeepWarm()
@@ -0,0 +1,136 @@
+import math
+import uuid
+import logging
+from prometheus_client import Counter
+
+SHED_REQUESTS = Counter(
+    "animebot_shed_requests_total",
+    "Requests rejected by admission control.",
+    ["endpoint", "reason"],
+)
+
+# Refill and take one token atomically, using the Redis clock so every worker
+# agrees on elapsed time. Returns {allowed, seconds until a token is available}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+# Lease a slot in a sorted set of in-flight requests. Leases of workers that
+# died without releasing expire after ARGV[2] seconds.
+ACQUIRE_SLOT_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(lease))
+    return 1
+end
+return 0
+"""
+
+
+class AdmissionController:
+    """
+    Redis-backed token buckets and a global concurrency ceiling shared by
+    every worker. Redis being unavailable admits requests rather than
+    turning admission control into an outage.
+    """
+
+    key_prefix = "admission"
+
+    def __init__(self, redis=None):
+        """
+        Args:
+            redis (redis.Redis): The Redis client, taken from the default cache if omitted.
+        """
+        self._redis = redis
+        self._scripts = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from django_redis import get_redis_connection
+            self._redis = get_redis_connection("default")
+        return self._redis
+
+    @property
+    def scripts(self):
+        if self._scripts is None:
+            self._scripts = {
+                "bucket": self.redis.register_script(TOKEN_BUCKET_SCRIPT),
+                "acquire": self.redis.register_script(ACQUIRE_SLOT_SCRIPT),
+            }
+        return self._scripts
+
+    def take_token(self, bucket, rate, burst):
+        """
+        Take a token from a bucket.
+
+        Args:
+            bucket (str): The bucket name, e.g. "chat:user:42".
+            rate (float): Tokens added per second.
+            burst (int): The bucket capacity.
+
+        Returns:
+            tuple: (allowed, seconds to wait before retrying).
+        """
+        try:
+            allowed, wait = self.scripts["bucket"](
+                keys=[f"{self.key_prefix}:bucket:{bucket}"], args=[rate, burst]
+            )
+        except Exception as e:
+            logging.warning(f"Admission control unavailable, admitting request: {e}")
+            return True, 0
+        return bool(int(allowed)), math.ceil(float(wait))
+
+    def acquire_slot(self, limit, lease):
+        """
+        Lease one of `limit` global concurrency slots.
+
+        Args:
+            limit (int): The maximum concurrent requests across workers.
+            lease (float): Seconds after which an unreleased slot is reclaimed.
+
+        Returns:
+            str: The slot token to release, "" if Redis is unavailable, or
+                None if every slot is taken.
+        """
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.scripts["acquire"](keys=[f"{self.key_prefix}:slots"], args=[limit, lease, token])
+        except Exception as e:
+            logging.warning(f"Admission control unavailable, admitting request: {e}")
+            return ""
+        return token if int(acquired) else None
+
+    def release_slot(self, token):
+        if not token:
+            return
+        try:
+            self.redis.zrem(f"{self.key_prefix}:slots", token)
+        except Exception as e:
+            logging.warning(f"Failed to release admission slot: {e}")
+
+
+admission = AdmissionController()
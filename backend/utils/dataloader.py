@@ -4,6 +4,8 @@ import logging
 import pandas as pd
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from utils.query_log import query_log
+from utils.graph_store import GraphStore
 from tqdm.asyncio import tqdm
 from langchain.schema import Document
 from langchain_community.embeddings import OllamaEmbeddings
@@ -17,12 +19,12 @@ logging.basicConfig(level=logging.INFO,
 
 
 class Neo4JDataloader:
-    def __init__(self, checkpoint_file='checkpoint.txt', max_retries=3):
+    def __init__(self, checkpoint_file='checkpoint.txt', max_retries=3, driver=None):
         self.NEO4J_URI = os.getenv('NEO4J_URI')
         self.NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
         self.NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
         self.AUTH = (self.NEO4J_USERNAME, self.NEO4J_PASSWORD)
-        self.driver = GraphDatabase.driver(self.NEO4J_URI, auth=self.AUTH)
+        self.driver = driver or GraphDatabase.driver(self.NEO4J_URI, auth=self.AUTH)
         self.embedder = OllamaEmbeddings(model="nomic-embed-text")
         self.checkpoint_file = checkpoint_file
         self.max_retries = max_retries
@@ -69,12 +71,12 @@ class Neo4JDataloader:
         df.to_csv(r"D:\Projects\AnimeBot\backend\data\embedded_anime_dataset.csv", index=False)
     
     def batch_execute(self, queries):
-        """Execute Neo4j queries with session management."""
-        with self.driver.session() as session:
-            with session.begin_transaction() as tx:
-                for query, params in queries:
-                    tx.run(query, params)
-                tx.commit()
+        """Execute Neo4j queries as one managed, retried write transaction."""
+        def load(tx):
+            for query, params in queries:
+                query_log.run(tx, query, params)
+
+        GraphStore(self.driver).execute_write(load)
 
     def get_last_checkpoint(self):
         """Read the last processed row index from the checkpoint file."""
@@ -187,7 +189,8 @@ class Neo4JDataloader:
             self.driver.close()
             logging.info("Neo4J driver closed")
 
-# Instantiate and run the Neo4JDataloader class
-neo = Neo4JDataloader()
-neo.load_anime_data()
-neo.close()
+if __name__ == "__main__":
+    # Instantiate and run the Neo4JDataloader class
+    neo = Neo4JDataloader()
+    neo.load_anime_data()
+    neo.close()
@@ -0,0 +1,145 @@
+import os
+import logging
+from neo4j import READ_ACCESS, WRITE_ACCESS, Bookmarks
+from dotenv import load_dotenv
+from utils.query_log import query_log
+
+# Load environment variables
+load_dotenv(r'D:\Projects\AnimeBot\config.env')
+
+BOOKMARKS_KEY = "neo4j_bookmarks_{user_id}"
+
+
+class CacheBookmarkStore:
+    """
+    Keeps the bookmarks of each user's latest write in the Django cache, so a
+    read on any worker can wait for that write (read-your-writes on a cluster).
+    """
+
+    def __init__(self, timeout=60):
+        """
+        Args:
+            timeout (float): Seconds a bookmark is kept; after that every
+                replica is assumed to have caught up.
+        """
+        self.timeout = timeout
+
+    def get(self, user_id):
+        from django.core.cache import cache
+        try:
+            values = cache.get(BOOKMARKS_KEY.format(user_id=user_id))
+        except Exception as e:
+            logging.warning(f"Could not read Neo4j bookmarks of user {user_id}: {e}")
+            return None
+        return Bookmarks.from_raw_values(values) if values else None
+
+    def set(self, user_id, bookmarks):
+        from django.core.cache import cache
+        try:
+            cache.set(BOOKMARKS_KEY.format(user_id=user_id), list(bookmarks.raw_values), timeout=self.timeout)
+        except Exception as e:
+            logging.warning(f"Could not store Neo4j bookmarks of user {user_id}: {e}")
+
+
+class GraphStore:
+    """
+    Data-access layer over the Neo4j driver. Every query runs in a managed
+    `execute_read` / `execute_write` unit of work, so transient errors
+    (leader switches, deadlocks, dropped connections) are retried by the
+    driver; reads use READ access so a `neo4j://` cluster routes them to
+    followers and read replicas.
+
+    Passing `for_user` ties a unit of work to a user: writes store their
+    bookmarks and later reads for the user wait for them, so profile updates
+    are visible to the next request even when served by a replica.
+    """
+
+    def __init__(self, driver, database=None, fetch_size=None, bookmark_store=None):
+        """
+        Args:
+            driver (neo4j.Driver): The Neo4j driver.
+            database (str): The database name, the server default if omitted.
+            fetch_size (int): Records pulled per batch from the server.
+            bookmark_store (CacheBookmarkStore): Where per-user bookmarks are kept.
+        """
+        self.driver = driver
+        self.database = database or os.getenv('NEO4J_DATABASE') or None
+        self.fetch_size = fetch_size or int(os.getenv('NEO4J_FETCH_SIZE', 1000))
+        self.bookmark_store = bookmark_store or CacheBookmarkStore(
+            timeout=float(os.getenv('NEO4J_BOOKMARK_TTL', 60))
+        )
+
+    def _session(self, access_mode, for_user=None, fetch_size=None):
+        config = {"default_access_mode": access_mode, "fetch_size": fetch_size or self.fetch_size}
+        if self.database:
+            config["database"] = self.database
+        if for_user is not None:
+            bookmarks = self.bookmark_store.get(for_user)
+            if bookmarks is not None:
+                config["bookmarks"] = bookmarks
+        return self.driver.session(**config)
+
+    def execute_read(self, work, *args, for_user=None, fetch_size=None, **kwargs):
+        """
+        Run a read unit of work, retried on transient errors.
+
+        Args:
+            work (callable): Called with a managed transaction and `args`/`kwargs`;
+                it may run several queries and must consume their results.
+            for_user (int): Wait for this user's latest write first.
+            fetch_size (int): Records pulled per batch, for large results.
+
+        Returns:
+            The return value of `work`.
+        """
+        with self._session(READ_ACCESS, for_user, fetch_size) as session:
+            return session.execute_read(work, *args, **kwargs)
+
+    def execute_write(self, work, *args, for_user=None, **kwargs):
+        """
+        Run a write unit of work, retried on transient errors. Work may be
+        retried, so it must be idempotent and free of side effects outside
+        the transaction.
+
+        Args:
+            work (callable): Called with a managed transaction and `args`/`kwargs`.
+            for_user (int): Record the write's bookmarks for this user's later reads.
+
+        Returns:
+            The return value of `work`.
+        """
+        with self._session(WRITE_ACCESS, for_user) as session:
+            result = session.execute_write(work, *args, **kwargs)
+            if for_user is not None:
+                self.bookmark_store.set(for_user, session.last_bookmarks())
+        return result
+
+    def read(self, query, parameters=None, for_user=None, fetch_size=None, **kwargs):
+        """Run a read query and return its records."""
+        return self.execute_read(lambda tx: query_log.run(tx, query, parameters, **kwargs),
+                                 for_user=for_user, fetch_size=fetch_size)
+
+    def read_single(self, query, parameters=None, for_user=None, **kwargs):
+        """Run a read query and return its first record, or None."""
+        return self.execute_read(lambda tx: query_log.single(tx, query, parameters, **kwargs), for_user=for_user)
+
+    def read_each(self, query, handler, parameters=None, fetch_size=None, **kwargs):
+        """
+        Stream a large read result to `handler` record by record, pulling
+        `fetch_size` records at a time instead of buffering the result.
+        A retried transaction replays the records, so `handler` must
+        tolerate seeing a record again.
+
+        Returns:
+            int: The number of records.
+        """
+        return self.execute_read(lambda tx: query_log.each(tx, query, handler, parameters, **kwargs),
+                                 fetch_size=fetch_size)
+
+    def write(self, query, parameters=None, for_user=None, **kwargs):
+        """Run a write query and return its records."""
+        return self.execute_write(lambda tx: query_log.run(tx, query, parameters, **kwargs), for_user=for_user)
+
+    def write_single(self, query, parameters=None, for_user=None, **kwargs):
+        """Run a write query and return its first record, or None."""
+        return self.execute_write(lambda tx: query_log.single(tx, query, parameters, **kwargs), for_user=for_user)
@@ -21,7 +21,17 @@ class Neo4jConnection:
         self.NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
         self.NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
         self.AUTH = (self.NEO4J_USERNAME, self.NEO4J_PASSWORD)
-        self.driver = GraphDatabase.driver(self.NEO4J_URI, auth=self.AUTH)
+        if self.NEO4J_URI and self.NEO4J_URI.startswith('memory://'):
+            # Offline benchmarks run against an in-memory stand-in of the graph
+            from benchmarks.memory_graph import MemoryGraphDriver
+            self.driver = MemoryGraphDriver.from_uri(self.NEO4J_URI)
+            self.async_driver = None
+            return
+        # Managed transactions (see utils.graph_store) retry transient errors
+        # for up to this many seconds
+        self.driver = GraphDatabase.driver(
+            self.NEO4J_URI, auth=self.AUTH,
+            max_transaction_retry_time=float(os.getenv('NEO4J_MAX_RETRY_TIME', 15)))
         self.async_driver = AsyncGraphDatabase.driver(
             self.NEO4J_URI, auth=self.AUTH)
 
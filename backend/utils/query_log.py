@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import time
+import heapq
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import READ_ACCESS
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(r'D:\Projects\AnimeBot\config.env')
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalise_query(query):
+    """Collapse whitespace and literals so queries differing only in values share a shape."""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def fingerprint(query):
+    return hashlib.sha1(normalise_query(query).encode("utf-8")).hexdigest()[:12]
+
+
+def _plan_to_dict(plan):
+    """Reduce a driver plan/profile dict to its operators, row counts and db hits."""
+    if not plan:
+        return None
+    args = plan.get("args", {})
+    node = {"operator": plan.get("operatorType")}
+    for key in ("rows", "dbHits"):
+        if key in plan:
+            node[key] = plan[key]
+    for key in ("EstimatedRows", "Details"):
+        if key in args:
+            node[key] = args[key]
+    node["children"] = [_plan_to_dict(child) for child in plan.get("children", [])]
+    return node
+
+
+class QueryLog:
+    """
+    Executes Neo4j queries while recording latency, row counts and the
+    server-side timings of each query shape. Queries slower than the
+    threshold are logged, and their plan is captured in the background and
+    attached to the shape's stats.
+    """
+
+    def __init__(self, slow_threshold_ms=500, top_n=20, plan_interval=300):
+        """
+        Args:
+            slow_threshold_ms (float): Wall time above which a query is logged as slow.
+            top_n (int): How many fingerprints `top` reports by default.
+            plan_interval (float): Minimum seconds between plan captures of one fingerprint.
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.top_n = top_n
+        self.plan_interval = plan_interval
+        self.stats = {}
+        self._last_plan = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-plan")
+        return self._executor
+
+    def shutdown(self, wait=True):
+        """Let queued plan captures finish and stop the executor."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def run(self, runner, query, parameters=None, **kwargs):
+        """
+        Run a query on a session or transaction and fully consume it.
+
+        Args:
+            runner (neo4j.Session | neo4j.Transaction): Where to run the query.
+            query (str): The Cypher query.
+            parameters (dict): Query parameters.
+
+        Returns:
+            list: The result records.
+        """
+        records = []
+        self.each(runner, query, records.append, parameters, **kwargs)
+        return records
+
+    def each(self, runner, query, handler, parameters=None, **kwargs):
+        """
+        Run a query and pass each record to `handler` as it streams in, so
+        large results are never held in memory at once. The recorded time
+        includes the handler's.
+
+        Args:
+            runner (neo4j.Session | neo4j.Transaction): Where to run the query.
+            query (str): The Cypher query.
+            handler (callable): Called with each record.
+            parameters (dict): Query parameters.
+
+        Returns:
+            int: The number of records.
+        """
+        start = time.perf_counter()
+        result = runner.run(query, parameters, **kwargs)
+        rows = 0
+        for record in result:
+            handler(record)
+            rows += 1
+        summary = result.consume()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        key = fingerprint(query)
+        self._record(key, query, elapsed_ms, rows, summary)
+        if elapsed_ms >= self.slow_threshold_ms:
+            self._log_slow(key, query, parameters, kwargs, elapsed_ms, rows, summary)
+        return rows
+
+    def single(self, runner, query, parameters=None, **kwargs):
+        """Run a query and return its first record, or None."""
+        records = self.run(runner, query, parameters, **kwargs)
+        return records[0] if records else None
+
+    def _record(self, key, query, elapsed_ms, rows, summary):
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = {
+                    "fingerprint": key,
+                    "query": normalise_query(query),
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "available_after_ms": 0,
+                    "consumed_after_ms": 0,
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += rows
+            stats["available_after_ms"] += summary.result_available_after or 0
+            stats["consumed_after_ms"] += summary.result_consumed_after or 0
+
+    def _log_slow(self, key, query, parameters, kwargs, elapsed_ms, rows, summary):
+        logging.warning(
+            f"Slow Neo4j query {key}: {elapsed_ms:.1f} ms, {rows} rows, "
+            f"available after {summary.result_available_after} ms, "
+            f"consumed after {summary.result_consumed_after} ms: {normalise_query(query)}"
+        )
+
+        now = time.monotonic()
+        with self._lock:
+            capture = now - self._last_plan.get(key, float("-inf")) >= self.plan_interval
+            if capture:
+                self._last_plan[key] = now
+        if capture:
+            # Off the request path: the slow request never pays for the plan
+            self.executor.submit(self._capture_plan, key, query, {**(parameters or {}), **kwargs})
+
+    def _capture_plan(self, key, query, parameters):
+        """
+        EXPLAIN a slow query in a session of its own. EXPLAIN only plans, so
+        the query is never executed again, whether it reads or writes.
+        """
+        from utils.neo4j_connection import Neo4jConnection
+        try:
+            driver = Neo4jConnection().get_driver()
+            with driver.session(database=os.getenv('NEO4J_DATABASE') or None,
+                                default_access_mode=READ_ACCESS) as session:
+                plan = _plan_to_dict(session.run(f"EXPLAIN {query}", parameters).consume().plan)
+        except Exception as e:
+            logging.error(f"Failed to capture plan for query {key}: {e}")
+            return None
+
+        with self._lock:
+            if key in self.stats:
+                self.stats[key]["plan"] = plan
+        logging.warning(f"Plan of slow Neo4j query {key}: {json.dumps(plan, default=str)}")
+        return plan
+
+    def top(self, n=None, key="total_ms"):
+        """
+        Report the heaviest query shapes.
+
+        Args:
+            n (int): How many fingerprints to return, defaults to `top_n`.
+            key (str): The statistic to rank by, e.g. "total_ms", "max_ms" or "count".
+
+        Returns:
+            list: Aggregated stats per fingerprint, heaviest first.
+        """
+        with self._lock:
+            stats = [dict(entry) for entry in self.stats.values()]
+        for entry in stats:
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+        return heapq.nlargest(n or self.top_n, stats, key=lambda entry: entry[key])
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self._last_plan.clear()
+
+
+query_log = QueryLog(
+    slow_threshold_ms=float(os.getenv('NEO4J_SLOW_QUERY_MS', 500)),
+    top_n=int(os.getenv('NEO4J_QUERY_LOG_TOP_N', 20)),
+    plan_interval=float(os.getenv('NEO4J_PLAN_CAPTURE_INTERVAL', 300)),
+)
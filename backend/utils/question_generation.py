@@ -79,5 +79,6 @@ class QuestionGeneration:
 
         return formatted_response
 
-ques = QuestionGeneration()
-print(ques.annotation_service_format())
+if __name__ == "__main__":
+    ques = QuestionGeneration()
+    print(ques.annotation_service_format())
@@ -0,0 +1,253 @@
+import time
+import random
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+from prometheus_client import Counter
+
+DEPENDENCY_CALLS = Counter(
+    "animebot_dependency_calls_total",
+    "Calls to external dependencies by outcome.",
+    ["dependency", "outcome"],
+)
+
+
+class DependencyError(Exception):
+    """Raised when a dependency call failed after its retries, timed out or was short-circuited."""
+
+
+class CircuitOpenError(DependencyError):
+    """Raised without calling the dependency while its circuit breaker is open."""
+
+
+class DependencyTimeout(DependencyError):
+    """Raised when a dependency did not answer within its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures so callers fail fast instead of queueing
+    on a broken dependency, then lets a single probe through after
+    `reset_timeout` to decide whether to close again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a probe.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class RetryBudget:
+    """
+    Token bucket that limits retries to a fraction of calls, plus a small
+    floor, so retries cannot multiply the load on a struggling dependency.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, window=10.0):
+        """
+        Args:
+            ratio (float): Retry tokens earned per call.
+            min_per_second (float): Retry tokens earned per second regardless of traffic.
+            window (float): Seconds of earnings the bucket can hold.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(1.0, min_per_second * window)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.min_per_second)
+        self.updated_at = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend a retry token, returning False if the budget is exhausted."""
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Dependency:
+    """
+    Calls an external dependency with a deadline per attempt, jittered
+    retries within a retry budget, a circuit breaker and, for idempotent
+    calls, an optional hedged second attempt.
+
+    Attempts run on the dependency's own bounded thread pool, so a hung
+    dependency ties up at most `max_workers` threads instead of every
+    request worker.
+    """
+
+    def __init__(self, name, timeout, retries=0, backoff=0.2, hedge_after=None,
+                 failure_threshold=5, reset_timeout=30.0, retry_ratio=0.2, max_workers=8):
+        """
+        Args:
+            name (str): The dependency name used in logs and metrics.
+            timeout (float): Seconds allowed per attempt.
+            retries (int): Retries after the first attempt.
+            backoff (float): Base seconds of the exponential, fully jittered retry delay.
+            hedge_after (float): Seconds after which an idempotent call sends a
+                second attempt and takes whichever answers first; None disables hedging.
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a probe.
+            retry_ratio (float): Retries allowed per call on average.
+            max_workers (int): Concurrent attempts allowed.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget(ratio=retry_ratio)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"dependency-{name}")
+
+    def call(self, func, idempotent=False):
+        """
+        Call the dependency.
+
+        Args:
+            func (callable): The call, taking no arguments.
+            idempotent (bool): Whether the call may be retried and hedged.
+
+        Returns:
+            The result of `func`.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            DependencyTimeout: If the last attempt ran out of time.
+            DependencyError: If the last attempt failed.
+        """
+        if not self.breaker.allow():
+            DEPENDENCY_CALLS.labels(dependency=self.name, outcome="short_circuit").inc()
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt(func, hedge=idempotent and self.hedge_after is not None)
+            except Exception as e:
+                self.breaker.record_failure()
+                outcome = "timeout" if isinstance(e, DependencyTimeout) else "failure"
+                DEPENDENCY_CALLS.labels(dependency=self.name, outcome=outcome).inc()
+                if (not idempotent or attempt >= self.retries
+                        or not self.breaker.allow() or not self.budget.withdraw()):
+                    if isinstance(e, DependencyError):
+                        raise
+                    raise DependencyError(f"{self.name} call failed: {e}") from e
+                attempt += 1
+                DEPENDENCY_CALLS.labels(dependency=self.name, outcome="retry").inc()
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            else:
+                self.breaker.record_success()
+                DEPENDENCY_CALLS.labels(dependency=self.name, outcome="success").inc()
+                return result
+
+    def _submit(self, func):
+        # Carry the request context (e.g. the trace) into the pool thread
+        return self.executor.submit(contextvars.copy_context().run, func)
+
+    def _attempt(self, func, hedge=False):
+        deadline = time.monotonic() + self.timeout
+        futures = [self._submit(func)]
+        if hedge:
+            done, _ = wait(futures, timeout=min(self.hedge_after, self.timeout))
+            if not done:
+                DEPENDENCY_CALLS.labels(dependency=self.name, outcome="hedge").inc()
+                futures.append(self._submit(func))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+
+        for future in pending:
+            future.cancel()
+        if pending:
+            raise DependencyTimeout(f"{self.name} did not answer within {self.timeout}s")
+        raise error
+
+
+_dependencies = {}
+_dependencies_lock = threading.Lock()
+
+
+def dependency(name):
+    """
+    Return the shared `Dependency` for a name, configured from
+    `settings.RESILIENCE[name]`.
+
+    Args:
+        name (str): The dependency name, e.g. "mal".
+
+    Returns:
+        Dependency: The dependency.
+    """
+    with _dependencies_lock:
+        if name not in _dependencies:
+            _dependencies[name] = Dependency(name, **settings.RESILIENCE[name])
+        return _dependencies[name]
@@ -0,0 +1,103 @@
+import time
+import random
+import functools
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Histogram
+
+# Buckets span sub-millisecond cache reads up to multi-second LLM generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "animebot_stage_seconds",
+    "Latency of named request stages (sampled).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+_current_trace = contextvars.ContextVar("animebot_trace", default=None)
+
+
+class Trace:
+    """
+    The spans recorded while handling one sampled request.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def record(self, name, seconds):
+        self.spans.append((name, seconds))
+
+    def totals(self):
+        """Sum the durations of repeated spans, keeping first-seen order."""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """Format the spans as a `Server-Timing` header value, durations in milliseconds."""
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.totals().items())
+
+    def observe(self):
+        """Export every span to the per-stage histogram."""
+        for name, seconds in self.spans:
+            STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+
+def start_trace(sample_rate):
+    """
+    Start a trace for the current request if it is sampled.
+
+    Args:
+        sample_rate (float): The fraction of requests to trace, between 0 and 1.
+
+    Returns:
+        tuple: (Trace or None, context token or None).
+    """
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None, None
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    if token is not None:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block as a named stage of the current trace. Outside a sampled
+    request this is a no-op.
+
+    Args:
+        name (str): The stage name, e.g. "ollama.embed_query".
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(name, time.perf_counter() - start)
+
+
+def traced(name):
+    """
+    Decorator form of `span`.
+
+    Args:
+        name (str): The stage name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator